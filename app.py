@@ -1,13 +1,134 @@
-import tempfile
+import io
+import os
 from pathlib import Path
-import shutil
 import zipfile
 import streamlit as st
 import whisper
 
-from transcribe_video import transcribe
+from job_server import JobServer, QueueFull
 
 st.set_page_config(page_title="Whisper Transcriber", page_icon="📝", layout="centered")
+OUTPUT_DIR = Path("outputs")
+
+
+@st.cache_resource
+def get_job_server() -> JobServer:
+    """Background workers shared by every session; each keeps its models loaded.
+
+    ``WHISPER_APP_WORKERS`` files are transcribed at the same time, and up to
+    ``WHISPER_APP_MAX_QUEUE`` more may wait. Finished jobs and their files are
+    dropped after a day, also for sessions that never clear them.
+    """
+    server = JobServer(
+        workers=int(os.environ.get("WHISPER_APP_WORKERS", "2")),
+        max_queue=int(os.environ.get("WHISPER_APP_MAX_QUEUE", "16")),
+        keep_finished_seconds=24 * 3600,
+    )
+    server.start()
+    return server
+
+
+def submit_uploads(files, model_size: str, language, use_cache: bool) -> None:
+    """Queue the uploads; the jobs outlive reruns of this script.
+
+    Streamlit already holds every upload in memory, so the job server pipes it
+    from there into ffmpeg in the background (see `JobServer.submit_upload`)
+    and nothing is written to disk; the session does not wait for the decode.
+    """
+    server = get_job_server()
+    for file in files:
+        health = server.health()
+        if health["queued"] >= health["max_queue"]:
+            st.warning(f"The queue is full, {file.name} was not added. Try again when some files are done.")
+            continue
+        try:
+            status = server.submit_upload(
+                file.getbuffer(),  # a view of the upload, not a copy
+                file.name,
+                model_size=model_size,
+                language=language,
+                use_cache=use_cache,
+            )
+        except QueueFull:
+            st.warning(f"The queue is full, {file.name} was not added. Try again when some files are done.")
+            continue
+        except Exception as e:
+            st.error(f"{file.name} could not be queued: {e}")
+            continue
+        st.session_state.jobs.append({"id": status["id"], "name": file.name, "model": model_size})
+
+
+def transcript_name(job: dict) -> str:
+    return f"{Path(job['name']).stem}_{job['model']}.txt"
+
+
+def transcript_text(server: JobServer, job: dict) -> str:
+    """The finished transcript, read from the job's result once, saved to ``outputs/`` and kept in the session."""
+    texts = st.session_state.transcripts
+    if job["id"] not in texts:
+        text = server.render(job["id"], "txt")
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        (OUTPUT_DIR / transcript_name(job)).write_text(text, encoding="utf-8")
+        texts[job["id"]] = text
+    return texts[job["id"]]
+
+
+def transcripts_zip(server: JobServer, jobs: list) -> bytes:
+    """Zip of the held transcripts, built and saved to ``outputs/`` only when the set of files changes."""
+    ids = tuple(job["id"] for job in jobs)
+    cached = st.session_state.get("transcripts_zip")
+    if cached is None or cached[0] != ids:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+            for job in jobs:
+                zf.writestr(transcript_name(job), transcript_text(server, job))
+        (OUTPUT_DIR / "transcripts.zip").write_bytes(buffer.getvalue())
+        cached = st.session_state.transcripts_zip = (ids, buffer.getvalue())
+    return cached[1]
+
+
+@st.fragment(run_every=2)
+def show_jobs() -> None:
+    """Progress and downloads of this session's jobs, refreshed without rerunning the page."""
+    server = get_job_server()
+    jobs = [(job, server.status(job["id"])) for job in st.session_state.jobs]
+    jobs = [(job, status) for job, status in jobs if status is not None]
+    if not jobs:
+        return
+    st.subheader("Jobs")
+    for job, status in jobs:
+        label = f"{job['name']} ({job['model']}) — {status['state']}"
+        if status["state"] == "done":
+            st.download_button(
+                f"Download {transcript_name(job)}",
+                data=transcript_text(server, job),
+                file_name=transcript_name(job),
+                mime="text/plain",
+                key=f"download_{job['id']}",
+            )
+        elif status["state"] in ("queued", "running"):
+            st.progress((status["percent"] or 0.0) / 100.0, text=label)
+            if st.button("Cancel", key=f"cancel_{job['id']}"):
+                server.cancel(job["id"])
+        else:
+            st.error(f"{label}: {status['error'] or 'cancelled'}")
+
+    finished = [job for job, status in jobs if status["state"] == "done"]
+    if len(finished) > 1 and st.session_state.get("bundle_zip"):
+        st.download_button("Download zip", data=transcripts_zip(server, finished), file_name="transcripts.zip", mime="application/zip")
+    if st.button("Clear finished"):
+        for job, status in jobs:
+            if status["state"] not in ("queued", "running"):
+                server.cancel(job["id"])
+                st.session_state.transcripts.pop(job["id"], None)
+        st.session_state.jobs = [job for job, status in jobs if status["state"] in ("queued", "running")]
+        st.rerun()
+
+
+if "jobs" not in st.session_state:
+    st.session_state.jobs = []
+if "transcripts" not in st.session_state:
+    st.session_state.transcripts = {}
 st.title("📝 Whisper Transcriber")
 
 st.markdown(
@@ -48,6 +169,7 @@ lang_choice = st.selectbox(
     key="language_select",
 )
 language = None if lang_choice[1] == "auto" else lang_choice[1]
+use_cache = st.checkbox("Reuse cached transcripts of identical files", value=True)
 
 if mode == "Single file":
     up_file = st.file_uploader("Upload file", type=["mp4", "mp3", "wav", "m4a"], accept_multiple_files=False)
@@ -55,55 +177,15 @@ if mode == "Single file":
         if not up_file:
             st.warning("Please upload a file first.")
         else:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(up_file.name).suffix) as tmp:
-                tmp.write(up_file.getbuffer())
-                tmp_path = Path(tmp.name)
-
-            output_dir = Path("outputs")
-            output_dir.mkdir(exist_ok=True)
-            out_path = output_dir / f"{Path(up_file.name).stem}_{model_size}.txt"
-
-            with st.spinner("Transcribing…"):
-                transcribe(str(tmp_path), str(out_path), model_size=model_size, language=language)
-
-            st.success("Done!")
-            st.download_button("Download transcript", data=out_path.read_text("utf‑8"), file_name=out_path.name, mime="text/plain")
+            submit_uploads([up_file], model_size, language, use_cache)
 
 else:  # Batch mode
     up_files = st.file_uploader("Select multiple files", type=["mp4", "mp3", "wav", "m4a"], accept_multiple_files=True)
-    zip_checkbox = st.checkbox("Bundle all transcripts into a zip archive")
-
+    st.checkbox("Bundle all transcripts into a zip archive", key="bundle_zip")
     if st.button("Transcribe all"):
         if not up_files:
             st.warning("Add at least one file.")
         else:
-            output_dir = Path("outputs")
-            output_dir.mkdir(exist_ok=True)
-            temp_dir = Path(tempfile.mkdtemp())
-            transcript_paths = []
-
-            progress = st.progress(0)
-            for idx, file in enumerate(up_files, start=1):
-                with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False, suffix=Path(file.name).suffix) as tmp:
-                    tmp.write(file.getbuffer())
-                    tmp_path = Path(tmp.name)
-
-                out_path = output_dir / f"{Path(file.name).stem}_{model_size}.txt"
-                transcribe(str(tmp_path), str(out_path), model_size=model_size, language=language)
-                transcript_paths.append(out_path)
-                progress.progress(idx / len(up_files))
-
-            st.success(f"Done! Processed {len(up_files)} files.")
-
-            if zip_checkbox:
-                zip_name = output_dir / "transcripts.zip"
-                with zipfile.ZipFile(zip_name, "w", zipfile.ZIP_DEFLATED) as zf:
-                    for p in transcript_paths:
-                        zf.write(p, arcname=p.name)
-                st.download_button("Download zip", data=zip_name.read_bytes(), file_name="transcripts.zip", mime="application/zip")
-            else:
-                for p in transcript_paths:
-                    st.download_button(f"Download {p.name}", data=p.read_text("utf‑8"), file_name=p.name, mime="text/plain")
-
-            # clean up temporary files
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            submit_uploads(up_files, model_size, language, use_cache)
+
+show_jobs()
@@ -0,0 +1,163 @@
+"""
+Memory-mapped cache of decoded 16 kHz audio and log-mel spectrograms.
+
+Re-running a corpus with another model size or language normally pays the
+full ffmpeg decode (and the mel computation) again. With an `AudioCache` the
+decoded waveform, and optionally the log-mel spectrogram, are stored as
+``.npy`` files next to a ``manifest.json`` and later mapped into memory
+instead of spawning ffmpeg. Entries are invalidated when the size or mtime of
+the source file changes.
+"""
+import hashlib
+import importlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+
+from file_lock import file_lock
+
+MANIFEST_NAME = "manifest.json"
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _source_stamp(media_path: str) -> dict:
+    stat = os.stat(media_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class AudioCache:
+    """
+    Directory of memory-mappable decoded audio (and mel) arrays.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Where the ``.npy`` files and the manifest are stored.
+    cache_mel : bool, optional
+        Also store the padded log-mel spectrogram used by Whisper, so the mel
+        computation is skipped on later runs. Defaults to False.
+    """
+
+    def __init__(self, cache_dir: str, cache_mel: bool = False) -> None:
+        self.cache_dir = cache_dir
+        self.cache_mel = cache_mel
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, MANIFEST_NAME)
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_manifest(self, source: str, entry: dict) -> None:
+        # Batch workers and separate runs share the cache directory, so the
+        # read-modify-write holds a file lock as well as the thread lock.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock, file_lock(f"{self.manifest_path}.lock"):
+            manifest = self._read_manifest()
+            manifest[source] = entry
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(tmp_path, self.manifest_path)
+
+    def _entry(self, media_path: str) -> "tuple[str, dict]":
+        source = os.path.abspath(media_path)
+        stamp = _source_stamp(media_path)
+        entry = self._read_manifest().get(source)
+        if entry is None or entry.get("size") != stamp["size"] or entry.get("mtime_ns") != stamp["mtime_ns"]:
+            entry = {**stamp, "id": hashlib.sha1(source.encode("utf-8")).hexdigest()}
+        return source, entry
+
+    def _array_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _map(self, name: Optional[str]) -> Optional[np.ndarray]:
+        if not name or not os.path.isfile(self._array_path(name)):
+            return None
+        # Copy-on-write mapping: zero-copy, but writable for torch.from_numpy().
+        return np.load(self._array_path(name), mmap_mode="c")
+
+    def _store(self, name: str, array: np.ndarray) -> np.ndarray:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._array_path(f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, self._array_path(name))
+        return self._map(name)
+
+    def load_audio(self, media_path: str) -> np.ndarray:
+        """Return the 16 kHz mono waveform of *media_path*, decoding it only on a miss."""
+        source, entry = self._entry(media_path)
+        audio = self._map(entry.get("audio"))
+        if audio is not None:
+            return audio
+        import whisper
+
+        name = f"{entry['id']}.audio.npy"
+        audio = self._store(name, whisper.load_audio(media_path))
+        self._update_manifest(source, {**entry, "audio": name, "mel": {}})
+        return audio
+
+    def load_mel(self, media_path: str, n_mels: int):
+        """Return Whisper's padded log-mel spectrogram (as a CPU tensor) for *media_path*."""
+        import torch
+        import whisper
+        from whisper.audio import N_SAMPLES
+
+        audio = self.load_audio(media_path)
+        source, entry = self._entry(media_path)
+        mel = self._map(entry.get("mel", {}).get(str(n_mels)))
+        if mel is None:
+            name = f"{entry['id']}.mel{n_mels}.npy"
+            computed = whisper.log_mel_spectrogram(torch.from_numpy(audio), n_mels, padding=N_SAMPLES)
+            mel = self._store(name, computed.numpy())
+            self._update_manifest(source, {**entry, "mel": {**entry.get("mel", {}), str(n_mels): name}})
+        return torch.from_numpy(mel)
+
+
+class _MelRouter:
+    """Replacement for ``log_mel_spectrogram`` as seen by whisper.transcribe."""
+
+    def __init__(self, original) -> None:
+        self._original = original
+
+    def __call__(self, *args, **kwargs):
+        mel = getattr(_local, "mel", None)
+        if mel is None:
+            return self._original(*args, **kwargs)
+        return mel
+
+
+def _install() -> None:
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        module = importlib.import_module("whisper.transcribe")
+        if not isinstance(module.log_mel_spectrogram, _MelRouter):
+            module.log_mel_spectrogram = _MelRouter(module.log_mel_spectrogram)
+        _installed = True
+
+
+@contextmanager
+def precomputed_mel(mel) -> Iterator[None]:
+    """Make ``model.transcribe()`` calls in this thread use *mel* instead of computing it."""
+    _install()
+    previous = getattr(_local, "mel", None)
+    _local.mel = mel
+    try:
+        yield
+    finally:
+        _local.mel = previous
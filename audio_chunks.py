@@ -0,0 +1,217 @@
+"""
+Chunked parallel transcription of a single long recording.
+
+The decoded 16 kHz waveform is cut at the quietest point near every chunk
+boundary, the chunks are transcribed concurrently in worker processes and the
+resulting segments are stitched back onto the original timeline. The worker
+processes are kept between calls, so each loads its model once.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from segments import merge_results, offset_segments
+
+SAMPLE_RATE = 16000
+# Frame used for the energy envelope when looking for silence (30 ms).
+ENERGY_FRAME = 480
+# Audio used for language detection (Whisper looks at one 30 s window).
+DETECT_SECONDS = 30
+
+
+def frame_energy(audio: np.ndarray, frame: int = ENERGY_FRAME) -> np.ndarray:
+    """RMS energy of consecutive non-overlapping frames of *audio*."""
+    usable = (len(audio) // frame) * frame
+    if usable == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def find_split_points(
+    audio: np.ndarray,
+    max_chunk_seconds: float,
+    search_seconds: Optional[float] = None,
+    sample_rate: int = SAMPLE_RATE,
+) -> List[int]:
+    """
+    Choose sample indices at which to cut *audio* into chunks no longer than
+    *max_chunk_seconds*.
+
+    Every cut is placed at the lowest-energy frame within the last
+    *search_seconds* before the length limit (default: a quarter of the chunk,
+    capped at 30 s), so words are not split in half.
+    """
+    max_samples = int(max_chunk_seconds * sample_rate)
+    if max_samples <= 0 or len(audio) <= max_samples:
+        return []
+    if search_seconds is None:
+        search_seconds = min(30.0, max_chunk_seconds / 4)
+    search_frames = max(1, int(search_seconds * sample_rate) // ENERGY_FRAME)
+    energy = frame_energy(audio)
+
+    points = []
+    start = 0
+    while len(audio) - start > max_samples:
+        limit_frame = (start + max_samples) // ENERGY_FRAME
+        first_frame = max(start // ENERGY_FRAME + 1, limit_frame - search_frames)
+        window = energy[first_frame:limit_frame]
+        if len(window) == 0:
+            cut = start + max_samples
+        else:
+            quietest = first_frame + int(np.argmin(window))
+            cut = quietest * ENERGY_FRAME + ENERGY_FRAME // 2
+        points.append(cut)
+        start = cut
+    return points
+
+
+def split_audio(
+    audio: np.ndarray,
+    max_chunk_seconds: float,
+    sample_rate: int = SAMPLE_RATE,
+) -> List[Tuple[float, np.ndarray]]:
+    """Split *audio* at silence into ``(offset_seconds, samples)`` chunks."""
+    bounds = [0] + find_split_points(audio, max_chunk_seconds, sample_rate=sample_rate) + [len(audio)]
+    return [
+        (start / sample_rate, audio[start:end])
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+def detect_language(model_size: str, device: str, precision: str, audio: np.ndarray) -> str:
+    """Run Whisper language detection on the first 30 seconds of *audio*."""
+    from language_detect import detect_model_language
+    from model_registry import get_model
+
+    return detect_model_language(get_model(model_size, device, precision), audio)[0]
+
+
+def _init_chunk_worker(num_threads: int, model_size: str, device: str, precision: str) -> None:
+    import torch
+
+    from model_registry import get_model
+
+    torch.set_num_threads(num_threads)
+    get_model(model_size, device, precision)
+
+
+def _transcribe_chunk(model_size: str, device: str, precision: str, audio: np.ndarray, options: dict) -> dict:
+    from model_registry import get_model
+
+    model = get_model(model_size, device, precision)
+    return model.transcribe(audio, **options)
+
+
+# The worker pool is kept between calls so its workers keep their models
+# loaded. A call with another model or worker count replaces it; the old pool
+# is shut down once the calls still using it have finished. The pool is keyed
+# on the requested worker count, so a file with fewer chunks than workers
+# reuses it rather than restarting it with fewer processes.
+_pool_lock = threading.Lock()
+_pool: Optional[Tuple[tuple, ProcessPoolExecutor]] = None
+_pool_users: Dict[ProcessPoolExecutor, int] = {}
+
+
+def _retire(executor: ProcessPoolExecutor) -> None:
+    if not _pool_users.get(executor):
+        _pool_users.pop(executor, None)
+        executor.shutdown(wait=False)
+
+
+@contextmanager
+def _chunk_pool(model_size: str, device: str, precision: str, workers: int) -> Iterator[ProcessPoolExecutor]:
+    global _pool
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    key = (model_size, device, precision, workers, threads)
+    with _pool_lock:
+        if _pool is None or _pool[0] != key:
+            if _pool is not None:
+                _retire(_pool[1])
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunk_worker,
+                initargs=(threads, model_size, device, precision),
+            )
+            _pool = (key, executor)
+        executor = _pool[1]
+        _pool_users[executor] = _pool_users.get(executor, 0) + 1
+    try:
+        yield executor
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is not None and _pool[1] is executor:
+                _pool = None  # a worker died; the next call starts a fresh pool
+        raise
+    finally:
+        with _pool_lock:
+            _pool_users[executor] -= 1
+            if _pool is None or _pool[1] is not executor:
+                _retire(executor)
+
+
+def shutdown_chunk_pool() -> None:
+    """Stop the chunk worker processes (they are also stopped at interpreter exit)."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool[1].shutdown(wait=True, cancel_futures=True)
+            _pool_users.pop(_pool[1], None)
+            _pool = None
+
+
+def transcribe_chunks(
+    audio: np.ndarray,
+    model_size: str,
+    device: str,
+    precision: str,
+    options: dict,
+    workers: int,
+    max_chunk_seconds: float = 600.0,
+    segment_callback: Optional[Callable[[List[dict], float, Optional[float]], None]] = None,
+) -> dict:
+    """
+    Transcribe *audio* as independent chunks in *workers* processes and merge
+    the results into a single Whisper-style result dict.
+
+    *options* are passed to ``model.transcribe()`` for every chunk. Each worker
+    gets an equal share of the CPU threads so the pool does not oversubscribe
+    cores. The workers stay up between calls with the model loaded (see
+    `shutdown_chunk_pool()`). *segment_callback* is called as each chunk
+    finishes with its segments (already on the original timeline), the seconds
+    finished so far and the total length.
+    """
+    chunks = split_audio(audio, max_chunk_seconds)
+    workers = max(1, workers)
+    parts = []
+    done_seconds = 0.0
+    total_seconds = len(audio) / SAMPLE_RATE
+    with _chunk_pool(model_size, device, precision, workers) as pool:
+        if options.get("language") is None and chunks:
+            # Detect the language once, in a worker that already holds the
+            # model, so every chunk decodes in the same language.
+            head = audio[: DETECT_SECONDS * SAMPLE_RATE]
+            language = pool.submit(detect_language, model_size, device, precision, head).result()
+            options = {**options, "language": language}
+        futures = {
+            pool.submit(_transcribe_chunk, model_size, device, precision, samples, options): (offset, len(samples))
+            for offset, samples in chunks
+        }
+        for future in as_completed(futures):
+            offset, n_samples = futures[future]
+            result = future.result()
+            parts.append((offset, result))
+            done_seconds += n_samples / SAMPLE_RATE
+            if segment_callback is not None:
+                segment_callback(offset_segments(result.get("segments", []), offset), done_seconds, total_seconds)
+    return merge_results(parts, language=options.get("language"))
@@ -0,0 +1,228 @@
+"""
+Bounded-memory streaming ingest for very long recordings.
+
+Instead of decoding the whole file into one float32 array (about 230 MB per
+hour of audio, plus the mel spectrogram), ffmpeg writes 16 kHz mono PCM into a
+pipe and the audio is transcribed window by window. Only the current window
+and the unfinished tail of the previous one are kept in memory.
+"""
+import os
+import struct
+import subprocess
+import sys
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+from segments import merge_results, offset_segments
+
+SAMPLE_RATE = 16000
+# Segments ending closer than this to the end of a window may have been cut
+# mid-phrase; they are re-decoded together with the next window.
+TAIL_GUARD_SECONDS = 5.0
+# Characters of committed text passed as the prompt for the next window.
+PROMPT_CHARS = 200
+# Bytes handed to ffmpeg per pipe write.
+_PIPE_BLOCK = 1024 * 1024
+# Containers ffmpeg can only read from a pipe when their index comes first.
+_ISO_BMFF_EXTS = {".mp4", ".m4a", ".mov", ".3gp"}
+
+
+def iter_pcm_windows(
+    media_path: str,
+    window_seconds: float,
+    sample_rate: int = SAMPLE_RATE,
+    start_seconds: float = 0.0,
+    first_window_seconds: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    """Yield consecutive float32 windows of *window_seconds* decoded by an ffmpeg pipe.
+
+    Decoding starts at *start_seconds*; the first window may have its own length.
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads",
+        "0",
+        *(["-ss", f"{start_seconds:.6f}"] if start_seconds > 0 else []),
+        "-i",
+        media_path,
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(sample_rate),
+        "-",
+    ]
+    window_bytes = int(window_seconds * sample_rate) * 2
+    first_bytes = int(round(first_window_seconds * sample_rate)) * 2 if first_window_seconds else window_bytes
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = proc.stdout.read(first_bytes or window_bytes)
+            first_bytes = None
+            if not data:
+                break
+            yield np.frombuffer(data[: len(data) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {media_path} (exit code {proc.returncode})")
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def pipe_decodable(data, filename: str) -> bool:
+    """
+    Whether ffmpeg can decode *data* (the bytes of *filename*) from a pipe.
+
+    MP4/M4A/MOV files need their ``moov`` index before the media data, since
+    a pipe cannot seek to an index written at the end; other formats stream.
+    """
+    if os.path.splitext(filename)[1].lower() not in _ISO_BMFF_EXTS:
+        return True
+    view = memoryview(data)
+    position = 0
+    while position + 8 <= len(view):
+        size, kind = struct.unpack(">I4s", view[position : position + 8])
+        if kind == b"moov":
+            return True
+        if kind == b"mdat":
+            return False
+        if size == 1 and position + 16 <= len(view):
+            size = struct.unpack(">Q", view[position + 8 : position + 16])[0]
+        if size < 8:
+            return False  # runs to the end of the file, or malformed
+        position += size
+    return False
+
+
+def decode_to_pcm(data, out, sample_rate: int = SAMPLE_RATE) -> None:
+    """
+    Decode the media file held in memory as *data* to 16-bit mono PCM on *out*.
+
+    *out* is a binary file object, e.g. the write end of a named pipe. The
+    bytes are fed to ffmpeg's stdin in slices of a ``memoryview``, so the
+    upload is neither copied nor written to disk. Read the result with
+    `load_pcm()`.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+    view = memoryview(data)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=out, stderr=subprocess.DEVNULL)
+    try:
+        for start in range(0, len(view), _PIPE_BLOCK):
+            proc.stdin.write(view[start : start + _PIPE_BLOCK])
+    except (BrokenPipeError, ValueError):
+        pass  # ffmpeg stopped reading; its exit code tells why
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    if proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed to decode the upload (exit code {proc.returncode})")
+
+
+def load_pcm(pcm_path: str) -> np.ndarray:
+    """Float32 waveform of the PCM written by `decode_to_pcm()` (as ``whisper.load_audio()`` returns it)."""
+    with open(pcm_path, "rb") as f:
+        data = f.read()
+    return np.frombuffer(data[: len(data) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the current process in MB (``None`` where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def transcribe_stream(
+    model,
+    media_path: str,
+    options: dict,
+    window_seconds: float = 300.0,
+    segment_callback: Optional[Callable[[List[dict], float, Optional[float]], None]] = None,
+    checkpoint=None,
+) -> dict:
+    """
+    Transcribe *media_path* window by window and return a merged Whisper result.
+
+    Segments that finish near the end of a window are not committed; their
+    audio is carried over and decoded again at the start of the next window,
+    and the tail of the committed text is used as the prompt, so phrases are
+    not cut at window boundaries. *segment_callback* receives the committed
+    segments of every window (on the original timeline) and the seconds done.
+
+    With a `checkpoints.Checkpoint` every window is recorded, and a checkpoint
+    that already holds windows is resumed: decoding restarts at the committed
+    position with the same window boundaries and prompt.
+    """
+    options = {key: value for key, value in options.items() if key != "verbose"}
+    parts = []
+    carry = np.zeros(0, dtype=np.float32)
+    offset = 0.0
+    prompt = options.pop("initial_prompt", None)
+    language = options.get("language")
+    first_window_seconds = None
+    if checkpoint is not None and checkpoint.resumed:
+        offset = checkpoint.seek
+        language = language or checkpoint.language
+        prompt = checkpoint.prompt if checkpoint.prompt is not None else prompt
+        if checkpoint.window_end is not None:
+            # The carried-over tail plus the next window, as in an uninterrupted run.
+            first_window_seconds = checkpoint.window_end - offset + window_seconds
+        parts.append((0.0, {"text": checkpoint.text, "segments": list(checkpoint.segments), "language": language}))
+        if segment_callback is not None:
+            segment_callback(list(checkpoint.segments), offset, None)
+
+    windows = iter_pcm_windows(media_path, window_seconds, start_seconds=offset, first_window_seconds=first_window_seconds)
+    window = next(windows, None)
+    while window is not None:
+        next_window = next(windows, None)
+        is_last = next_window is None
+        buffer = np.concatenate([carry, window]) if len(carry) else window
+        buffer_seconds = len(buffer) / SAMPLE_RATE
+        result = model.transcribe(buffer, initial_prompt=prompt, **{**options, "language": language})
+        language = language or result.get("language")
+        segments = result.get("segments", [])
+
+        if is_last:
+            committed, commit_until = segments, buffer_seconds
+        else:
+            committed = [s for s in segments if s["end"] <= buffer_seconds - TAIL_GUARD_SECONDS]
+            if not committed:
+                committed = segments
+            commit_until = committed[-1]["end"] if committed else buffer_seconds
+
+        text = "".join(s["text"] for s in committed)
+        parts.append((offset, {"text": text, "segments": committed, "language": language}))
+        if text.strip():
+            prompt = text[-PROMPT_CHARS:]
+        commit_samples = min(len(buffer), int(round(commit_until * SAMPLE_RATE)))
+        carry = buffer[commit_samples:].copy()
+        if checkpoint is not None:
+            checkpoint.record(
+                offset_segments(committed, offset),
+                offset + commit_samples / SAMPLE_RATE,
+                window_end=offset + buffer_seconds,
+                language=language,
+                prompt=prompt,
+            )
+        if segment_callback is not None:
+            segment_callback(offset_segments(committed, offset), offset + commit_samples / SAMPLE_RATE, None)
+        offset += commit_samples / SAMPLE_RATE
+        window = next_window
+        del buffer
+
+    return merge_results(parts, language=language)
@@ -1,9 +1,35 @@
 from pathlib import Path
 import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+import whisper
 from tqdm.auto import tqdm
-from transcribe_video import transcribe, _probe_duration_seconds, _timestamps_output_path, make_progress_printer
+from progress_events import SegmentEvent
+from transcribe_video import transcribe, _cache_options, _cascade_thresholds_from_args, _probe_duration_seconds
+from cascade import CascadeThresholds
+from audio_cache import AudioCache
+from checkpoints import DEFAULT_CHECKPOINT_DIR, pending_checkpoint
+from corpus_index import DEFAULT_INDEX_DIR, CorpusIndex
+from engines import ENGINES, resolve_engine, uses_fp16
+from language_detect import LanguageDetector
+from profiling import Profiler, format_summary, load_records, timed
+from transcript_cache import default_cache
+from transcript_writers import TIMESTAMP_FORMATS, TranscriptWriters, parse_formats, timestamps_output_path
+from prefetch import DEFAULT_DEPTH, DEFAULT_MAX_BYTES, Prefetcher, audio_bytes, probe_all
+from model_registry import enable_shared_weights
+from work_manifest import DEFAULT_LEASE_SECONDS, MANIFEST_DIR, LeaseLost, WorkManifest, format_progress
 
 SUPPORTED_EXTS = {".mp4", ".m4a", ".mp3", ".wav"}
+# Files up to this length go through the batched path with --batch-size.
+BATCH_MAX_SECONDS = 120.0
+# Corpus-wide progress reads a marker per file from the shared manifest, so
+# --manifest runs report it at most this often instead of after every file.
+MANIFEST_PROGRESS_SECONDS = 30.0
 
 
 def _detect_language_from_name(name: str, default: str = "ru") -> str:
@@ -22,12 +48,168 @@ def _detect_language_from_name(name: str, default: str = "ru") -> str:
     return default
 
 
+def _job_audio_cache(job: dict):
+    if not job.get("audio_cache"):
+        return None
+    return AudioCache(job["audio_cache"], cache_mel=job["cache_mel"])
+
+
+def _prefetch_audio(job: dict) -> np.ndarray | None:
+    """Decode *job*'s audio ahead of its turn; None where `transcribe` should
+    read the file itself (the mel cache needs the path, and a cached
+    transcript needs no audio at all)."""
+    if job["cache_mel"] or (job["use_cache"] and _cached(job)):
+        return None
+    profiler = _job_profiler(job)
+    audio_cache = _job_audio_cache(job)
+    with timed(profiler and profiler.for_file(job["media_path"]), "audio_decode", cached=audio_cache is not None, prefetched=True):
+        if audio_cache is not None:
+            return audio_cache.load_audio(job["media_path"])
+        return whisper.load_audio(job["media_path"])
+
+
+def _cached(job: dict) -> bool:
+    """Whether the transcript cache already holds *job*'s result, keyed as `transcribe` keys it."""
+    import torch
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    engine = resolve_engine(job["engine"], device)
+    options = _cache_options(
+        engine, uses_fp16(engine, device), vad=job["vad"],
+        cascade_model=job["cascade_model"], cascade_thresholds=job["cascade_thresholds"],
+    )
+    cache = default_cache()
+    return cache.contains(cache.key(job["media_path"], job["model_size"], job["language"], options))
+
+
+def _job_corpus(job: dict):
+    if not job.get("index_dir"):
+        return None
+    return CorpusIndex(job["index_dir"])
+
+
+def _job_profiler(job: dict):
+    if not job.get("profile"):
+        return None
+    return Profiler(job["profile"], run_id=job["profile_run"])
+
+
+def _job_manifest(job: dict):
+    if not job.get("manifest"):
+        return None
+    return WorkManifest(**job["manifest"])
+
+
+def _output_paths(out_txt: str, formats: list) -> list:
+    return [out_txt] + [timestamps_output_path(out_txt, fmt) for fmt in formats]
+
+
+def _transcribe_job(job: dict, events=None) -> dict:
+    """Worker entry point: transcribe one file. The model registry is
+    process-global, so a pool worker keeps its model loaded between jobs.
+    Progress is sent to the parent as ``(media_path, seconds)`` on *events*.
+
+    In manifest mode the outputs are written under staging names and only
+    moved into place while this node's lease is valid; the lease is also
+    checked as windows are decoded, and `work_manifest.LeaseLost` is raised
+    as soon as it is gone, so a node that lost a file never overwrites the
+    outputs of the node that took it over."""
+    manifest = _job_manifest(job)
+    out_txt = job["out_txt"]
+    if manifest is not None:
+        base, ext = os.path.splitext(out_txt)
+        out_txt = f"{base}.{manifest.file_id(manifest.node_id)}.partial{ext}"
+    next_check = time.monotonic()
+
+    def on_segment(event: SegmentEvent) -> None:
+        nonlocal next_check
+        if events is not None:
+            events.put((job["media_path"], event.seconds))
+        if manifest is not None and time.monotonic() >= next_check:
+            if not manifest.holds(job["manifest_key"]):
+                raise LeaseLost(f"lease of {job['manifest_key']} expired or was taken over")
+            next_check = time.monotonic() + manifest.lease_seconds / 8
+
+    try:
+        result = _transcribe_to(job, out_txt, on_segment, corpus=None if manifest is not None else _job_corpus(job))
+        if manifest is not None:
+            if not manifest.holds(job["manifest_key"]):
+                raise LeaseLost(f"lease of {job['manifest_key']} expired or was taken over")
+            for staged, final in zip(_output_paths(out_txt, job["timestamps_format"]), _output_paths(job["out_txt"], job["timestamps_format"])):
+                if os.path.exists(staged):
+                    os.replace(staged, final)
+            corpus = _job_corpus(job)
+            if corpus is not None:
+                corpus.add(job["out_txt"], result.get("segments", []), media=job["media_path"], language=result.get("language"))
+    finally:
+        if manifest is not None:
+            for staged in _output_paths(out_txt, job["timestamps_format"]):
+                if os.path.exists(staged):
+                    os.remove(staged)
+    segments = result.get("segments", [])
+    return {
+        **job,
+        "audio_seconds": job["duration"] or (segments[-1]["end"] if segments else 0.0),
+        "ingest": result["metrics"]["ingest"],
+        "engine": result["metrics"]["engine"],
+        "vad_skipped_seconds": result["metrics"].get("vad_skipped_seconds"),
+        "cascade": result["metrics"].get("cascade"),
+    }
+
+
+def _transcribe_to(job: dict, out_txt: str, on_segment, corpus) -> dict:
+    return transcribe(
+        job["media_path"],
+        out_txt,
+        model_size=job["model_size"],
+        language=job["language"],
+        timestamps_format=job["timestamps_format"],
+        progress_total=job["duration"],
+        on_segment=on_segment,
+        cache=default_cache() if job["use_cache"] else None,
+        audio_cache=_job_audio_cache(job),
+        profiler=_job_profiler(job),
+        checkpoint_dir=job["checkpoint_dir"],
+        engine=job["engine"],
+        threads=job["threads"],
+        interop_threads=job["interop_threads"],
+        vad=job["vad"],
+        corpus=corpus,
+        cascade_model=job["cascade_model"],
+        cascade_thresholds=job["cascade_thresholds"],
+    )
+
+
 def batch_transcribe(
     input_dir: Path = Path("video"),
     output_dir: Path = Path("outputs"),
     model_size: str = "medium",
     language: str | None = "ru",
-    timestamps_format: str = "none",
+    timestamps_format: str | list[str] = "none",
+    workers: int = 1,
+    use_cache: bool = False,
+    audio_cache_dir: Path | None = None,
+    cache_mel: bool = False,
+    detect_language: bool = False,
+    detect_model: str = "tiny",
+    min_language_probability: float = 0.5,
+    profile_path: Path | None = None,
+    checkpoint_dir: Path | None = None,
+    engine: str = "auto",
+    threads: int | None = None,
+    interop_threads: int | None = None,
+    batch_size: int = 1,
+    batch_wait: float = 0.2,
+    prefetch: int = DEFAULT_DEPTH,
+    prefetch_bytes: int = DEFAULT_MAX_BYTES,
+    vad: bool = False,
+    manifest_dir: Path | None = None,
+    node_id: str | None = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    index_dir: Path | None = None,
+    cascade_model: str | None = None,
+    cascade_thresholds: CascadeThresholds | None = None,
+    shared_weights: bool = False,
 ) -> None:
     """Batch-transcribe every media file in *input_dir* by reusing the
     single-file `transcribe` helper.
@@ -40,6 +222,101 @@ def batch_transcribe(
     - If the stem starts with ``en`` -> force English.
     - If the stem starts with ``ru`` -> force Russian.
     - Otherwise use the fallback *language* value.
+
+    With ``detect_language=True`` the file name is ignored; instead Whisper's
+    language identification runs on the first 30 seconds of every file with the
+    small *detect_model* (kept loaded for the whole pre-pass). Detections below
+    *min_language_probability* fall back to *language*. Results are cached per
+    file, and jobs are grouped by language.
+
+    Parallelism
+    -----------
+    With ``workers > 1`` files are distributed over a process pool; every
+    worker loads the model once and keeps it for all of its files. Jobs are
+    submitted longest-first (by ffprobe duration) so a long recording does not
+    end up running alone at the end. Progress is reported in audio seconds.
+
+    All files are probed concurrently up front. In the single-worker path the
+    next *prefetch* files are decoded in the background (see `prefetch`) while
+    the current one is transcribed, with at most *prefetch_bytes* of decoded
+    audio waiting; ``prefetch=0`` decodes each file in its turn.
+
+    With ``shared_weights=True`` (see `shared_weights`) the CPU weights are
+    memory-mapped from one fp32 file, so the workers hold a single copy and
+    *workers* is limited by cores rather than RAM.
+
+    Caching
+    -------
+    With ``use_cache=True`` every file is looked up in the content-addressed
+    transcript cache first, so renamed or re-uploaded copies of a recording
+    (with the same model and language) are not transcribed again.
+    *audio_cache_dir* keeps the decoded audio (and with *cache_mel* the log-mel
+    spectrogram) as memory-mapped arrays, so re-running the corpus with another
+    model or language skips ffmpeg.
+
+    Profiling
+    ---------
+    With *profile_path* every worker appends per-stage wall/CPU timings,
+    per-window decode latencies and fallback counts to that JSON-lines file
+    (see `profiling.Profiler`); a summary table of this run is printed at the end.
+
+    Resuming
+    --------
+    With *checkpoint_dir* every decoded window is checkpointed, so re-running
+    an interrupted batch continues each unfinished file where it stopped
+    instead of starting it over (see `checkpoints.Checkpoint`).
+
+    Engines and threads
+    -------------------
+    *engine* selects the inference variant of the model (``fp32``, ``fp16``,
+    ``int8``, ``compile``; see `engines`). *threads* and *interop_threads*
+    are the torch thread counts of every worker; with ``workers > 1`` the
+    intra-op threads default to an equal share of the CPU cores so the pool
+    does not oversubscribe them.
+
+    Batched inference
+    -----------------
+    With ``batch_size > 1`` files of up to `BATCH_MAX_SECONDS` are transcribed
+    in this process by a
+    `batched_inference.BatchedTranscriber`: the 30-second windows of up to
+    *batch_size* files are decoded in one batched forward pass, waiting at most
+    *batch_wait* seconds to fill a batch. This is much faster than one
+    ``model.transcribe()`` call per file on corpora of short clips. Longer
+    files, and files whose duration could not be probed, then run through the
+    regular (sequential or *workers*) path. Profiling and checkpoints do not
+    apply to batched files. A batched file that fails is reported and skipped
+    without stopping the others.
+
+    Voice activity
+    --------------
+    With ``vad=True`` silence and music are cut out of every file before
+    inference (see `vad`); timestamps stay on the original timeline and the
+    total skipped audio is reported at the end.
+
+    Model cascade
+    -------------
+    With *cascade_model* every file is transcribed with *model_size* first
+    and only its low-confidence segments (see *cascade_thresholds* and
+    `cascade`) are decoded again with the larger model. The share of audio
+    that was escalated is reported at the end. Batched inference is not used
+    in this mode.
+
+    Search index
+    ------------
+    With *index_dir* the segments of every finished file (including cache
+    hits) are added to a `corpus_index.CorpusIndex` there, so the corpus can
+    be searched by phrase and time range without re-reading the outputs.
+
+    Several nodes
+    -------------
+    With *manifest_dir* (a `work_manifest.WorkManifest` directory on storage
+    shared by all nodes) any number of machines can run this function on the
+    same input and output directories: every file is claimed with a lease
+    before it is transcribed, so each is done by one node only, and the files
+    of a node that dies are taken over by the others once its leases
+    (*lease_seconds*) expire. With *checkpoint_dir* on the shared storage too,
+    the node taking over continues mid-file. Batched inference is not used in
+    this mode.
     """
     if not input_dir.exists():
         raise FileNotFoundError(f"Directory {input_dir} does not exist.")
@@ -50,46 +327,415 @@ def batch_transcribe(
         return
 
     output_dir.mkdir(parents=True, exist_ok=True)
+    if shared_weights:
+        enable_shared_weights()
+    manifest = None
+    if manifest_dir is not None:
+        manifest = WorkManifest(str(manifest_dir), node_id, lease_seconds)
+        manifest.register(p.name for p in media_files)
+    timestamps_formats = parse_formats(timestamps_format)
+    profiler = Profiler(str(profile_path)) if profile_path else None
+    if threads is None and workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // min(workers, len(media_files)))
 
-    with tqdm(total=len(media_files), desc="Transcribing files", unit="file") as progress:
-        for media_path in media_files:
-            duration_seconds = _probe_duration_seconds(str(media_path))
-            # Choose language for this particular file based on its name.
-            # Example: "en_interview1.mp4" -> "en", "ru_sozvon.wav" -> "ru".
-            file_language = _detect_language_from_name(
-                media_path.stem,
-                default=language or "ru",
-            )
-            out_txt = output_dir / f"{media_path.stem}.txt"
-            timestamps_path = None
-            if timestamps_format != "none":
-                timestamps_path = Path(
-                    _timestamps_output_path(str(out_txt), timestamps_format)
+    jobs = []
+    for media_path in media_files:
+        # Choose language for this particular file based on its name.
+        # Example: "en_interview1.mp4" -> "en", "ru_sozvon.wav" -> "ru".
+        file_language = _detect_language_from_name(
+            media_path.stem,
+            default=language or "ru",
+        )
+        out_txt = output_dir / f"{media_path.stem}.txt"
+        timestamps_paths = [
+            Path(timestamps_output_path(str(out_txt), fmt)) for fmt in timestamps_formats
+        ]
+        if manifest is not None:
+            state = manifest.state(media_path.name)
+            if state in ("done", "failed"):
+                tqdm.write(f"[skip] {media_path.name} is {state} in the manifest, skipping.")
+                continue
+            # Outputs of other nodes' running (or crashed) jobs exist too, so only
+            # files nobody has touched are trusted to be complete.
+            untouched = state == "free" and manifest.attempts(media_path.name) == 0
+        else:
+            untouched = True
+        # An interrupted run of this file is resumed even if older outputs exist.
+        if checkpoint_dir is not None and pending_checkpoint(str(checkpoint_dir), str(media_path), model_size):
+            untouched = False
+        if untouched and out_txt.exists() and all(path.exists() for path in timestamps_paths):
+            tqdm.write(f"[skip] {out_txt.name} already exists, skipping.")
+            continue
+        jobs.append(
+            {
+                "media_path": str(media_path),
+                "out_txt": str(out_txt),
+                "model_size": model_size,
+                "language": file_language,
+                "timestamps_format": timestamps_formats,
+                "duration": None,
+                "use_cache": use_cache,
+                "audio_cache": str(audio_cache_dir) if audio_cache_dir else None,
+                "cache_mel": cache_mel,
+                "profile": profiler.path if profiler else None,
+                "profile_run": profiler.run_id if profiler else None,
+                "checkpoint_dir": str(checkpoint_dir) if checkpoint_dir else None,
+                "engine": engine,
+                "threads": threads,
+                "interop_threads": interop_threads,
+                "vad": vad,
+                "manifest_key": media_path.name,
+                "index_dir": str(index_dir) if index_dir else None,
+                "cascade_model": cascade_model,
+                "cascade_thresholds": cascade_thresholds,
+            }
+        )
+
+    def probe(media_path: str) -> float | None:
+        with timed(profiler and profiler.for_file(media_path), "probe"):
+            return _probe_duration_seconds(media_path)
+
+    # ffprobe mostly waits on the disk, so all files are probed at once.
+    for job, duration in zip(jobs, probe_all([job["media_path"] for job in jobs], probe)):
+        job["duration"] = duration
+
+    if detect_language and jobs:
+        _detect_job_languages(jobs, detect_model, language or "ru", min_language_probability, profiler)
+        # Keep files of one language together (biggest group first) so workers
+        # reuse the warm tokenizer/decoder state; longest first inside a group.
+        group_seconds = {}
+        for job in jobs:
+            group_seconds[job["language"]] = group_seconds.get(job["language"], 0.0) + (job["duration"] or 0.0)
+        jobs.sort(key=lambda job: (-group_seconds[job["language"]], job["language"], -(job["duration"] or 0.0)))
+    else:
+        # Longest first: the tail of the run is then made of short files that
+        # spread evenly over the workers.
+        jobs.sort(key=lambda job: job["duration"] or 0.0, reverse=True)
+    total_seconds = sum(job["duration"] or 0.0 for job in jobs)
+
+    with tqdm(total=total_seconds, desc="Transcribing audio", unit="s") as progress:
+        remaining = jobs
+        if manifest is not None:
+            _run_manifest(jobs, manifest, workers, progress)
+            remaining = []
+        elif batch_size > 1 and not cascade_model:
+            batched = [job for job in jobs if _batchable(job)]
+            remaining = [job for job in jobs if not _batchable(job)]
+            if batched:
+                _run_batched(batched, batch_size, batch_wait, progress)
+        if workers > 1 and len(remaining) > 1:
+            _run_parallel(remaining, workers, progress)
+        elif remaining:
+            _run_sequential(remaining, progress, prefetch, prefetch_bytes)
+
+    print(f"[OK] Completed {len(media_files)} files. Transcripts saved to {output_dir}")
+    if jobs:
+        print(f"[engine] {jobs[0]['engine']}, threads per worker={threads or 'default'}")
+    if manifest is not None:
+        print(f"[manifest] node {manifest.node_id}: {manifest.completed} done, {manifest.failed} failed, "
+              f"{manifest.reclaimed} expired leases reclaimed")
+        print(format_progress(manifest.progress()))
+    errors = [job for job in jobs if job.get("error")]
+    if errors:
+        print(f"[FAILED] {len(errors)} files: " + ", ".join(Path(job["media_path"]).name for job in errors))
+    if vad and jobs:
+        skipped = sum(job.get("vad_skipped_seconds") or 0.0 for job in jobs)
+        print(f"[vad] skipped {skipped:,.1f}s of silence and music")
+    if cascade_model and jobs:
+        reports = [job["cascade"] for job in jobs if job.get("cascade")]
+        escalated = sum(report["escalated_seconds"] for report in reports)
+        audio = sum(report["audio_seconds"] for report in reports)
+        share = 100 * escalated / audio if audio else 0.0
+        print(f"[cascade] re-decoded {escalated:,.1f}s of {audio:,.1f}s ({share:.0f}%) with {cascade_model}")
+    if use_cache:
+        hits = sum(1 for job in jobs if job.get("ingest") == "cache")
+        stats = default_cache().stats()
+        print(
+            f"[cache] hits={hits} misses={len(jobs) - hits} "
+            f"entries={stats['entries']} size={stats['bytes'] / 1024 / 1024:.1f} MB"
+        )
+    if profiler is not None:
+        print(format_summary(load_records(profiler.path, profiler.run_id)))
+        print(f"[profile] run {profiler.run_id} saved to {profiler.path}")
+
+
+def _detect_job_languages(jobs: list, detect_model: str, fallback: str, min_probability: float, profiler=None) -> None:
+    detector = LanguageDetector(detect_model)
+    try:
+        for job in tqdm(jobs, desc="Detecting languages", unit="file"):
+            with timed(profiler and profiler.for_file(job["media_path"]), "detect_language"):
+                detected, probability = detector.detect(job["media_path"])
+            job["language_probability"] = probability
+            job["language"] = detected if probability >= min_probability else fallback
+            tqdm.write(f"[lang] {Path(job['media_path']).name}: {detected} (p={probability:.2f}) -> {job['language']}")
+    finally:
+        detector.save()
+
+
+class _SecondsAdvancer:
+    """Turn absolute "seconds transcribed" reports of several files into
+    increments of one shared bar."""
+
+    def __init__(self, progress: tqdm) -> None:
+        self._progress = progress
+        self._reported = {}
+
+    def advance(self, key: str, seconds: float) -> None:
+        last = self._reported.get(key, 0.0)
+        if seconds > last:
+            self._progress.update(seconds - last)
+            self._reported[key] = seconds
+
+
+def _run_sequential(jobs: list, progress: tqdm, prefetch: int = 0, prefetch_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    advancer = _SecondsAdvancer(progress)
+    if prefetch > 0 and len(jobs) > 1:
+        prefetcher = Prefetcher(jobs, _prefetch_audio, prefetch, prefetch_bytes, lambda job: audio_bytes(job["duration"]))
+        items = iter(prefetcher)
+    else:
+        prefetcher = None
+        items = ((job, None) for job in jobs)
+    for done, (job, audio) in enumerate(items, start=1):
+        tqdm.write(f"[->] {Path(job['media_path']).name} (lang={job['language']}) -> {Path(job['out_txt']).name}")
+        result = transcribe(
+            job["media_path"],
+            job["out_txt"],
+            model_size=job["model_size"],
+            language=job["language"],
+            timestamps_format=job["timestamps_format"],
+            progress_total=job["duration"],
+            on_segment=lambda event, key=job["media_path"]: advancer.advance(key, event.seconds),
+            cache=default_cache() if job["use_cache"] else None,
+            audio_cache=_job_audio_cache(job),
+            profiler=_job_profiler(job),
+            checkpoint_dir=job["checkpoint_dir"],
+            engine=job["engine"],
+            threads=job["threads"],
+            interop_threads=job["interop_threads"],
+            vad=job["vad"],
+            corpus=_job_corpus(job),
+            cascade_model=job["cascade_model"],
+            cascade_thresholds=job["cascade_thresholds"],
+            audio=audio,
+        )
+        del audio
+        job["ingest"] = result["metrics"]["ingest"]
+        job["engine"] = result["metrics"]["engine"]
+        job["vad_skipped_seconds"] = result["metrics"].get("vad_skipped_seconds")
+        job["cascade"] = result["metrics"].get("cascade")
+        advancer.advance(job["media_path"], job["duration"] or 0.0)
+        tqdm.write(f"    OK done ({done}/{len(jobs)})")
+    if prefetcher is not None:
+        tqdm.write(
+            f"[prefetch] {prefetcher.hits} of {len(jobs)} files decoded ahead, "
+            f"peak buffer {prefetcher.peak_bytes / 1024 / 1024:,.0f} MB"
+        )
+
+
+def _run_parallel(jobs: list, workers: int, progress: tqdm) -> None:
+    # "spawn" keeps torch/OpenMP state out of the children and behaves the
+    # same on Linux and Windows.
+    context = multiprocessing.get_context("spawn")
+    advancer = _SecondsAdvancer(progress)
+    with context.Manager() as manager, ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+        events = manager.Queue()
+        positions = {pool.submit(_transcribe_job, job, events): idx for idx, job in enumerate(jobs)}
+        pending = set(positions)
+        done = 0
+        while pending:
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            _drain_events(events, advancer)
+            for future in finished:
+                job = jobs[positions[future]]
+                job.update(future.result())
+                done += 1
+                advancer.advance(job["media_path"], job["duration"] or 0.0)
+                tqdm.write(f"    OK {Path(job['out_txt']).name} ({done}/{len(jobs)})")
+
+
+def _run_manifest(jobs: list, manifest: WorkManifest, workers: int, progress: tqdm) -> None:
+    """Claim and transcribe *jobs* until every one is done or failed on some node."""
+    context = multiprocessing.get_context("spawn")
+    advancer = _SecondsAdvancer(progress)
+    poll = min(5.0, manifest.lease_seconds / 4)
+    pending = list(jobs)
+    running = {}
+    next_report = time.monotonic()
+    with manifest.heartbeat(), context.Manager() as manager, ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        events = manager.Queue()
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= workers:
+                    break
+                key = job["manifest_key"]
+                state = manifest.state(key)
+                if state in ("done", "failed"):
+                    # Finished (or given up) on another node.
+                    pending.remove(job)
+                    advancer.advance(job["media_path"], job["duration"] or 0.0)
+                elif state in ("free", "expired") and manifest.claim(key):
+                    pending.remove(job)
+                    job["manifest"] = {"root": manifest.root, "node_id": manifest.node_id, "lease_seconds": manifest.lease_seconds}
+                    running[pool.submit(_transcribe_job, job, events)] = (job, time.perf_counter())
+            if not running:
+                # The rest is leased by other nodes: wait for them to finish or their leases to expire.
+                time.sleep(poll)
+                continue
+            finished, _ = wait(list(running), timeout=poll, return_when=FIRST_COMPLETED)
+            _drain_events(events, advancer)
+            for future in finished:
+                job, started = running.pop(future)
+                key = job["manifest_key"]
+                if key in manifest.lost:
+                    tqdm.write(f"[manifest] lease of {key} was taken over by another node while running")
+                try:
+                    job.update(future.result())
+                except LeaseLost:
+                    manifest.release(key)
+                    tqdm.write(f"    LOST {Path(job['media_path']).name}: lease expired, outputs discarded for the new owner")
+                    continue
+                except Exception as exc:
+                    manifest.fail(key, f"{type(exc).__name__}: {exc}")
+                    tqdm.write(f"    FAILED {Path(job['media_path']).name}: {exc}")
+                    continue
+                manifest.complete(key, audio_seconds=job["audio_seconds"], wall_seconds=round(time.perf_counter() - started, 2))
+                advancer.advance(job["media_path"], job["duration"] or 0.0)
+                if time.monotonic() < next_report:
+                    tqdm.write(f"    OK {Path(job['out_txt']).name}")
+                    continue
+                next_report = time.monotonic() + MANIFEST_PROGRESS_SECONDS
+                overall = manifest.progress()
+                tqdm.write(
+                    f"    OK {Path(job['out_txt']).name} (corpus: {overall['done']}/{overall['files']} done, "
+                    f"{overall['running']} running on {len(overall['nodes'])} nodes)"
                 )
-            if out_txt.exists() and (
-                timestamps_format == "none"
-                or (timestamps_path is not None and timestamps_path.exists())
-            ):
-                tqdm.write(f"[skip] {out_txt.name} already exists, skipping.")
-                progress.update(1)
+
+
+def _batchable(job: dict) -> bool:
+    # Unprobed files may be long: they keep previous-text conditioning,
+    # workers and checkpoints on the regular path.
+    return job["duration"] is not None and job["duration"] <= BATCH_MAX_SECONDS
+
+
+def _run_batched(jobs: list, batch_size: int, max_wait: float, progress: tqdm) -> None:
+    import torch
+    import whisper
+
+    from batched_inference import BatchedTranscriber
+    from engines import configure_threads, resolve_engine, uses_fp16
+    from model_registry import default_registry
+    from vad import compact, speech_regions
+
+    # All jobs of a batch run share the model settings.
+    first = jobs[0]
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    engine = resolve_engine(first["engine"], device)
+    configure_threads(first["threads"], first["interop_threads"])
+    use_fp16 = uses_fp16(engine, device)
+    job_options = {"fp16": use_fp16, "batched": True}
+    if engine == "int8":
+        job_options["engine"] = engine
+    if first["vad"]:
+        job_options["vad"] = True
+    cache = default_cache() if first["use_cache"] else None
+    corpus = _job_corpus(first)
+    model = default_registry.get(first["model_size"], device, engine)
+
+    advancer = _SecondsAdvancer(progress)
+    finished = queue.Queue()
+    # Bounds the decoded audio held in memory while the batcher is busy.
+    in_flight = threading.BoundedSemaphore(2 * batch_size)
+    done = 0
+    started = time.perf_counter()
+
+    def save(job: dict, result: dict, ingest: str, cache_key=None) -> None:
+        nonlocal done
+        with TranscriptWriters(job["out_txt"], job["timestamps_format"]) as writers:
+            writers.write(result.get("segments", []))
+        if corpus is not None:
+            corpus.add(job["out_txt"], result.get("segments", []), media=job["media_path"], language=result.get("language"))
+        if cache_key is not None:
+            cache.put(cache_key, result)
+        job["ingest"] = ingest
+        job["engine"] = engine
+        done += 1
+        advancer.advance(job["media_path"], job["duration"] or 0.0)
+        tqdm.write(f"    OK {Path(job['out_txt']).name} ({done}/{len(jobs)})")
+
+    def failed(job: dict, exc: BaseException) -> None:
+        nonlocal done
+        job["error"] = f"{type(exc).__name__}: {exc}"
+        done += 1
+        advancer.advance(job["media_path"], job["duration"] or 0.0)
+        tqdm.write(f"    FAILED {Path(job['media_path']).name}: {exc}")
+
+    def drain() -> None:
+        while True:
+            try:
+                job, future, cache_key, speech_map = finished.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = future.result()
+            except Exception as exc:
+                failed(job, exc)
+                continue
+            if speech_map is not None:
+                result = speech_map.remap_result(result)
+            save(job, result, "batched", cache_key)
+
+    def on_done(future, job: dict, cache_key, speech_map) -> None:
+        in_flight.release()
+        finished.put((job, future, cache_key, speech_map))
+
+    with BatchedTranscriber(model, max_batch_size=batch_size, max_wait=max_wait, fp16=use_fp16) as batcher:
+        for job in jobs:
+            drain()
+            cache_key = None
+            if cache is not None:
+                cache_key = cache.key(job["media_path"], job["model_size"], job["language"], job_options)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    save(job, cached, "cache")
+                    continue
+            audio_cache = _job_audio_cache(job)
+            try:
+                if audio_cache is not None:
+                    audio = audio_cache.load_audio(job["media_path"])
+                else:
+                    audio = whisper.load_audio(job["media_path"])
+            except Exception as exc:
+                failed(job, exc)
                 continue
-            tqdm.write(f"[->] {media_path.name} (lang={file_language}) -> {out_txt.name}")
-            progress_callback = make_progress_printer(duration_seconds, label=media_path.name)
-            transcribe(
-                str(media_path),
-                str(out_txt),
-                model_size=model_size,
-                language=file_language,
-                timestamps_format=timestamps_format,
-                progress_callback=progress_callback,
-                progress_total=duration_seconds,
+            speech_map = None
+            if job["vad"]:
+                audio, speech_map = compact(audio, speech_regions(audio))
+                job["vad_skipped_seconds"] = round(speech_map.skipped_seconds, 2)
+                if not speech_map.pieces:
+                    save(job, {"text": "", "segments": [], "language": job["language"]}, "batched", cache_key)
+                    continue
+            in_flight.acquire()
+            future = batcher.submit(audio, job["language"])
+            future.add_done_callback(
+                lambda future, job=job, key=cache_key, speech_map=speech_map: on_done(future, job, key, speech_map)
             )
-            if progress_callback:
-                print()
-            progress.update(1)
-            tqdm.write(f"    OK done ({progress.n}/{progress.total})")
+            del audio
+    drain()
+    elapsed = time.perf_counter() - started
+    stats = batcher.stats()
+    tqdm.write(
+        f"[batched] {len(jobs)} files in {elapsed:.1f}s ({len(jobs) / elapsed:.2f} files/s), "
+        f"{stats['windows']} windows in {stats['steps']} steps (mean batch {stats['mean_batch']:.1f})"
+    )
 
-    print(f"[OK] Completed {len(media_files)} files. Transcripts saved to {output_dir}")
+
+def _drain_events(events, advancer: _SecondsAdvancer) -> None:
+    while True:
+        try:
+            key, seconds = events.get_nowait()
+        except queue.Empty:
+            return
+        advancer.advance(key, seconds)
 
 
 def main():
@@ -100,9 +746,110 @@ def main():
     parser.add_argument("--output-dir", type=Path, default=Path("outputs"), help="Where to write transcripts (default: ./outputs)")
     parser.add_argument("-l", "--language", default="ru", help="ISO language code (default: ru)")
     parser.add_argument("-m", "--model", default="medium", choices=["tiny", "base", "small", "medium", "large"], help="Whisper model size (default: medium)")
-    parser.add_argument("--timestamps", choices=["none", "txt", "srt", "vtt", "tsv"], default="none", help="Save timestamps to a separate file (none, txt, srt, vtt, tsv)")
+    parser.add_argument("--timestamps", nargs="+", choices=["none", *TIMESTAMP_FORMATS], default=["none"], help="Save timestamps to separate files, one per format (none, txt, srt, vtt, tsv, jsonl)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of parallel worker processes, each with its own model (default: 1)")
+    parser.add_argument("--cache", action="store_true", help="Reuse cached transcripts of identical media (content hash + model + language)")
+    parser.add_argument("--audio-cache", type=Path, default=None, help="Directory for memory-mapped decoded audio reused across runs")
+    parser.add_argument("--cache-mel", action="store_true", help="With --audio-cache, also store log-mel spectrograms")
+    parser.add_argument("--detect-language", action="store_true", help="Detect each file's language with Whisper on its first 30 s instead of the file-name heuristic")
+    parser.add_argument("--detect-model", default="tiny", choices=["tiny", "base", "small", "medium", "large"], help="Model used for --detect-language (default: tiny)")
+    parser.add_argument("--min-language-prob", type=float, default=0.5, help="Below this detection probability use -l instead (default: 0.5)")
+    parser.add_argument("--profile", type=Path, nargs="?", const=Path("profile.jsonl"), default=None, metavar="PATH", help="Append per-stage timings as JSON lines to PATH (default: profile.jsonl) and print a summary table")
+    parser.add_argument("--checkpoint-dir", type=Path, nargs="?", const=Path(DEFAULT_CHECKPOINT_DIR), default=None, metavar="DIR", help="Checkpoint every decoded window in DIR (default: ./cache/checkpoints) so an interrupted batch resumes mid-file")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Inference engine: fp32, fp16 (GPU), int8 (quantized, CPU) or compile (default: auto)")
+    parser.add_argument("--shared-weights", action="store_true", help="Let all workers share one memory-mapped copy of the CPU model weights")
+    parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads per worker (default: CPU cores / workers)")
+    parser.add_argument("--interop-threads", type=int, default=None, help="Torch inter-op threads per worker (default: torch's choice)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Decode the windows of up to N short files in one batched pass (default: 1, off)")
+    parser.add_argument("--batch-wait", type=float, default=0.2, help="Seconds to wait for more files to fill a batch (default: 0.2)")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_DEPTH, help=f"Decode the next N files in the background while one is transcribed; 0 disables (default: {DEFAULT_DEPTH})")
+    parser.add_argument("--prefetch-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024, help=f"Cap on decoded audio waiting in the prefetch buffer, in MB (default: {DEFAULT_MAX_BYTES // 1024 // 1024})")
+    parser.add_argument("--vad", action="store_true", help="Skip silence and music before inference (timestamps stay on the original timeline)")
+    parser.add_argument("--cascade-model", default=None, choices=["tiny", "base", "small", "medium", "large"], help="Re-decode low-confidence segments with this larger model (default: off)")
+    parser.add_argument("--cascade-logprob", type=float, default=CascadeThresholds.min_avg_logprob, help=f"Escalate segments with a lower avg_logprob (default: {CascadeThresholds.min_avg_logprob})")
+    parser.add_argument("--cascade-compression", type=float, default=CascadeThresholds.max_compression_ratio, help=f"Escalate segments with a higher compression ratio (default: {CascadeThresholds.max_compression_ratio})")
+    parser.add_argument("--cascade-no-speech", type=float, default=CascadeThresholds.max_no_speech_prob, help=f"Escalate segments with a higher no_speech_prob (default: {CascadeThresholds.max_no_speech_prob})")
+    parser.add_argument("--manifest", nargs="?", const="", default=None, metavar="DIR", help=f"Share the corpus with other nodes through a lease manifest in DIR on shared storage (default: <output-dir>/{MANIFEST_DIR})")
+    parser.add_argument("--node-id", default=None, help="Name of this node in the manifest (default: <hostname>-<pid>)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS, help=f"Seconds before a silent node's files are reclaimed by others (default: {DEFAULT_LEASE_SECONDS:.0f})")
+    parser.add_argument("--index", type=Path, nargs="?", const=Path(os.environ.get("WHISPER_CORPUS_DIR") or DEFAULT_INDEX_DIR), default=None, metavar="DIR", help="Add finished files to the searchable corpus index in DIR (default: $WHISPER_CORPUS_DIR or ./cache/corpus)")
+    parser.add_argument("--watch", action="store_true", help="Keep running: transcribe new or changed files anywhere below --input-dir as they land")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="With --watch, seconds between directory scans (default: 1)")
+    parser.add_argument("--settle-seconds", type=float, default=2.0, help="With --watch, how long a file must stay unchanged before it is taken (default: 2)")
     args = parser.parse_args()
-    batch_transcribe(args.input_dir, args.output_dir, args.model, args.language, args.timestamps)
+    if args.watch:
+        from watch_folder import watch
+
+        ignored = [
+            flag
+            for flag, given in (
+                ("--detect-language", args.detect_language),
+                ("--profile", args.profile is not None),
+                ("--batch-size", args.batch_size > 1),
+                ("--manifest", args.manifest is not None),
+            )
+            if given
+        ]
+        if ignored:
+            parser.error(f"--watch does not support {', '.join(ignored)}")
+
+        watch(
+            args.input_dir,
+            args.output_dir,
+            args.model,
+            args.language,
+            args.timestamps,
+            workers=args.workers,
+            use_cache=args.cache,
+            audio_cache_dir=args.audio_cache,
+            cache_mel=args.cache_mel,
+            checkpoint_dir=args.checkpoint_dir,
+            engine=args.engine,
+            threads=args.threads,
+            interop_threads=args.interop_threads,
+            poll_interval=args.poll_interval,
+            settle_seconds=args.settle_seconds,
+            vad=args.vad,
+            index_dir=args.index,
+            cascade_model=args.cascade_model,
+            cascade_thresholds=_cascade_thresholds_from_args(args),
+            shared_weights=args.shared_weights,
+        )
+        return
+    manifest_dir = None
+    if args.manifest is not None:
+        manifest_dir = Path(args.manifest) if args.manifest else args.output_dir / MANIFEST_DIR
+    batch_transcribe(
+        args.input_dir,
+        args.output_dir,
+        args.model,
+        args.language,
+        args.timestamps,
+        workers=args.workers,
+        use_cache=args.cache,
+        audio_cache_dir=args.audio_cache,
+        cache_mel=args.cache_mel,
+        detect_language=args.detect_language,
+        detect_model=args.detect_model,
+        min_language_probability=args.min_language_prob,
+        profile_path=args.profile,
+        checkpoint_dir=args.checkpoint_dir,
+        engine=args.engine,
+        threads=args.threads,
+        interop_threads=args.interop_threads,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait,
+        prefetch=args.prefetch,
+        prefetch_bytes=int(args.prefetch_mb * 1024 * 1024),
+        vad=args.vad,
+        manifest_dir=manifest_dir,
+        node_id=args.node_id,
+        lease_seconds=args.lease_seconds,
+        index_dir=args.index,
+        cascade_model=args.cascade_model,
+        cascade_thresholds=_cascade_thresholds_from_args(args),
+        shared_weights=args.shared_weights,
+    )
 
 
 if __name__ == "__main__":
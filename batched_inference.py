@@ -0,0 +1,329 @@
+"""
+Cross-file batched decoding for many short recordings.
+
+`model.transcribe()` decodes one 30-second window at a time with a batch of
+one, so on thousands of short clips the per-call overhead and narrow matrix
+multiplications dominate. `BatchedTranscriber` keeps up to *max_batch_size*
+files in flight and decodes the current window of all of them in one batched
+encoder/decoder pass. When a file is finished, its slot goes to the next
+queued file at the following step, so the batch stays full while work is
+queued. The decoded tokens are split back into per-file Whisper results.
+
+Segmentation, temperature fallback and the no-speech check follow
+``whisper.transcribe``. One batched ``model.decode()`` call shares a single
+prompt, so windows are decoded without the previous window's text as prompt
+(as with ``condition_on_previous_text=False``). Clips of up to 30 seconds are a
+single window and get the same segments as ``model.transcribe()``, up to the
+floating-point differences of batched matrix multiplications.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+class _Clip:
+    """Decoding state of one file: its mel spectrogram, position and segments so far."""
+
+    def __init__(self, mel, language: Optional[str], future: Future) -> None:
+        from whisper.audio import N_FRAMES
+
+        self.mel = mel
+        self.content_frames = mel.shape[-1] - N_FRAMES
+        self.language = language
+        self.future = future
+        self.seek = 0
+        self.segments: List[dict] = []
+        self.tokens: List[int] = []
+
+    @property
+    def done(self) -> bool:
+        return self.seek >= self.content_frames
+
+    def window(self):
+        """The next 30-second mel window, padded, and the number of real frames in it."""
+        from whisper.audio import N_FRAMES, pad_or_trim
+
+        size = min(N_FRAMES, self.content_frames - self.seek)
+        return pad_or_trim(self.mel[:, self.seek : self.seek + size], N_FRAMES), size
+
+    def advance(self, result, size: int, tokenizer, input_stride: int, no_speech_threshold, logprob_threshold) -> None:
+        """Turn one decoded window into segments and move ``seek`` like ``whisper.transcribe``."""
+        import torch
+        from whisper.audio import HOP_LENGTH, SAMPLE_RATE
+
+        time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+        time_offset = float(self.seek * HOP_LENGTH / SAMPLE_RATE)
+        if (
+            no_speech_threshold is not None
+            and result.no_speech_prob > no_speech_threshold
+            and not (logprob_threshold is not None and result.avg_logprob > logprob_threshold)
+        ):
+            self.seek += size  # silence
+            return
+
+        window_seek = self.seek
+        tokens = torch.tensor(result.tokens)
+
+        def new_segment(start: float, end: float, segment_tokens) -> dict:
+            segment_tokens = segment_tokens.tolist()
+            return {
+                "seek": window_seek,
+                "start": start,
+                "end": end,
+                "text": tokenizer.decode([token for token in segment_tokens if token < tokenizer.eot]),
+                "tokens": segment_tokens,
+                "temperature": result.temperature,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            }
+
+        segments = []
+        timestamp_tokens = tokens.ge(tokenizer.timestamp_begin)
+        single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+        consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0] + 1
+        if len(consecutive) > 0:
+            slices = consecutive.tolist()
+            if single_timestamp_ending:
+                slices.append(len(tokens))
+            last_slice = 0
+            for current_slice in slices:
+                sliced = tokens[last_slice:current_slice]
+                start = sliced[0].item() - tokenizer.timestamp_begin
+                end = sliced[-1].item() - tokenizer.timestamp_begin
+                segments.append(new_segment(time_offset + start * time_precision, time_offset + end * time_precision, sliced))
+                last_slice = current_slice
+            if single_timestamp_ending:
+                self.seek += size
+            else:
+                # ignore the unfinished last segment and continue from its start
+                self.seek += (tokens[last_slice - 1].item() - tokenizer.timestamp_begin) * input_stride
+        else:
+            duration = size * HOP_LENGTH / SAMPLE_RATE
+            timestamps = tokens[timestamp_tokens.nonzero().flatten()]
+            if len(timestamps) > 0 and timestamps[-1].item() != tokenizer.timestamp_begin:
+                duration = (timestamps[-1].item() - tokenizer.timestamp_begin) * time_precision
+            segments.append(new_segment(time_offset, time_offset + duration, tokens))
+            self.seek += size
+
+        for segment in segments:
+            if segment["start"] == segment["end"] or segment["text"].strip() == "":
+                segment["text"] = ""
+                segment["tokens"] = []
+                segment["words"] = []
+        for segment in segments:
+            self.segments.append({"id": len(self.segments), **segment})
+            self.tokens.extend(segment["tokens"])
+
+    def result(self, tokenizer) -> dict:
+        return {"text": tokenizer.decode(self.tokens), "segments": self.segments, "language": self.language}
+
+
+class BatchedTranscriber:
+    """
+    Transcribe many files with batched forward passes over their windows.
+
+    Files are queued with `submit()` from any thread and decoded by a
+    background thread. When it is idle, the first file waits up to *max_wait*
+    seconds for others so the first step runs with a fuller batch; while files
+    are in flight, newly queued ones join at the next step.
+
+    Parameters
+    ----------
+    model : whisper.model.Whisper
+        The loaded model (any engine from `engines`).
+    max_batch_size : int, optional
+        Maximum number of windows decoded in one pass. Defaults to 8.
+    max_wait : float, optional
+        Seconds to wait for more files before starting a batch. Defaults to 0.2.
+    fp16 : bool, optional
+        Decode in half precision (GPU engines). Defaults to False.
+    temperature : sequence of float, optional
+        Temperature fallback schedule; windows that fail the compression ratio
+        or log-probability thresholds are re-decoded together at the next
+        temperature. Defaults to Whisper's ``(0.0, 0.2, ..., 1.0)``.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_size: int = 8,
+        max_wait: float = 0.2,
+        fp16: bool = False,
+        temperature: Union[float, Sequence[float]] = DEFAULT_TEMPERATURES,
+        compression_ratio_threshold: Optional[float] = 2.4,
+        logprob_threshold: Optional[float] = -1.0,
+        no_speech_threshold: Optional[float] = 0.6,
+    ) -> None:
+        from whisper.audio import N_FRAMES
+
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.fp16 = fp16
+        self.temperatures = [temperature] if isinstance(temperature, (int, float)) else list(temperature)
+        self.compression_ratio_threshold = compression_ratio_threshold
+        self.logprob_threshold = logprob_threshold
+        self.no_speech_threshold = no_speech_threshold
+        self.input_stride = N_FRAMES // model.dims.n_audio_ctx
+        self.steps = 0
+        self.windows = 0
+        self.files = 0
+        self._queue: "queue.Queue[Optional[Tuple[object, Optional[str], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batched-transcriber", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio: Union[str, np.ndarray], language: Optional[str] = None) -> Future:
+        """
+        Queue a file (path or 16 kHz waveform) and return a future for its
+        Whisper-style result. With *language* None it is detected from the
+        first window.
+        """
+        import whisper
+        from whisper.audio import N_SAMPLES
+
+        future: Future = Future()
+        mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels, padding=N_SAMPLES)
+        self._queue.put((mel, language, future))
+        return future
+
+    def transcribe_many(self, audios: Sequence[Union[str, np.ndarray]], language: Optional[str] = None) -> List[dict]:
+        """Submit all *audios* and return their results in order."""
+        futures = [self.submit(audio, language) for audio in audios]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Finish the queued files and stop the background thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> "BatchedTranscriber":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def stats(self) -> dict:
+        return {
+            "files": self.files,
+            "steps": self.steps,
+            "windows": self.windows,
+            "mean_batch": self.windows / self.steps if self.steps else 0.0,
+        }
+
+    def _run(self) -> None:
+        active: List[_Clip] = []
+        stopping = False
+        while not (stopping and not active):
+            if not active:
+                item = self._queue.get()
+                if item is None:
+                    break
+                active.append(_Clip(*item))
+                deadline = time.monotonic() + self.max_wait
+            else:
+                deadline = None
+            while len(active) < self.max_batch_size and not stopping:
+                try:
+                    if deadline is None:
+                        item = self._queue.get_nowait()
+                    else:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                else:
+                    active.append(_Clip(*item))
+            try:
+                self._step(active)
+            except BaseException as exc:  # fail the files of this batch, keep serving others
+                for clip in active:
+                    clip.future.set_exception(exc)
+                active = []
+                continue
+            for clip in active:
+                if clip.done:
+                    self.files += 1
+                    clip.future.set_result(clip.result(self._tokenizer(clip.language)))
+            active = [clip for clip in active if not clip.done]
+
+    def _tokenizer(self, language: Optional[str]):
+        from whisper.tokenizer import get_tokenizer
+
+        return get_tokenizer(
+            self.model.is_multilingual,
+            num_languages=self.model.num_languages,
+            language=language,
+            task="transcribe",
+        )
+
+    def _batch(self, mels):
+        import torch
+
+        dtype = torch.float16 if self.fp16 else torch.float32
+        return torch.stack(mels).to(self.model.device).to(dtype)
+
+    def _step(self, active: List[_Clip]) -> None:
+        clips = [clip for clip in active if not clip.done]
+        if not clips:
+            return
+        undetected = [clip for clip in clips if clip.language is None]
+        if undetected:
+            self._detect_languages(undetected)
+        groups: Dict[str, List[_Clip]] = {}
+        for clip in clips:
+            groups.setdefault(clip.language, []).append(clip)
+        self.steps += 1
+        for language, group in groups.items():
+            windows = [clip.window() for clip in group]
+            results = self._decode_with_fallback(self._batch([mel for mel, _ in windows]), language)
+            tokenizer = self._tokenizer(language)
+            for clip, (_, size), result in zip(group, windows, results):
+                clip.advance(result, size, tokenizer, self.input_stride, self.no_speech_threshold, self.logprob_threshold)
+            self.windows += len(group)
+
+    def _detect_languages(self, clips: List[_Clip]) -> None:
+        if not self.model.is_multilingual:
+            for clip in clips:
+                clip.language = "en"
+            return
+        _, probs = self.model.detect_language(self._batch([clip.window()[0] for clip in clips]))
+        for clip, clip_probs in zip(clips, probs):
+            clip.language = max(clip_probs, key=clip_probs.get)
+
+    def _needs_fallback(self, result) -> bool:
+        if (
+            self.no_speech_threshold is not None
+            and result.no_speech_prob > self.no_speech_threshold
+            and self.logprob_threshold is not None
+            and result.avg_logprob < self.logprob_threshold
+        ):
+            return False  # silence
+        if self.compression_ratio_threshold is not None and result.compression_ratio > self.compression_ratio_threshold:
+            return True  # too repetitive
+        return self.logprob_threshold is not None and result.avg_logprob < self.logprob_threshold
+
+    def _decode_with_fallback(self, mel, language: str) -> list:
+        from whisper.decoding import DecodingOptions
+
+        results = [None] * mel.shape[0]
+        pending = list(range(mel.shape[0]))
+        for temperature in self.temperatures:
+            options = DecodingOptions(task="transcribe", language=language, temperature=temperature, fp16=self.fp16)
+            decoded = self.model.decode(mel[pending], options)
+            retry = []
+            for idx, result in zip(pending, decoded):
+                results[idx] = result
+                if self._needs_fallback(result):
+                    retry.append(idx)
+            pending = retry
+            if not pending:
+                break
+        return results
@@ -0,0 +1,133 @@
+"""
+Files per second on many short clips: one ``model.transcribe()`` call per file
+against `batched_inference.BatchedTranscriber` at several batch sizes.
+
+Examples
+--------
+::
+
+    python -m bench.batch_throughput --model small --clips 64 --seconds 10 60 --batch-sizes 4 8 16
+
+Offline with the tiny stand-in model::
+
+    python -m bench.batch_throughput --stub --clips 32 --batch-sizes 4 8
+
+Audio is synthesized in memory, so only inference is timed. The report also
+counts the clips whose batched transcript differs from the sequential one.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.run_bench import DEFAULT_WORKDIR  # noqa: E402
+from bench.stub_model import make_stub_checkpoint  # noqa: E402
+from bench.synthetic import speech_like  # noqa: E402
+
+
+def make_clips(count: int, min_seconds: float, max_seconds: float, seed: int = 0) -> List[np.ndarray]:
+    """*count* speech-like clips with lengths spread evenly over the range."""
+    lengths = np.linspace(min_seconds, max_seconds, count) if count > 1 else [min_seconds]
+    return [speech_like(float(seconds), seed=seed + idx) for idx, seconds in enumerate(lengths)]
+
+
+def run(
+    model_name: str,
+    clips: List[np.ndarray],
+    batch_sizes: List[int],
+    language: str = "en",
+    engine: str = "fp32",
+    threads: Optional[int] = None,
+    temperature=None,
+) -> dict:
+    from batched_inference import DEFAULT_TEMPERATURES, BatchedTranscriber
+    from engines import configure_threads
+    from model_registry import DEFAULT_MODELS_DIR, ModelRegistry
+
+    configure_threads(threads)
+    registry = ModelRegistry(max_models=1, download_root=os.environ.get("WHISPER_CACHE_DIR") or DEFAULT_MODELS_DIR)
+    model = registry.get(model_name, "cpu", engine)
+    temperature = DEFAULT_TEMPERATURES if temperature is None else temperature
+    # Batched windows are decoded without the previous window as prompt, so the
+    # sequential baseline does the same.
+    options = {"language": language, "fp16": False, "temperature": temperature, "condition_on_previous_text": False}
+    audio_seconds = sum(len(clip) for clip in clips) / 16000
+
+    model.transcribe(clips[0], **options)  # warm-up
+    start = time.perf_counter()
+    sequential = [model.transcribe(clip, **options)["text"] for clip in clips]
+    elapsed = time.perf_counter() - start
+    rows = [{"mode": "sequential", "batch_size": 1, "seconds": round(elapsed, 3), "files_per_s": round(len(clips) / elapsed, 3)}]
+
+    for batch_size in batch_sizes:
+        with BatchedTranscriber(model, max_batch_size=batch_size, max_wait=0.0, temperature=temperature) as batcher:
+            start = time.perf_counter()
+            texts = [result["text"] for result in batcher.transcribe_many(clips, language)]
+            elapsed = time.perf_counter() - start
+            stats = batcher.stats()
+        rows.append(
+            {
+                "mode": "batched",
+                "batch_size": batch_size,
+                "seconds": round(elapsed, 3),
+                "files_per_s": round(len(clips) / elapsed, 3),
+                "mean_batch": round(stats["mean_batch"], 2),
+                "text_mismatches": sum(a != b for a, b in zip(sequential, texts)),
+            }
+        )
+    return {
+        "model": model_name,
+        "engine": engine,
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 1),
+        "results": rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare sequential and batched transcription throughput on short clips.")
+    parser.add_argument("--model", default="tiny", help="Model size (default: tiny)")
+    parser.add_argument("--stub", action="store_true", help="Use the offline tiny stand-in model")
+    parser.add_argument("--clips", type=int, default=32, help="Number of clips (default: 32)")
+    parser.add_argument("--seconds", nargs=2, type=float, default=[10.0, 60.0], metavar=("MIN", "MAX"), help="Clip length range (default: 10 60)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[4, 8, 16], help="Batch sizes to measure (default: 4 8 16)")
+    parser.add_argument("--engine", choices=["fp32", "int8", "compile"], default="fp32", help="CPU inference engine (default: fp32)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch default)")
+    parser.add_argument("-l", "--language", default="en", help="Language passed to the model (default: en)")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Where the stand-in model is kept")
+    parser.add_argument("-o", "--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    model_name = args.model
+    temperature = None
+    if args.stub:
+        model_name = make_stub_checkpoint(os.path.join(args.workdir, "stub.pt"))
+        # As in run_bench: random weights decode greedily without fallback.
+        temperature = 0.0
+    clips = make_clips(args.clips, *args.seconds)
+    report = run(model_name, clips, args.batch_sizes, args.language, args.engine, args.threads, temperature)
+
+    print(f"{report['clips']} clips, {report['audio_seconds']:.0f}s of audio, engine={report['engine']}")
+    print(f"{'mode':<11} {'batch':>5} {'seconds':>8} {'files/s':>8} {'speedup':>8} {'mismatch':>8}")
+    base = report["results"][0]["files_per_s"]
+    for row in report["results"]:
+        print(
+            f"{row['mode']:<11} {row['batch_size']:>5} {row['seconds']:>8.2f} {row['files_per_s']:>8.2f} "
+            f"{row['files_per_s'] / base:>7.2f}x {row.get('text_mismatches', 0):>8}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
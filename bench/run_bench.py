@@ -0,0 +1,314 @@
+"""
+Benchmark model load time, audio decode time, inference real-time factor and
+peak memory on CPU, and diff the numbers against a saved JSON baseline.
+
+Examples
+--------
+Full run against real checkpoints::
+
+    python -m bench.run_bench --models tiny base small --lengths 30 120 600 -o bench/baseline.json
+
+Offline run with the tiny stand-in model (for CI)::
+
+    python -m bench.run_bench --stub --lengths 10 30 --baseline bench/baseline_stub.json
+
+Compare the fp32 and int8 engines of one model::
+
+    python -m bench.run_bench --models small --engines fp32 int8 --threads 4
+
+Memory cost of each extra worker, with private and with shared weights::
+
+    python -m bench.run_bench --models medium --lengths 30 --workers 4
+
+Every model size and engine is measured in a fresh process, so load time and
+peak RSS are not affected by earlier models.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.stub_model import STUB_NAME, make_stub_checkpoint  # noqa: E402
+from bench.synthetic import SAMPLE_RATE, make_corpus  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "bench", ".work")
+# Lower is better for every metric compared against the baseline.
+COMPARED_METRICS = ["load_s", "decode_s", "mel_s", "inference_s", "rtf", "peak_rss_mb"]
+
+
+def _bench_model(
+    model_label: str,
+    model_name: str,
+    audio_paths: List[str],
+    options: dict,
+    threads: Optional[int],
+    engine: str = "fp32",
+) -> List[dict]:
+    """Measure one model in the current (fresh) process."""
+    import whisper
+    from whisper.audio import N_SAMPLES
+
+    from audio_stream import peak_rss_mb
+    from engines import configure_threads
+    from model_registry import DEFAULT_MODELS_DIR, ModelRegistry
+
+    configure_threads(threads)
+    registry = ModelRegistry(max_models=1, download_root=os.environ.get("WHISPER_CACHE_DIR") or DEFAULT_MODELS_DIR)
+
+    start = time.perf_counter()
+    model = registry.get(model_name, "cpu", engine)
+    load_s = time.perf_counter() - start
+    rss_after_load = peak_rss_mb()
+
+    rows = []
+    for path in audio_paths:
+        start = time.perf_counter()
+        audio = whisper.load_audio(path)
+        decode_s = time.perf_counter() - start
+        audio_seconds = len(audio) / SAMPLE_RATE
+
+        start = time.perf_counter()
+        whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+        mel_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = model.transcribe(audio, fp16=False, **options)
+        inference_s = time.perf_counter() - start
+        rows.append(
+            {
+                "model": model_label,
+                "engine": engine,
+                "audio_seconds": round(audio_seconds, 3),
+                "load_s": round(load_s, 4),
+                "decode_s": round(decode_s, 4),
+                "mel_s": round(mel_s, 4),
+                "inference_s": round(inference_s, 4),
+                "inference_cpu_s": round(time.process_time() - cpu_start, 4),
+                "rtf": round(inference_s / audio_seconds, 4) if audio_seconds else None,
+                "segments": len(result.get("segments", [])),
+                "rss_after_load_mb": rss_after_load,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        )
+    return rows
+
+
+def _memory_mb() -> dict:
+    """RSS, PSS and private (unshared) memory of this process in MB; empty where /proc is missing."""
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Private_Clean": "private_mb", "Private_Dirty": "private_mb"}
+    totals = {}
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                key = fields.get(parts[0].rstrip(":")) if parts else None
+                if key:
+                    totals[key] = totals.get(key, 0.0) + int(parts[1]) / 1024
+    except OSError:
+        return {}
+    return {key: round(value, 1) for key, value in totals.items()}
+
+
+def _worker_memory(model_name: str, audio_path: str, options: dict, threads: Optional[int], engine: str, shared: bool, barrier) -> dict:
+    """One of several concurrent workers: load, transcribe once, report memory while all are alive."""
+    import whisper
+
+    from engines import configure_threads
+    from model_registry import DEFAULT_MODELS_DIR, ModelRegistry
+
+    configure_threads(threads or 1)
+    registry = ModelRegistry(
+        max_models=1,
+        download_root=os.environ.get("WHISPER_CACHE_DIR") or DEFAULT_MODELS_DIR,
+        shared_weights=shared,
+    )
+    model = registry.get(model_name, "cpu", engine)
+    model.transcribe(whisper.load_audio(audio_path), fp16=False, **options)
+    barrier.wait()  # every worker has its weights loaded (or mapped)
+    memory = _memory_mb()
+    barrier.wait()  # nobody exits, unmapping shared pages, before all have measured
+    return memory
+
+
+def run_worker_memory(
+    targets: List[tuple],
+    audio_path: str,
+    options: dict,
+    threads: Optional[int],
+    engines: List[str],
+    workers: int,
+) -> List[dict]:
+    """Memory of *workers* concurrent processes per model and engine, with private and with shared weights."""
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for label, name in targets:
+        for engine in engines:
+            for shared in (False, True):
+                print(f"[bench] {label} ({engine}): {workers} workers, {'shared' if shared else 'private'} weights", flush=True)
+                with context.Manager() as manager, context.Pool(workers) as pool:
+                    barrier = manager.Barrier(workers)
+                    memories = pool.starmap(
+                        _worker_memory, [(name, audio_path, options, threads, engine, shared, barrier)] * workers
+                    )
+
+                def mean(key: str) -> Optional[float]:
+                    values = [memory[key] for memory in memories if key in memory]
+                    return round(sum(values) / len(values), 1) if values else None
+
+                rows.append(
+                    {
+                        "model": label,
+                        "engine": engine,
+                        "shared_weights": shared,
+                        "workers": workers,
+                        "rss_mb": mean("rss_mb"),
+                        "pss_mb": mean("pss_mb"),
+                        # What one more worker adds: the memory nobody else maps.
+                        "extra_worker_mb": mean("private_mb"),
+                        "total_pss_mb": round(sum(memory.get("pss_mb", 0.0) for memory in memories), 1) or None,
+                    }
+                )
+    return rows
+
+
+def run_benchmarks(
+    models: List[str],
+    lengths: List[float],
+    language: str = "en",
+    stub: bool = False,
+    threads: Optional[int] = None,
+    workdir: str = DEFAULT_WORKDIR,
+    engines: Optional[List[str]] = None,
+    workers: int = 0,
+) -> dict:
+    """Run the benchmark matrix and return the report dict."""
+    audio_paths = make_corpus(os.path.join(workdir, "audio"), lengths)
+    options = {"language": language}
+    if stub:
+        targets = [(STUB_NAME, make_stub_checkpoint(os.path.join(workdir, "stub.pt")))]
+        # Random weights can produce degenerate distributions at T > 0, so the
+        # stand-in decodes greedily without temperature fallback.
+        options["temperature"] = 0.0
+    else:
+        targets = [(name, name) for name in models]
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for label, name in targets:
+        for engine in engines or ["fp32"]:
+            print(f"[bench] {label} ({engine}): {len(audio_paths)} files", flush=True)
+            with context.Pool(1) as pool:
+                results.extend(pool.apply(_bench_model, (label, name, audio_paths, options, threads, engine)))
+
+    worker_rows = []
+    if workers > 1:
+        shortest = min(audio_paths, key=os.path.getsize)
+        worker_rows = run_worker_memory(targets, shortest, options, threads, engines or ["fp32"], workers)
+
+    import torch
+    try:
+        from whisper.version import __version__ as whisper_version
+    except ImportError:
+        whisper_version = "unknown"
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "threads": threads or torch.get_num_threads(),
+            "torch": torch.__version__,
+            "whisper": whisper_version,
+            "stub": stub,
+            "options": options,
+        },
+        "results": results,
+        "workers": worker_rows,
+    }
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Print a diff table and return descriptions of regressions above *max_regression*."""
+    def row_key(row: dict) -> tuple:
+        return row["model"], row.get("engine", "fp32"), row["audio_seconds"]
+
+    base_rows = {row_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"{'model':<10} {'engine':<8} {'audio_s':>8} {'metric':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for row in current["results"]:
+        engine = row.get("engine", "fp32")
+        base = base_rows.get(row_key(row))
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            flag = " !" if change > max_regression else ""
+            print(f"{row['model']:<10} {engine:<8} {row['audio_seconds']:>8.1f} {metric:<12} {old:>10.3f} {new:>10.3f} {change:>+7.1%}{flag}")
+            if change > max_regression:
+                regressions.append(f"{row['model']}/{engine} {row['audio_seconds']}s {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_report(report: dict) -> None:
+    print(f"{'model':<10} {'engine':<8} {'audio_s':>8} {'load_s':>8} {'decode_s':>9} {'mel_s':>7} {'infer_s':>8} {'rtf':>7} {'peak_mb':>8}")
+    for r in report["results"]:
+        print(
+            f"{r['model']:<10} {r.get('engine', 'fp32'):<8} {r['audio_seconds']:>8.1f} {r['load_s']:>8.2f} {r['decode_s']:>9.3f} "
+            f"{r['mel_s']:>7.3f} {r['inference_s']:>8.2f} {r['rtf'] or 0:>7.3f} {r['peak_rss_mb'] or 0:>8.0f}"
+        )
+    if report.get("workers"):
+        print()
+        print(f"{'model':<10} {'engine':<8} {'weights':<8} {'workers':>7} {'rss_mb':>8} {'pss_mb':>8} {'extra_mb':>9} {'total_mb':>9}")
+        for r in report["workers"]:
+            print(
+                f"{r['model']:<10} {r['engine']:<8} {'shared' if r['shared_weights'] else 'private':<8} {r['workers']:>7} "
+                f"{r['rss_mb'] or 0:>8.0f} {r['pss_mb'] or 0:>8.0f} {r['extra_worker_mb'] or 0:>9.0f} {r['total_pss_mb'] or 0:>9.0f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Whisper transcription on CPU.")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"], help="Model sizes to measure (default: tiny base small)")
+    parser.add_argument("--lengths", nargs="+", type=float, default=[30, 120, 600], help="Synthetic audio lengths in seconds (default: 30 120 600)")
+    parser.add_argument("--stub", action="store_true", help="Use the offline tiny stand-in model instead of real checkpoints")
+    parser.add_argument("-l", "--language", default="en", help="Language passed to the model (default: en)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch default)")
+    parser.add_argument("--engines", nargs="+", choices=["fp32", "int8", "compile"], default=["fp32"], help="CPU inference engines to measure (default: fp32)")
+    parser.add_argument("--workers", type=int, default=0, help="Also measure the memory of N concurrent workers, with private and with shared weights (Linux; default: off)")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Where synthetic audio and the stand-in model are kept")
+    parser.add_argument("-o", "--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON report to diff against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Fail when a metric gets worse by more than this fraction (default: 0.25)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.models, args.lengths, args.language, args.stub, args.threads, args.workdir, args.engines, args.workers)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved benchmark report to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Tiny random-weight stand-in for a Whisper checkpoint.
+
+CI machines usually have no downloaded weights and no network. The stand-in
+has the real vocabulary and mel size but one narrow layer per stack, so the
+whole pipeline (loading, decoding, mel, the decoding loop with fallbacks)
+runs offline in seconds. Its transcripts are meaningless.
+"""
+import os
+
+STUB_NAME = "stub"
+
+
+def make_stub_checkpoint(path: str, seed: int = 0) -> str:
+    """Write the stand-in checkpoint to *path* (once) and return the path."""
+    if os.path.isfile(path):
+        return path
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    dims = ModelDimensions(
+        n_mels=80,
+        n_audio_ctx=1500,
+        n_audio_state=64,
+        n_audio_head=2,
+        n_audio_layer=1,
+        n_vocab=51865,
+        n_text_ctx=448,
+        n_text_state=64,
+        n_text_head=2,
+        n_text_layer=1,
+    )
+    torch.manual_seed(seed)
+    model = Whisper(dims)
+    with torch.no_grad():
+        # Whisper leaves this parameter uninitialised (torch.empty); garbage
+        # there can be NaN, which the int8 engine's dynamic quantization rejects.
+        model.decoder.positional_embedding.normal_(std=0.01)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.save({"dims": dims.__dict__, "model_state_dict": model.state_dict()}, path)
+    return path
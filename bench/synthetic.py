@@ -0,0 +1,64 @@
+"""
+Deterministic synthetic "speech-like" audio for benchmarks.
+
+The signal is a harmonic tone whose pitch and loudness move like a voice
+(syllable-rate amplitude modulation, slowly drifting pitch), broken up by
+silence gaps. It is not speech, but it exercises ffmpeg decoding, the mel
+front end and the decoding loop the same way for every run.
+"""
+import wave
+from typing import List
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(
+    seconds: float,
+    seed: int = 0,
+    sample_rate: int = SAMPLE_RATE,
+    phrase_seconds: float = 6.0,
+    gap_seconds: float = 1.5,
+) -> np.ndarray:
+    """Return *seconds* of float32 audio alternating voiced phrases and silence."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = np.zeros(total, dtype=np.float32)
+    pos = 0
+    while pos < total:
+        length = min(total - pos, int(rng.uniform(0.5, 1.5) * phrase_seconds * sample_rate))
+        t = np.arange(length) / sample_rate
+        f0 = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.2, 0.5) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+        syllables = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * t))
+        audio[pos : pos + length] = (0.2 * voice * syllables).astype(np.float32)
+        pos += length + int(rng.uniform(0.5, 1.5) * gap_seconds * sample_rate)
+    audio += rng.normal(0, 0.002, total).astype(np.float32)
+    return np.clip(audio, -1.0, 1.0)
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> str:
+    """Write mono 16-bit PCM WAV."""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+    return path
+
+
+def make_corpus(directory: str, lengths: List[float], seed: int = 0) -> List[str]:
+    """Write one WAV per length into *directory* and return their paths."""
+    import os
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for idx, seconds in enumerate(lengths):
+        path = os.path.join(directory, f"synthetic_{int(seconds)}s.wav")
+        if not os.path.isfile(path):
+            write_wav(path, speech_like(seconds, seed=seed + idx))
+        paths.append(path)
+    return paths
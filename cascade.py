@@ -0,0 +1,149 @@
+"""
+Two-tier model cascade.
+
+A small model transcribes the whole recording; segments it was unsure about
+are then decoded again with a larger model, and only their audio. Whisper
+reports three per-segment signals that are good predictors of errors:
+
+* ``avg_logprob``: low average token log-probability (the decoder guessed),
+* ``compression_ratio``: highly repetitive text (a decoding loop),
+* ``no_speech_prob``: the window probably held no speech, so any text in it
+  may be hallucinated.
+
+Adjacent weak segments are joined into spans, widened into the silence
+around them (never over a segment that is kept), re-transcribed, shifted
+back onto the original timeline and spliced in place of the weak segments.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from audio_stream import PROMPT_CHARS, SAMPLE_RATE
+from segments import offset_segments
+
+
+@dataclass
+class CascadeThresholds:
+    """
+    When a first-pass segment is escalated to the larger model.
+
+    Attributes
+    ----------
+    min_avg_logprob : float
+        Segments with a lower ``avg_logprob`` are escalated.
+    max_compression_ratio : float
+        Segments with a higher ``compression_ratio`` are escalated.
+    max_no_speech_prob : float
+        Segments with a higher ``no_speech_prob`` are escalated.
+    pad_seconds : float
+        Context added around a span where the neighbouring audio is not
+        covered by kept segments.
+    merge_gap_seconds : float
+        Weak segments closer than this are re-decoded as one span.
+    """
+
+    min_avg_logprob: float = -0.7
+    max_compression_ratio: float = 2.2
+    max_no_speech_prob: float = 0.5
+    pad_seconds: float = 0.5
+    merge_gap_seconds: float = 2.0
+
+    def is_weak(self, segment: dict) -> bool:
+        return (
+            segment.get("avg_logprob", 0.0) < self.min_avg_logprob
+            or segment.get("compression_ratio", 0.0) > self.max_compression_ratio
+            or segment.get("no_speech_prob", 0.0) > self.max_no_speech_prob
+        )
+
+
+def escalation_spans(
+    segments: List[dict],
+    thresholds: CascadeThresholds,
+    duration: float,
+) -> List[Tuple[float, float, List[int]]]:
+    """``(start, end, indices of the weak segments)`` of every span to re-decode."""
+    spans: List[Tuple[float, float, List[int]]] = []
+    for idx, segment in enumerate(segments):
+        if not thresholds.is_weak(segment):
+            continue
+        if spans and segment["start"] - spans[-1][1] <= thresholds.merge_gap_seconds and idx - spans[-1][2][-1] == 1:
+            spans[-1] = (spans[-1][0], segment["end"], spans[-1][2] + [idx])
+        else:
+            spans.append((segment["start"], segment["end"], [idx]))
+
+    padded = []
+    for start, end, idxs in spans:
+        # Widen into the surrounding gaps, but never over audio whose text is kept.
+        before = segments[idxs[0] - 1]["end"] if idxs[0] > 0 else 0.0
+        after = segments[idxs[-1] + 1]["start"] if idxs[-1] + 1 < len(segments) else duration
+        padded.append(
+            (
+                max(before, start - thresholds.pad_seconds, 0.0),
+                min(after, end + thresholds.pad_seconds, duration),
+                idxs,
+            )
+        )
+    return padded
+
+
+def refine(
+    model,
+    audio: np.ndarray,
+    result: dict,
+    options: dict,
+    thresholds: Optional[CascadeThresholds] = None,
+    model_name: str = "",
+) -> Tuple[dict, dict]:
+    """
+    Re-decode the weak segments of *result* with *model* and splice them in.
+
+    *options* are the ``model.transcribe()`` options of the first pass. Each
+    span is prompted with the text before it, as a single pass would be.
+    Replaced segments get ``"cascade": model_name``.
+
+    Returns
+    -------
+    (dict, dict)
+        The refined result and a report with the escalated segments and seconds
+        and the escalated fraction of the audio.
+    """
+    thresholds = thresholds or CascadeThresholds()
+    segments = result.get("segments", [])
+    duration = len(audio) / SAMPLE_RATE
+    spans = escalation_spans(segments, thresholds, duration)
+    options = {
+        **{key: value for key, value in options.items() if key not in ("verbose", "initial_prompt")},
+        "language": options.get("language") or result.get("language"),
+        "condition_on_previous_text": False,
+    }
+
+    replaced = set()
+    new_segments: List[dict] = []
+    for start, end, idxs in spans:
+        piece = audio[int(start * SAMPLE_RATE) : int(end * SAMPLE_RATE)]
+        if len(piece) == 0:
+            continue
+        prompt = "".join(segment["text"] for segment in segments[: idxs[0]])[-PROMPT_CHARS:]
+        redone = model.transcribe(piece, initial_prompt=prompt or None, **options)
+        for segment in offset_segments(redone.get("segments", []), start):
+            segment["end"] = min(segment["end"], end)
+            segment["cascade"] = model_name
+            new_segments.append(segment)
+        replaced.update(idxs)
+
+    kept = [segment for idx, segment in enumerate(segments) if idx not in replaced]
+    ordered = sorted(kept + new_segments, key=lambda segment: segment["start"])
+    merged = [{**segment, "id": idx} for idx, segment in enumerate(ordered)]
+    escalated_seconds = sum(end - start for start, end, _ in spans)
+    report = {
+        "model": model_name,
+        "segments": len(segments),
+        "escalated_segments": len(replaced),
+        "spans": len(spans),
+        "escalated_seconds": round(escalated_seconds, 2),
+        "audio_seconds": round(duration, 2),
+        "escalated_fraction": round(escalated_seconds / duration, 4) if duration else 0.0,
+    }
+    refined = {**result, "segments": merged, "text": "".join(segment["text"] for segment in merged)}
+    return refined, report
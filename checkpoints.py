@@ -0,0 +1,253 @@
+"""
+Checkpoint and resume for long transcriptions.
+
+While a file is transcribed, every decoded window is appended to a JSON-lines
+checkpoint: the new segments, the position Whisper continues from (its
+``seek``) and the language. If the process dies, the next run of the same job
+replays the stored segments to the outputs and continues from that position
+with the same decoder context (the prompt tokens Whisper would have used), so
+the result matches an uninterrupted run. The checkpoint is removed once the
+job has finished.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from segments import merge_results
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "checkpoints")
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint:
+    """
+    Append-only record of the decoded windows of one job.
+
+    Parameters
+    ----------
+    path : str
+        The ``.jsonl`` checkpoint file.
+    header : dict
+        Identifies the job (media file, model, language, options). An existing
+        file with a different header is ignored and overwritten.
+    """
+
+    def __init__(self, path: str, header: dict) -> None:
+        self.path = path
+        self.header = {"version": CHECKPOINT_VERSION, **header}
+        self.segments: List[dict] = []
+        self.seek = 0.0
+        self.window_end: Optional[float] = None
+        self.language: Optional[str] = None
+        self.prompt: Optional[str] = None
+        self._started = False
+        self._load()
+
+    @classmethod
+    def for_job(
+        cls,
+        checkpoint_dir: str,
+        media_path: str,
+        model_size: str,
+        language: Optional[str],
+        options: Optional[dict] = None,
+    ) -> "Checkpoint":
+        stat = os.stat(media_path)
+        header = {
+            "media": os.path.abspath(media_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "model": model_size,
+            "language": language,
+            "options": options or {},
+        }
+        key = hashlib.sha1(json.dumps(header, sort_keys=True).encode("utf-8")).hexdigest()
+        return cls(os.path.join(checkpoint_dir, f"{key}.jsonl"), header)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # a record cut short by the crash
+        if not records or records[0] != self.header:
+            return
+        self._started = True
+        for record in records[1:]:
+            self.segments.extend(record["segments"])
+            self.seek = record["seek"]
+            self.window_end = record.get("window_end")
+            self.language = record.get("language") or self.language
+            self.prompt = record.get("prompt", self.prompt)
+
+    @property
+    def resumed(self) -> bool:
+        """True when earlier windows of this job were recovered."""
+        return self.seek > 0 or bool(self.segments)
+
+    @property
+    def text(self) -> str:
+        return "".join(segment["text"] for segment in self.segments)
+
+    def record(
+        self,
+        segments: List[dict],
+        seek: float,
+        window_end: Optional[float] = None,
+        language: Optional[str] = None,
+        prompt: Optional[str] = None,
+    ) -> None:
+        """Append one decoded window and sync it to disk."""
+        record = {"seek": seek, "segments": segments, "language": language}
+        if window_end is not None:
+            record["window_end"] = window_end
+        if prompt is not None:
+            record["prompt"] = prompt
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        mode = "a" if self._started else "w"
+        with open(self.path, mode, encoding="utf-8") as f:
+            if not self._started:
+                f.write(json.dumps(self.header) + "\n")
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._started = True
+        self.segments.extend(segments)
+        self.seek = seek
+        self.window_end = window_end
+        self.language = language or self.language
+        self.prompt = prompt if prompt is not None else self.prompt
+
+    def prompt_tokens(self) -> List[int]:
+        """Tokens Whisper conditions the next window on: those since its last prompt reset.
+
+        Whisper stops feeding previous text after a window decoded at a
+        temperature above 0.5, so the context starts after the last such segment.
+        """
+        tokens: List[int] = []
+        for segment in self.segments:
+            if segment.get("temperature", 0.0) > 0.5:
+                tokens = []
+            else:
+                tokens.extend(segment.get("tokens", []))
+        return tokens
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def pending_checkpoint(checkpoint_dir: str, media_path: str, model_size: Optional[str] = None) -> bool:
+    """
+    True when *checkpoint_dir* holds an unfinished checkpoint of *media_path*
+    in its current version (and of *model_size*, if given), whatever the
+    language and options of that job were.
+    """
+    stat = os.stat(media_path)
+    media = os.path.abspath(media_path)
+    try:
+        names = os.listdir(checkpoint_dir)
+    except OSError:
+        return False
+    for name in names:
+        if not name.endswith(".jsonl"):
+            continue
+        try:
+            with open(os.path.join(checkpoint_dir, name), "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+        except (OSError, ValueError):
+            continue
+        if (
+            isinstance(header, dict)
+            and header.get("media") == media
+            and header.get("size") == stat.st_size
+            and header.get("mtime_ns") == stat.st_mtime_ns
+            and (model_size is None or header.get("model") == model_size)
+        ):
+            return True
+    return False
+
+
+@contextmanager
+def _prompt_prefix(model, context: Callable[[], List[int]]) -> Iterator[None]:
+    """Prepend ``context()`` to the prompt of every ``model.decode()`` call."""
+    previous = model.__dict__.get("decode")
+    inner = model.decode
+
+    def decode(mel, options, *args, **kwargs):
+        tokens = context()
+        if tokens:
+            options = dataclasses.replace(options, prompt=tokens + list(options.prompt or []))
+        return inner(mel, options, *args, **kwargs)
+
+    model.decode = decode
+    try:
+        yield
+    finally:
+        if previous is None:
+            del model.decode
+        else:
+            model.decode = previous
+
+
+def transcribe_resumable(
+    model,
+    audio,
+    options: dict,
+    checkpoint: Checkpoint,
+    segment_callback: Optional[Callable[[List[dict], float, Optional[float]], None]] = None,
+) -> dict:
+    """
+    ``model.transcribe(audio, **options)`` that records every window in
+    *checkpoint* and, if the checkpoint holds earlier windows, continues after them.
+
+    *segment_callback* first receives the recovered segments, then the
+    segments of every newly decoded window, with the seconds done.
+    """
+    import whisper
+
+    from language_detect import detect_model_language
+    from progress_events import segment_tap
+
+    options = dict(options)
+    start = checkpoint.seek
+    previous = list(checkpoint.segments)
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+    if options.get("language") is None:
+        # Fixed up front so a resumed run does not detect again on a later window.
+        options["language"] = checkpoint.language or detect_model_language(model, audio)[0]
+    context = []
+    if checkpoint.resumed:
+        options["clip_timestamps"] = [start]
+        if options.get("condition_on_previous_text", True):
+            context = checkpoint.prompt_tokens()
+        if segment_callback is not None:
+            segment_callback(previous, start, None)
+
+    def on_window(segments: List[dict], seconds: float, total_seconds: Optional[float] = None) -> None:
+        nonlocal context
+        seek = start + seconds
+        checkpoint.record(segments, seek, language=options["language"])
+        if any(segment.get("temperature", 0.0) > 0.5 for segment in segments):
+            context = []  # Whisper has reset its prompt as well
+        if segment_callback is not None:
+            segment_callback(segments, seek, total_seconds)
+
+    with segment_tap(on_window), _prompt_prefix(model, lambda: context):
+        result = model.transcribe(audio, **options)
+    return merge_results(
+        [(0.0, {"text": "".join(s["text"] for s in previous), "segments": previous}), (0.0, result)],
+        language=options["language"],
+    )
@@ -0,0 +1,433 @@
+"""
+Searchable on-disk index of transcribed segments.
+
+Finished transcripts are added file by file; nothing is ever rebuilt::
+
+    <index_dir>/
+        catalog.jsonl         # append-only: transcript -> {id, media, language, segments}
+        columns/<id>.npz      # start_ms, end_ms and the texts of one file, column-wise
+        postings/<xx>.tsv     # inverted index, sharded by token hash:
+                              #   token <TAB> file id <TAB> segment numbers
+
+Adding a file writes its columns, appends one postings line per distinct
+token to the shards those tokens hash to, and then appends the file to the
+catalog. Readers only trust file ids listed in the catalog, so a search running
+while a file is added never sees it half-written. Re-adding a transcript gives it a
+new id and leaves the old postings behind as garbage until `compact()`.
+
+Examples
+--------
+::
+
+    python corpus_index.py add outputs/*.jsonl
+    python corpus_index.py search "quarterly budget" --phrase
+    python corpus_index.py search budget --file meeting --from 60000 --to 120000
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from file_lock import file_lock
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "corpus")
+N_SHARDS = 64
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens (``ё`` folded to ``е``)."""
+    return _TOKEN.findall(text.lower().replace("ё", "е"))
+
+
+def _shard(token: str) -> int:
+    return int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:2], "little") % N_SHARDS
+
+
+class CorpusIndex:
+    """
+    Column store of segment times and texts plus an inverted token index.
+
+    Parameters
+    ----------
+    index_dir : str, optional
+        Where the index lives. Defaults to ``./cache/corpus``.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR) -> None:
+        self.index_dir = str(index_dir)
+        os.makedirs(os.path.join(self.index_dir, "columns"), exist_ok=True)
+        os.makedirs(os.path.join(self.index_dir, "postings"), exist_ok=True)
+        self._catalog_path = os.path.join(self.index_dir, "catalog.jsonl")
+        self._columns: Dict[int, Dict[str, np.ndarray]] = {}
+        # Catalog replayed so far: (inode, bytes read, {"next_id", "files"}).
+        self._catalog_state: Tuple[int, int, dict] = (-1, 0, {"next_id": 0, "files": {}})
+
+    # -- storage -------------------------------------------------------------
+
+    def catalog(self) -> dict:
+        """``{"next_id": int, "files": {transcript: entry}}``, reading only what was appended since the last call."""
+        try:
+            stat = os.stat(self._catalog_path)
+        except FileNotFoundError:
+            return {"next_id": 0, "files": {}}
+        inode, offset, catalog = self._catalog_state
+        if stat.st_ino != inode or stat.st_size < offset:
+            offset, catalog = 0, {"next_id": 0, "files": {}}  # rewritten by compact()
+        with open(self._catalog_path, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+        # An entry still being appended by another process is picked up next time.
+        complete = tail[: tail.rfind(b"\n") + 1]
+        catalog = {"next_id": catalog["next_id"], "files": dict(catalog["files"])}
+        for line in complete.decode("utf-8").splitlines():
+            entry = json.loads(line)
+            if "reserved" in entry:
+                catalog["next_id"] = max(catalog["next_id"], entry["reserved"] + 1)
+                continue
+            transcript = entry.pop("transcript")
+            if entry.get("removed"):
+                catalog["files"].pop(transcript, None)
+            else:
+                catalog["files"][transcript] = entry
+                catalog["next_id"] = max(catalog["next_id"], entry["id"] + 1)
+        self._catalog_state = (stat.st_ino, offset + len(complete), catalog)
+        return catalog
+
+    def _append_catalog(self, entry: dict) -> None:
+        with open(self._catalog_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _columns_path(self, file_id: int) -> str:
+        return os.path.join(self.index_dir, "columns", f"{file_id}.npz")
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.index_dir, "postings", f"{shard:02x}.tsv")
+
+    def _load_columns(self, file_id: int) -> Dict[str, np.ndarray]:
+        columns = self._columns.get(file_id)
+        if columns is None:
+            with np.load(self._columns_path(file_id)) as data:
+                columns = {name: data[name] for name in data.files}
+            self._columns[file_id] = columns
+        return columns
+
+    @staticmethod
+    def _text(columns: Dict[str, np.ndarray], idx: int) -> str:
+        offsets = columns["text_offsets"]
+        return columns["text"][offsets[idx] : offsets[idx + 1]].tobytes().decode("utf-8")
+
+    # -- updates -------------------------------------------------------------
+
+    def add(
+        self,
+        transcript: str,
+        segments: Iterable[dict],
+        media: Optional[str] = None,
+        language: Optional[str] = None,
+    ) -> int:
+        """
+        Index the *segments* of one transcript and return its file id.
+
+        *transcript* (the output path, stored as an absolute path) identifies
+        the file: adding it again replaces the previous version.
+        """
+        segments = list(segments)
+        texts = [segment["text"].strip().encode("utf-8") for segment in segments]
+        postings: Dict[str, List[int]] = {}
+        for idx, segment in enumerate(segments):
+            for token in dict.fromkeys(tokenize(segment["text"])):
+                postings.setdefault(token, []).append(idx)
+
+        with file_lock(os.path.join(self.index_dir, ".lock")):
+            file_id = self.catalog()["next_id"]
+            # The id is allocated in the catalog before anything refers to it: if
+            # this process dies before the entry below is written, the postings
+            # already appended stay orphaned under an id no other file receives.
+            self._append_catalog({"reserved": file_id})
+            np.savez(
+                self._columns_path(file_id),
+                start_ms=np.array([round(s["start"] * 1000) for s in segments], dtype=np.int64),
+                end_ms=np.array([round(s["end"] * 1000) for s in segments], dtype=np.int64),
+                text_offsets=np.cumsum([0] + [len(text) for text in texts], dtype=np.int64),
+                text=np.frombuffer(b"".join(texts), dtype=np.uint8),
+            )
+            by_shard: Dict[int, List[str]] = {}
+            for token, idxs in postings.items():
+                by_shard.setdefault(_shard(token), []).append(f"{token}\t{file_id}\t{','.join(map(str, idxs))}\n")
+            for shard, lines in by_shard.items():
+                with open(self._shard_path(shard), "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            self._append_catalog(
+                {
+                    "transcript": os.path.abspath(transcript),
+                    "id": file_id,
+                    "media": os.path.abspath(media) if media else None,
+                    "language": language,
+                    "segments": len(segments),
+                    "added": time.time(),
+                }
+            )
+        return file_id
+
+    def remove(self, transcript: str) -> bool:
+        with file_lock(os.path.join(self.index_dir, ".lock")):
+            found = os.path.abspath(transcript) in self.catalog()["files"]
+            if found:
+                self._append_catalog({"transcript": os.path.abspath(transcript), "removed": True})
+        return found
+
+    def compact(self) -> int:
+        """Drop postings and columns of replaced or removed files; returns the number of files dropped."""
+        with file_lock(os.path.join(self.index_dir, ".lock")):
+            catalog = self.catalog()
+            live = {str(entry["id"]) for entry in catalog["files"].values()}
+            tmp_path = f"{self._catalog_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                if catalog["next_id"]:
+                    # Ids are never reused, even those whose postings are being dropped.
+                    f.write(json.dumps({"reserved": catalog["next_id"] - 1}) + "\n")
+                for transcript, entry in catalog["files"].items():
+                    f.write(json.dumps({"transcript": transcript, **entry}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self._catalog_path)
+            for shard in range(N_SHARDS):
+                path = self._shard_path(shard)
+                if not os.path.exists(path):
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    kept = [line for line in f if line.split("\t", 2)[1] in live]
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.writelines(kept)
+                os.replace(tmp_path, path)
+            dropped = 0
+            for name in os.listdir(os.path.join(self.index_dir, "columns")):
+                if name.endswith(".npz") and name[: -len(".npz")] not in live:
+                    os.remove(os.path.join(self.index_dir, "columns", name))
+                    dropped += 1
+        self._columns.clear()
+        return dropped
+
+    # -- queries -------------------------------------------------------------
+
+    def _postings(self, token: str, live: Dict[int, int]) -> Dict[int, Set[int]]:
+        """Segments containing *token* per file id, for ids in *live* (id -> segment count)."""
+        prefix = token + "\t"
+        found: Dict[int, Set[int]] = {}
+        try:
+            with open(self._shard_path(_shard(token)), "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.startswith(prefix) or not line.endswith("\n"):
+                        continue
+                    _, file_id, idxs = line.rstrip("\n").split("\t")
+                    count = live.get(int(file_id))
+                    if count is not None:
+                        # Guards against postings the catalog entry does not cover.
+                        found.setdefault(int(file_id), set()).update(idx for idx in map(int, idxs.split(",")) if idx < count)
+        except FileNotFoundError:
+            pass
+        return found
+
+    def search(
+        self,
+        query: str,
+        phrase: bool = False,
+        file_filter: Optional[str] = None,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        limit: Optional[int] = 100,
+    ) -> List[dict]:
+        """
+        Segments containing every token of *query*.
+
+        Parameters
+        ----------
+        phrase : bool, optional
+            Require the tokens to appear consecutively, in order.
+        file_filter : str, optional
+            Only transcripts or media whose path contains this substring.
+        start_ms, end_ms : int, optional
+            Only segments overlapping this time range of their file.
+        limit : int, optional
+            Maximum number of results (None for all). Defaults to 100.
+
+        Returns
+        -------
+        list of dict
+            ``transcript``, ``media``, ``segment`` (its number in the file),
+            ``start_ms``, ``end_ms`` and ``text``, ordered by file and time.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        files = {
+            entry["id"]: (transcript, entry)
+            for transcript, entry in self.catalog()["files"].items()
+            if file_filter is None or file_filter in transcript or file_filter in (entry.get("media") or "")
+        }
+        matches = self._postings(tokens[0], {fid: entry["segments"] for fid, (_, entry) in files.items()})
+        for token in tokens[1:]:
+            if not matches:
+                break
+            other = self._postings(token, {fid: files[fid][1]["segments"] for fid in matches})
+            matches = {fid: idxs & other[fid] for fid, idxs in matches.items() if idxs & other.get(fid, set())}
+
+        wanted = " ".join(tokenize(query))
+        results = []
+        for file_id in sorted(matches, key=lambda fid: files[fid][0]):
+            transcript, entry = files[file_id]
+            columns = self._load_columns(file_id)
+            for idx in sorted(matches[file_id]):
+                if start_ms is not None and columns["end_ms"][idx] < start_ms:
+                    continue
+                if end_ms is not None and columns["start_ms"][idx] > end_ms:
+                    continue
+                text = self._text(columns, idx)
+                if phrase and f" {wanted} " not in f" {' '.join(tokenize(text))} ":
+                    continue
+                results.append(self._result(transcript, entry, columns, idx, text))
+                if limit is not None and len(results) >= limit:
+                    return results
+        return results
+
+    def segments_between(self, transcript: str, start_ms: int, end_ms: int) -> List[dict]:
+        """Segments of one indexed *transcript* overlapping ``[start_ms, end_ms]``."""
+        entry = self.catalog()["files"].get(os.path.abspath(transcript))
+        if entry is None:
+            raise KeyError(f"{transcript} is not in the index")
+        columns = self._load_columns(entry["id"])
+        # Segments are in time order, so the range is found by binary search.
+        first = int(np.searchsorted(columns["end_ms"], start_ms, side="left"))
+        last = int(np.searchsorted(columns["start_ms"], end_ms, side="right"))
+        return [
+            self._result(os.path.abspath(transcript), entry, columns, idx, self._text(columns, idx))
+            for idx in range(first, last)
+        ]
+
+    @staticmethod
+    def _result(transcript: str, entry: dict, columns: Dict[str, np.ndarray], idx: int, text: str) -> dict:
+        return {
+            "transcript": transcript,
+            "media": entry.get("media"),
+            "segment": idx,
+            "start_ms": int(columns["start_ms"][idx]),
+            "end_ms": int(columns["end_ms"][idx]),
+            "text": text,
+        }
+
+    def stats(self) -> dict:
+        files = self.catalog()["files"]
+        postings_bytes = sum(
+            os.path.getsize(self._shard_path(shard)) for shard in range(N_SHARDS) if os.path.exists(self._shard_path(shard))
+        )
+        return {
+            "files": len(files),
+            "segments": sum(entry["segments"] for entry in files.values()),
+            "postings_bytes": postings_bytes,
+        }
+
+
+def default_index() -> CorpusIndex:
+    """Index in ``WHISPER_CORPUS_DIR`` or ``./cache/corpus``."""
+    return CorpusIndex(os.environ.get("WHISPER_CORPUS_DIR") or DEFAULT_INDEX_DIR)
+
+
+_TIME = r"(\d+):(\d\d):(\d\d)[.,](\d{3})"
+_CUE = re.compile(rf"^\[?{_TIME}\s*(?:-->|-)\s*{_TIME}\]?\s*(.*)$")
+
+
+def _seconds(groups: Tuple[str, ...]) -> float:
+    hours, minutes, secs, millis = (int(group) for group in groups)
+    return hours * 3600 + minutes * 60 + secs + millis / 1000
+
+
+def read_timestamp_file(path: str) -> List[dict]:
+    """Segments (``start``, ``end``, ``text``) of a ``jsonl``, ``tsv``, ``srt``, ``vtt`` or timestamped ``txt`` file."""
+    ext = os.path.splitext(path)[1].lower()
+    segments = []
+    with open(path, "r", encoding="utf-8") as f:
+        if ext == ".jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        if ext == ".tsv":
+            for line in f:
+                parts = line.rstrip("\n").split("\t", 2)
+                if len(parts) == 3:
+                    segments.append({"start": float(parts[0]), "end": float(parts[1]), "text": parts[2]})
+            return segments
+        lines = f.read().splitlines()
+    for idx, line in enumerate(lines):
+        match = _CUE.match(line.strip())
+        if match is None:
+            continue
+        groups = match.groups()
+        text = groups[8]
+        if not text:
+            # srt/vtt: the text follows on the next lines, up to a blank line.
+            following = []
+            for next_line in lines[idx + 1 :]:
+                if not next_line.strip():
+                    break
+                following.append(next_line.strip())
+            text = " ".join(following)
+        segments.append({"start": _seconds(groups[:4]), "end": _seconds(groups[4:8]), "text": text})
+    return segments
+
+
+def _format_ms(ms: int) -> str:
+    seconds, millis = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}.{millis:03}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search transcribed segments, or add timestamp files to the index.")
+    parser.add_argument("--index", default=None, help="Index directory (default: $WHISPER_CORPUS_DIR or ./cache/corpus)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Index existing timestamp files (jsonl, tsv, srt, vtt, txt)")
+    add.add_argument("paths", nargs="+", help="Timestamp files or glob patterns")
+    search = commands.add_parser("search", help="Find segments containing all words of a query")
+    search.add_argument("query")
+    search.add_argument("--phrase", action="store_true", help="Match the words consecutively, in order")
+    search.add_argument("--file", default=None, help="Only files whose path contains this text")
+    search.add_argument("--from", dest="start_ms", type=int, default=None, metavar="MS", help="Only segments ending after MS")
+    search.add_argument("--to", dest="end_ms", type=int, default=None, metavar="MS", help="Only segments starting before MS")
+    search.add_argument("--limit", type=int, default=100, help="Maximum number of results (default: 100)")
+    search.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    commands.add_parser("stats", help="Print the size of the index")
+    commands.add_parser("compact", help="Drop data of replaced and removed files")
+    args = parser.parse_args()
+    index = CorpusIndex(args.index) if args.index else default_index()
+
+    if args.command == "add":
+        for pattern in args.paths:
+            for path in sorted(glob.glob(pattern)) or [pattern]:
+                segments = read_timestamp_file(path)
+                # Keyed like transcribe() does it: by the plain transcript path.
+                index.add(os.path.splitext(path)[0] + ".txt", segments)
+                print(f"Indexed {len(segments)} segments from {path}")
+    elif args.command == "search":
+        started = time.perf_counter()
+        results = index.search(args.query, args.phrase, args.file, args.start_ms, args.end_ms, args.limit)
+        for result in results:
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False))
+            else:
+                print(f"{result['transcript']} [{_format_ms(result['start_ms'])} - {_format_ms(result['end_ms'])}] {result['text']}")
+        if not args.json:
+            print(f"{len(results)} segments in {(time.perf_counter() - started) * 1000:.0f} ms")
+    elif args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+    else:
+        print(f"Dropped {index.compact()} replaced files")
+
+
+if __name__ == "__main__":
+    main()
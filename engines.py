@@ -0,0 +1,86 @@
+"""
+Inference engine variants of a Whisper model and CPU thread control.
+
+An engine is the third element of a `model_registry` key, so every prepared
+variant is cached next to the plain model:
+
+``fp32``
+    Stock PyTorch weights (the CPU default).
+``fp16``
+    Half precision (the GPU default).
+``int8``
+    Dynamic int8 quantization of all linear layers (CPU only). Usually 2-3x
+    faster than fp32 on x86/ARM CPUs with a small loss of accuracy.
+``compile``
+    The audio encoder wrapped in ``torch.compile``. Its input shape is fixed,
+    so it compiles once; the decoder stays eager because its kv-cache hooks and
+    growing sequence length defeat compilation. The first call is slow.
+"""
+from typing import Optional
+
+ENGINES = ("auto", "fp32", "fp16", "int8", "compile")
+
+
+def resolve_engine(engine: Optional[str], device: str) -> str:
+    """Map ``"auto"`` to the device default and reject unsupported combinations."""
+    if engine in (None, "auto"):
+        return "fp16" if device != "cpu" else "fp32"
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {', '.join(ENGINES)}")
+    if engine == "int8" and device != "cpu":
+        raise ValueError("The int8 engine uses dynamic quantization, which only runs on CPU")
+    if engine == "fp16" and device == "cpu":
+        raise ValueError("The fp16 engine needs a GPU; use fp32 or int8 on CPU")
+    return engine
+
+
+def uses_fp16(engine: str, device: str) -> bool:
+    """Whether ``model.transcribe()`` must be called with ``fp16=True`` for *engine*."""
+    return device != "cpu" and engine in ("fp16", "compile")
+
+
+def prepare_model(model, engine: str, device: str):
+    """Turn a freshly loaded fp32 model into the *engine* variant."""
+    if uses_fp16(engine, device):
+        model = model.half()
+    if engine == "int8":
+        model = _quantize_int8(model)
+    elif engine == "compile":
+        import torch
+
+        model.encoder = torch.compile(model.encoder)
+    return model
+
+
+def _quantize_int8(model):
+    import torch
+    import whisper.model
+    from torch import nn
+
+    # Whisper's Linear only adds a dtype cast to nn.Linear's forward, which is a
+    # no-op in fp32; quantize_dynamic only replaces exact nn.Linear instances.
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def configure_threads(threads: Optional[int] = None, interop_threads: Optional[int] = None) -> None:
+    """
+    Set torch intra-op (*threads*) and inter-op (*interop_threads*) thread counts.
+
+    Inter-op threads can only be set before the first parallel operation of
+    the process; later attempts keep the current value and print a warning.
+    """
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            print(
+                f"[warn] inter-op threads are already fixed at {torch.get_num_interop_threads()} "
+                "in this process; start a new process to change them"
+            )
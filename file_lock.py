@@ -0,0 +1,27 @@
+"""
+Exclusive advisory file locks shared by processes on one machine or over a
+shared filesystem (``flock`` on POSIX, ``msvcrt.locking`` on Windows).
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on *path* (created if missing) for the enclosed block."""
+    with open(path, "a+b") as f:
+        try:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+        except ImportError:  # Windows
+            import msvcrt
+
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        yield
@@ -0,0 +1,669 @@
+"""
+Local HTTP job service around `transcribe_video.transcribe()`.
+
+Jobs are queued in a bounded queue and run by a pool of long-lived worker
+processes; each worker keeps its models in the process-wide model registry, so
+only the first job of a model size pays for loading the checkpoint. When the
+queue is full, new submissions are rejected with ``429 Too Many Requests``.
+
+Endpoints
+---------
+``POST /jobs?filename=talk.mp4&model=small&language=ru``
+    Submit a job; the request body is the raw media file. Alternatively send
+    ``Content-Type: application/json`` with ``{"path": "/data/talk.mp4", ...}``
+    to transcribe a file that is already on this machine. Returns ``202`` with
+    the job status, or ``429`` when the queue is full.
+``GET /jobs`` / ``GET /jobs/<id>``
+    Status of all jobs / one job: state, seconds processed and percent.
+``GET /jobs/<id>/result?format=txt``
+    The transcript as ``txt``, ``srt``, ``vtt``, ``tsv`` or ``jsonl`` (``409`` until done).
+``DELETE /jobs/<id>``
+    Cancel a queued or running job, or forget a finished one.
+``GET /health``
+    Queue depth and worker count.
+
+Example::
+
+    python job_server.py --workers 2 --max-queue 8 -m small
+    curl -X POST --data-binary @meeting.mp4 "http://127.0.0.1:8765/jobs?filename=meeting.mp4"
+    curl "http://127.0.0.1:8765/jobs/<id>/result?format=srt"
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from audio_stream import decode_to_pcm, pipe_decodable
+from transcript_writers import render_segments
+
+DEFAULT_JOBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "jobs")
+RESULT_FORMATS = ("txt", "srt", "vtt", "tsv", "jsonl")
+TERMINAL_STATES = ("done", "failed", "cancelled")
+_UPLOAD_BLOCK = 1024 * 1024
+# Seconds between checks for dead workers and expired jobs.
+_HOUSEKEEPING_SECONDS = 1.0
+
+
+class QueueFull(RuntimeError):
+    """Raised by `JobServer.submit()` when the job queue is at capacity."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker to abort the running transcription."""
+
+
+def _release_pipe(path: str) -> None:
+    """Open and close the named pipe *path* for reading, so a server thread waiting to write into it goes on."""
+    try:
+        os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+    except OSError:
+        pass
+
+
+def _worker_main(tasks, events, cancelled, num_threads: int, preload: Optional[str]) -> None:
+    """Worker process: take jobs from *tasks* until ``None``, report on *events*."""
+    import torch
+
+    from audio_stream import SAMPLE_RATE, load_pcm
+    from model_registry import default_registry
+    from transcribe_video import transcribe
+    from transcript_cache import default_cache
+
+    torch.set_num_threads(num_threads)
+    if preload:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        default_registry.get(preload, device, "fp16" if device != "cpu" else "fp32")
+    events.put((None, "ready", os.getpid()))
+
+    while True:
+        job = tasks.get()
+        if job is None:
+            return
+        job_id = job["id"]
+
+        def on_segment(event, job_id=job_id) -> None:
+            events.put((job_id, "progress", event.seconds))
+            if job_id in cancelled:
+                raise JobCancelled(job_id)
+
+        try:
+            if job_id in cancelled:
+                raise JobCancelled(job_id)
+            events.put((job_id, "running", os.getpid()))
+            audio = None
+            duration = job["duration"]
+            if job["piped"]:
+                # The server decodes the upload into the pipe as it is read.
+                audio = load_pcm(job["media_path"])
+                if job_id in cancelled:  # also set when ffmpeg failed
+                    raise JobCancelled(job_id)
+                duration = len(audio) / SAMPLE_RATE
+                events.put((job_id, "duration", duration))
+            result = transcribe(
+                job["media_path"],
+                os.path.join(job["dir"], "transcript.txt"),
+                model_size=job["model_size"],
+                language=job["language"],
+                progress_total=duration,
+                on_segment=on_segment,
+                cache=default_cache() if job["use_cache"] else None,
+                audio=audio,
+                media_digest=job["digest"],
+            )
+            if job_id in cancelled:  # cancelled before any window was reported
+                raise JobCancelled(job_id)
+            result_path = os.path.join(job["dir"], "result.json")
+            with open(f"{result_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(f"{result_path}.tmp", result_path)
+        except JobCancelled:
+            events.put((job_id, "cancelled", None))
+        except Exception as e:  # reported to the client, the worker keeps running
+            events.put((job_id, "failed", f"{type(e).__name__}: {e}"))
+        else:
+            events.put((job_id, "done", result_path))
+        finally:
+            # Uploads are deleted here rather than by the server, which cannot
+            # tell whether a worker has already taken the job off the queue.
+            if job["piped"]:
+                _release_pipe(job["media_path"])  # not read if the job was skipped
+            elif job["owned"] and os.path.isfile(job["media_path"]):
+                os.remove(job["media_path"])
+
+
+class JobServer:
+    """
+    Bounded job queue served by a pool of warm worker processes.
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of worker processes. CPU threads are split evenly between them.
+    max_queue : int, optional
+        Maximum number of jobs waiting for a worker; `submit()` raises
+        `QueueFull` beyond that.
+    jobs_dir : str, optional
+        Where uploads, transcripts and results are stored, one directory per job.
+    model_size : str, optional
+        Default model size, preloaded by every worker at start-up.
+    language : str, optional
+        Default language; ``None`` lets Whisper detect it.
+    use_cache : bool, optional
+        Look jobs up in the transcript cache first.
+    keep_finished_seconds : float, optional
+        Forget finished jobs (and delete their directories) this long after
+        they end. Defaults to None: kept until cancelled.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_queue: int = 8,
+        jobs_dir: str = DEFAULT_JOBS_DIR,
+        model_size: str = "small",
+        language: Optional[str] = "ru",
+        use_cache: bool = False,
+        keep_finished_seconds: Optional[float] = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.jobs_dir = jobs_dir
+        self.model_size = model_size
+        self.language = language
+        self.use_cache = use_cache
+        self.keep_finished_seconds = keep_finished_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._running = {}  # worker pid -> job id
+        self._stopping = threading.Event()
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._manager = self._context.Manager()
+        self._cancelled = self._manager.dict()
+        self._tasks = self._context.Queue()
+        self._events = self._context.Queue()
+        for _ in range(self.workers):
+            self._spawn_worker()
+        self._collector = threading.Thread(target=self._collect, name="job-events", daemon=True)
+        self._collector.start()
+
+    def _spawn_worker(self) -> None:
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._tasks, self._events, self._cancelled, threads, self.model_size),
+            daemon=True,
+        )
+        process.start()
+        self._processes.append(process)
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._manager.shutdown()
+
+    # -- jobs --------------------------------------------------------------
+
+    def submit(
+        self,
+        media_path: str,
+        filename: Optional[str] = None,
+        model_size: Optional[str] = None,
+        language: Optional[str] = "",
+        owned: bool = False,
+        job_id: Optional[str] = None,
+        use_cache: Optional[bool] = None,
+    ) -> dict:
+        """
+        Queue *media_path* for transcription and return the job status.
+
+        With *owned* the file belongs to the job (an upload) and is deleted by
+        the worker once the job finishes or is skipped as cancelled. An empty
+        *language* and ``None`` for *model_size* or *use_cache* mean the
+        server defaults.
+        """
+        from transcribe_video import _probe_duration_seconds
+
+        job = self._add_job(media_path, filename, model_size, language, owned, job_id, use_cache)
+        job["duration"] = _probe_duration_seconds(media_path)
+        self._enqueue(job)
+        return self.status(job["id"])
+
+    def submit_upload(
+        self,
+        data,
+        filename: str,
+        model_size: Optional[str] = None,
+        language: Optional[str] = "",
+        use_cache: Optional[bool] = None,
+    ) -> dict:
+        """
+        Queue an upload held in memory (e.g. Streamlit's ``file.getbuffer()``)
+        and return the job status.
+
+        A thread of this process pipes the bytes into ffmpeg, whose 16 kHz PCM
+        goes through a named pipe to the worker that takes the job. Neither the
+        upload nor the decoded audio is written to disk, and the caller does
+        not wait for the decode. *data* is kept until a worker has read it.
+        Uploads ffmpeg cannot read from a pipe (see
+        `audio_stream.pipe_decodable()`), and every upload where named pipes
+        are not available, are written to the job directory and submitted as
+        owned files instead.
+        """
+        job_id, path = self.new_upload_path(filename)
+        try:
+            if not hasattr(os, "mkfifo") or not pipe_decodable(data, filename):
+                with open(path, "wb") as f:
+                    f.write(data)
+                return self.submit(path, filename=filename, model_size=model_size, language=language, owned=True, job_id=job_id, use_cache=use_cache)
+            pipe_path = os.path.join(os.path.dirname(path), "input.pcm")
+            os.mkfifo(pipe_path)
+            job = self._add_job(pipe_path, filename, model_size, language, True, job_id, use_cache, piped=True)
+        except BaseException:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            raise
+        threading.Thread(target=self._feed_upload, args=(job, data), name=f"upload-{job_id}", daemon=True).start()
+        return self.status(job_id)
+
+    def _feed_upload(self, job: dict, data) -> None:
+        """Queue a piped job, then decode the upload into its pipe while the worker reads it."""
+        try:
+            if job["use_cache"]:
+                job["digest"] = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                if job["state"] in TERMINAL_STATES:
+                    return
+                self._enqueue(job)
+            # Blocks until the worker that takes the job opens the pipe, or
+            # releases it unread because the job was cancelled.
+            with open(job["media_path"], "wb") as out:
+                with self._lock:
+                    if job["state"] in TERMINAL_STATES:
+                        return
+                try:
+                    decode_to_pcm(data, out)
+                except Exception as e:
+                    # Flagged before the pipe is closed, so the worker sees it
+                    # as soon as it has read to the end.
+                    with self._lock:
+                        if job["state"] not in TERMINAL_STATES:
+                            self._cancelled[job["id"]] = True
+                            self._finish(job, "failed", f"{type(e).__name__}: {e}")
+        finally:
+            try:
+                os.remove(job["media_path"])
+            except OSError:
+                pass
+
+    def _add_job(
+        self,
+        media_path: str,
+        filename: Optional[str],
+        model_size: Optional[str],
+        language: Optional[str],
+        owned: bool,
+        job_id: Optional[str],
+        use_cache: Optional[bool],
+        piped: bool = False,
+    ) -> dict:
+        """Register a queued job (see `submit()`), or raise `QueueFull`."""
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job["state"] == "queued")
+            if queued >= self.max_queue:
+                raise QueueFull(f"{queued} jobs are already waiting")
+            job_id = job_id or uuid.uuid4().hex[:12]
+            job = {
+                "id": job_id,
+                "state": "queued",
+                "filename": filename or os.path.basename(media_path),
+                "media_path": media_path,
+                "dir": os.path.join(self.jobs_dir, job_id),
+                "model_size": model_size or self.model_size,
+                "language": self.language if language == "" else language,
+                "use_cache": self.use_cache if use_cache is None else use_cache,
+                "owned": owned,
+                "piped": piped,
+                "digest": None,
+                "duration": None,
+                "seconds": 0.0,
+                "error": None,
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+            }
+            self._jobs[job_id] = job
+        os.makedirs(job["dir"], exist_ok=True)
+        return job
+
+    def _enqueue(self, job: dict) -> None:
+        keys = ("id", "media_path", "dir", "model_size", "language", "use_cache", "duration", "owned", "piped", "digest")
+        self._tasks.put({k: job[k] for k in keys})
+
+    def new_upload_path(self, filename: str) -> "tuple[str, str]":
+        """Return ``(job_id, path)`` to store an upload under before `submit()`."""
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        return job_id, os.path.join(job_dir, f"input{os.path.splitext(filename)[1].lower()}")
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            total = job["duration"]
+            return {
+                "id": job["id"],
+                "state": job["state"],
+                "filename": job["filename"],
+                "model": job["model_size"],
+                "language": job["language"],
+                "seconds": round(job["seconds"], 1),
+                "total_seconds": total,
+                "percent": round(min(100.0, job["seconds"] / total * 100.0), 1) if total else None,
+                "error": job["error"],
+                "submitted": job["submitted"],
+                "started": job["started"],
+                "finished": job["finished"],
+            }
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            ids = list(self._jobs)
+        return [self.status(job_id) for job_id in ids]
+
+    def health(self) -> dict:
+        with self._lock:
+            states = [job["state"] for job in self._jobs.values()]
+        return {
+            "workers": sum(1 for p in self._processes if p.is_alive()),
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "max_queue": self.max_queue,
+        }
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued or running job; a finished job is forgotten and its files removed."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["state"] in TERMINAL_STATES:
+                del self._jobs[job_id]
+                shutil.rmtree(job["dir"], ignore_errors=True)
+                return {"id": job_id, "state": "deleted"}
+            # Workers check the flag when they take the job and after every
+            # window; the worker, not this thread, removes an uploaded file.
+            self._cancelled[job_id] = True
+            if job["state"] == "queued":
+                # Free the queue slot now; the worker that picks it up skips it.
+                self._finish(job, "cancelled")
+        return self.status(job_id)
+
+    def result(self, job_id: str) -> Optional[dict]:
+        """The stored Whisper result of a finished job, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != "done":
+                return None
+        with open(os.path.join(job["dir"], "result.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def render(self, job_id: str, fmt: str = "txt") -> Optional[str]:
+        result = self.result(job_id)
+        if result is None:
+            return None
+        if fmt == "txt":
+            return result["text"].strip() + "\n"
+        return render_segments(result.get("segments", []), fmt)
+
+    # -- worker events -----------------------------------------------------
+
+    def _finish(self, job: dict, state: str, error: Optional[str] = None) -> None:
+        job["state"] = state
+        job["error"] = error
+        job["finished"] = time.time()
+
+    def _collect(self) -> None:
+        next_housekeeping = time.monotonic()
+        while not self._stopping.is_set():
+            # On a fixed schedule: a steady stream of progress events from the
+            # other workers must not delay noticing a dead one.
+            if time.monotonic() >= next_housekeeping:
+                self._reap_workers()
+                self._expire_finished()
+                next_housekeeping = time.monotonic() + _HOUSEKEEPING_SECONDS
+            try:
+                job_id, kind, payload = self._events.get(timeout=max(0.0, next_housekeeping - time.monotonic()))
+            except queue.Empty:
+                continue
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if kind == "running":
+                    self._running[payload] = job_id
+                elif kind in TERMINAL_STATES:
+                    self._running = {pid: jid for pid, jid in self._running.items() if jid != job_id}
+                    self._cancelled.pop(job_id, None)
+                if job is None or job["state"] in TERMINAL_STATES:
+                    continue
+                if kind == "running":
+                    job["state"] = "running"
+                    job["started"] = time.time()
+                elif kind == "progress":
+                    job["seconds"] = max(job["seconds"], payload)
+                elif kind == "duration":
+                    job["duration"] = payload
+                elif kind == "done":
+                    job["seconds"] = job["duration"] or job["seconds"]
+                    self._finish(job, "done")
+                elif kind in ("failed", "cancelled"):
+                    self._finish(job, kind, payload)
+
+    def _expire_finished(self) -> None:
+        if self.keep_finished_seconds is None:
+            return
+        deadline = time.time() - self.keep_finished_seconds
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job["state"] in TERMINAL_STATES and job["finished"] < deadline
+            ]
+            for job_id in expired:
+                shutil.rmtree(self._jobs.pop(job_id)["dir"], ignore_errors=True)
+
+    def _reap_workers(self) -> None:
+        """Fail the job of a crashed worker and start a replacement."""
+        for process in list(self._processes):
+            if process.is_alive() or self._stopping.is_set():
+                continue
+            self._processes.remove(process)
+            with self._lock:
+                job = self._jobs.get(self._running.pop(process.pid, None))
+                if job is not None:
+                    if job["state"] not in TERMINAL_STATES:
+                        self._finish(job, "failed", f"worker exited with code {process.exitcode}")
+                    if job["piped"]:
+                        _release_pipe(job["media_path"])
+                    elif job["owned"] and os.path.isfile(job["media_path"]):
+                        os.remove(job["media_path"])
+            self._spawn_worker()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "WhisperJobServer/1.0"
+
+    @property
+    def jobs(self) -> JobServer:
+        return self.server.jobs
+
+    def log_message(self, format, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: str, content_type: str = "application/json", headers: Optional[dict] = None) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, payload, headers: Optional[dict] = None) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False), headers=headers)
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return parts, query
+
+    def do_GET(self) -> None:
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._send_json(200, self.jobs.health())
+        if parts == ["jobs"]:
+            return self._send_json(200, self.jobs.list())
+        if len(parts) >= 2 and parts[0] == "jobs":
+            status = self.jobs.status(parts[1])
+            if status is None:
+                return self._send_json(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._send_json(200, status)
+            if parts[2:] == ["result"]:
+                fmt = query.get("format", "txt")
+                if fmt not in RESULT_FORMATS:
+                    return self._send_json(400, {"error": f"format must be one of {', '.join(RESULT_FORMATS)}"})
+                if status["state"] != "done":
+                    return self._send_json(409, {"error": f"job is {status['state']}", **status})
+                content_type = {"vtt": "text/vtt", "jsonl": "application/x-ndjson"}.get(fmt, "text/plain")
+                return self._send(200, self.jobs.render(parts[1], fmt), content_type)
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._send_json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        language = query.get("language", "")
+        if language == "auto":
+            language = None
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = body.get("path")
+                if not path or not os.path.isfile(path):
+                    return self._send_json(400, {"error": "'path' must name an existing file"})
+                language = body.get("language", language)
+                status = self.jobs.submit(path, model_size=body.get("model") or query.get("model"), language=language)
+            else:
+                if length <= 0:
+                    return self._send_json(400, {"error": "empty upload"})
+                filename = os.path.basename(query.get("filename", "upload.bin"))
+                job_id, path = self.jobs.new_upload_path(filename)
+                # Stream the body to disk instead of holding the upload in memory.
+                remaining = length
+                try:
+                    with open(path, "wb") as f:
+                        while remaining > 0:
+                            block = self.rfile.read(min(_UPLOAD_BLOCK, remaining))
+                            if not block:
+                                break
+                            f.write(block)
+                            remaining -= len(block)
+                except BaseException:
+                    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+                    raise
+                if remaining > 0:
+                    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+                    return self._send_json(400, {"error": f"upload ended after {length - remaining} of {length} bytes"})
+                try:
+                    status = self.jobs.submit(
+                        path, filename=filename, model_size=query.get("model"), language=language, owned=True, job_id=job_id
+                    )
+                except QueueFull:
+                    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+                    raise
+        except QueueFull as e:
+            return self._send_json(429, {"error": str(e)}, headers={"Retry-After": "10"})
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, status, headers={"Location": f"/jobs/{status['id']}"})
+
+    def do_DELETE(self) -> None:
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._send_json(404, {"error": "not found"})
+        status = self.jobs.cancel(parts[1])
+        if status is None:
+            return self._send_json(404, {"error": "unknown job"})
+        self._send_json(200, status)
+
+
+def serve(jobs: JobServer, host: str = "127.0.0.1", port: int = 8765, verbose: bool = False) -> None:
+    """Run the HTTP front end for *jobs* until interrupted."""
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.jobs = jobs
+    httpd.verbose = verbose
+    jobs.start()
+    print(f"Job server listening on http://{host}:{port} ({jobs.workers} workers, queue {jobs.max_queue})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        jobs.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local HTTP job server for Whisper transcription.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each keeping its models loaded (default: 1)")
+    parser.add_argument("--max-queue", type=int, default=8, help="Jobs allowed to wait before submissions get 429 (default: 8)")
+    parser.add_argument("--jobs-dir", default=DEFAULT_JOBS_DIR, help="Where uploads and results are kept (default: ./cache/jobs)")
+    parser.add_argument("-m", "--model", default="small", choices=["tiny", "base", "small", "medium", "large"], help="Default model, preloaded by the workers (default: small)")
+    parser.add_argument("-l", "--language", default="ru", help="Default language code, or 'auto' (default: ru)")
+    parser.add_argument("--cache", action="store_true", help="Reuse cached transcripts of identical media")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    parser.add_argument("--shared-weights", action="store_true", help="Let all workers share one memory-mapped copy of the CPU model weights")
+    args = parser.parse_args()
+    if args.shared_weights:
+        from model_registry import enable_shared_weights
+
+        enable_shared_weights()
+    jobs = JobServer(
+        workers=args.workers,
+        max_queue=args.max_queue,
+        jobs_dir=args.jobs_dir,
+        model_size=args.model,
+        language=None if args.language == "auto" else args.language,
+        use_cache=args.cache,
+    )
+    serve(jobs, args.host, args.port, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
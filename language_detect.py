@@ -0,0 +1,155 @@
+"""
+Model-based spoken-language detection for batch runs.
+
+Only the first 30 seconds of each file are decoded and passed through
+Whisper's language-identification head, using a small model (``tiny`` by
+default) that stays resident in the model registry. Results are cached per
+file (path + size + mtime + detection model), so re-running a batch does not
+detect again; new results are written once per batch with `LanguageDetector.save()`.
+"""
+import json
+import os
+import subprocess
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from file_lock import file_lock
+from model_registry import ModelRegistry, default_registry
+
+SAMPLE_RATE = 16000
+DETECT_SECONDS = 30
+DEFAULT_LANGUAGE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "languages.json")
+
+
+def load_audio_head(media_path: str, seconds: float = DETECT_SECONDS) -> np.ndarray:
+    """Decode only the first *seconds* of *media_path* to 16 kHz mono float32."""
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads",
+        "0",
+        "-t",
+        str(seconds),
+        "-i",
+        media_path,
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def detect_model_language(model, audio: np.ndarray) -> Tuple[str, float]:
+    """
+    ``(language_code, probability)`` from *model*'s language-identification
+    head on the first 30 seconds of *audio*; English-only models give
+    ``("en", 1.0)``.
+    """
+    import whisper
+
+    if not model.is_multilingual:
+        return "en", 1.0
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+    mel = mel.to(model.device, dtype=next(model.parameters()).dtype)
+    _, probs = model.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, float(probs[language])
+
+
+class LanguageDetector:
+    """
+    Detect the spoken language of media files with a resident Whisper model.
+
+    Parameters
+    ----------
+    model_size : str, optional
+        Model used for detection. Must be multilingual (not an ``.en`` model).
+    device : str, optional
+        Device for the detection model. Defaults to CUDA when available.
+    cache_path : str, optional
+        JSON file with cached results; ``None`` disables the cache. Results of
+        `detect()` are only written to it by `save()`.
+    registry : ModelRegistry, optional
+        Registry holding the detection model. Defaults to the process-wide one.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "tiny",
+        device: Optional[str] = None,
+        cache_path: Optional[str] = DEFAULT_LANGUAGE_CACHE,
+        registry: Optional[ModelRegistry] = None,
+    ) -> None:
+        if device is None:
+            import torch
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model_size = model_size
+        self.device = device
+        self.cache_path = cache_path
+        self.registry = registry or default_registry
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+        self._new = {}
+
+    def _load_cache(self) -> dict:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        """Write the results detected since the last save to the cache file.
+
+        The file is re-read under a lock first, so entries written meanwhile by
+        other runs are kept.
+        """
+        with self._lock:
+            if not self.cache_path or not self._new:
+                return
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with file_lock(f"{self.cache_path}.lock"):
+                cache = self._load_cache()
+                cache.update(self._new)
+                tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f, indent=1)
+                os.replace(tmp_path, self.cache_path)
+            self._cache = cache
+            self._new = {}
+
+    def _cache_key(self, media_path: str) -> str:
+        stat = os.stat(media_path)
+        return f"{os.path.abspath(media_path)}|{stat.st_size}|{stat.st_mtime_ns}|{self.model_size}"
+
+    def detect(self, media_path: str) -> Tuple[str, float]:
+        """Return ``(language_code, probability)`` for *media_path*."""
+        key = self._cache_key(media_path)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached["language"], cached["probability"]
+
+        audio = load_audio_head(media_path)
+        precision = "fp16" if self.device != "cpu" else "fp32"
+        with self.registry.use(self.model_size, self.device, precision) as model:
+            language, probability = detect_model_language(model, audio)
+
+        with self._lock:
+            self._cache[key] = self._new[key] = {"language": language, "probability": probability}
+        return language, probability
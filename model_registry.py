@@ -0,0 +1,250 @@
+"""
+Process-wide registry of loaded Whisper models.
+
+Loading a checkpoint is expensive (hundreds of MB to several GB have to be
+deserialized), so every entry point goes through `get_model()` instead of
+calling `whisper.load_model()` directly. Models stay warm between calls and are
+evicted in least-recently-used order once the configured limits are exceeded.
+"""
+import gc
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+ModelKey = Tuple[str, str, str]
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _model_nbytes(model) -> int:
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    for module in model.modules():
+        # int8 engine: quantized linear weights live in packed params, not parameters
+        weight = getattr(module, "weight", None)
+        if callable(weight) and hasattr(module, "_packed_params"):
+            weight = weight()
+            total += weight.numel() * weight.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    LRU cache of Whisper models keyed by ``(model_size, device, precision)``.
+
+    *precision* is an engine name from `engines.ENGINES` (``"fp32"``,
+    ``"fp16"``, ``"int8"`` or ``"compile"``), so each prepared variant of a
+    model is cached and evicted on its own.
+
+    Parameters
+    ----------
+    max_models : int, optional
+        Maximum number of models kept loaded at the same time. ``None`` means
+        no limit on the count.
+    max_bytes : int, optional
+        Maximum total size of the weights kept loaded. ``None`` means no limit.
+        The most recently requested model is never evicted, even if it alone
+        exceeds the limit.
+    download_root : str, optional
+        Directory where Whisper checkpoints are downloaded and cached.
+    shared_weights : bool, optional
+        Load CPU models with their weights memory-mapped from a shared fp32
+        file (see `shared_weights`), so all processes on the machine use one
+        copy. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        max_models: Optional[int] = 2,
+        max_bytes: Optional[int] = None,
+        download_root: str = DEFAULT_MODELS_DIR,
+        shared_weights: bool = False,
+    ) -> None:
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.download_root = download_root
+        self.shared_weights = shared_weights
+        self._models: "OrderedDict[ModelKey, object]" = OrderedDict()
+        self._sizes: Dict[ModelKey, int] = {}
+        self._use_locks: Dict[ModelKey, threading.Lock] = {}
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_size: str, device: str = "cpu", precision: str = "fp32"):
+        """Return a loaded model, loading it on first use."""
+        key = (model_size, device, precision)
+        with self._lock:
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # Only callers of the same key wait for a cold load; warm models keep
+        # being served from the registry lock meanwhile.
+        with load_lock:
+            with self._lock:
+                model = self._lookup(key)
+                if model is not None:
+                    return model
+                self.misses += 1
+            model = self._load(model_size, device, precision)
+            nbytes = _model_nbytes(model)
+            with self._lock:
+                self._models[key] = model
+                self._sizes[key] = nbytes
+                self._evict()
+            return model
+
+    def _lookup(self, key: ModelKey):
+        model = self._models.get(key)
+        if model is not None:
+            self._models.move_to_end(key)
+            self.hits += 1
+        return model
+
+    @contextmanager
+    def use(self, model_size: str, device: str = "cpu", precision: str = "fp32") -> Iterator[object]:
+        """
+        Hold a model exclusively while transcribing with it.
+
+        Whisper installs per-call hooks on the model, so one model instance must
+        not decode in two threads at once. Different models run concurrently.
+        """
+        key = (model_size, device, precision)
+        with self._lock:
+            use_lock = self._use_locks.setdefault(key, threading.Lock())
+        with use_lock:
+            yield self.get(model_size, device, precision)
+
+    def _load(self, model_size: str, device: str, precision: str):
+        import whisper
+
+        from engines import prepare_model
+
+        os.makedirs(self.download_root, exist_ok=True)
+        if self.shared_weights and device == "cpu":
+            from shared_weights import load_shared_model
+
+            model = load_shared_model(model_size, self.download_root)
+        else:
+            model = whisper.load_model(model_size, device=device, download_root=self.download_root)
+        return prepare_model(model, precision, device)
+
+    def _evict(self) -> None:
+        while len(self._models) > 1 and self._over_limits():
+            key, _ = self._models.popitem(last=False)
+            self._sizes.pop(key, None)
+            self._free(key[1])
+
+    def _over_limits(self) -> bool:
+        if self.max_models is not None and len(self._models) > self.max_models:
+            return True
+        if self.max_bytes is not None and self.total_bytes() > self.max_bytes:
+            return True
+        return False
+
+    @staticmethod
+    def _free(device: str) -> None:
+        gc.collect()
+        if device.startswith("cuda"):
+            import torch
+
+            torch.cuda.empty_cache()
+
+    def release(
+        self,
+        model_size: Optional[str] = None,
+        device: Optional[str] = None,
+        precision: Optional[str] = None,
+    ) -> int:
+        """
+        Drop loaded models matching the given key parts (``None`` matches
+        anything), so ``release()`` without arguments unloads everything.
+        Returns the number of models released.
+        """
+        with self._lock:
+            released = [
+                key
+                for key in self._models
+                if (model_size is None or key[0] == model_size)
+                and (device is None or key[1] == device)
+                and (precision is None or key[2] == precision)
+            ]
+            for key in released:
+                del self._models[key]
+                self._sizes.pop(key, None)
+            for dev in {key[1] for key in released}:
+                self._free(dev)
+            return len(released)
+
+    def configure(self, max_models: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """Change the eviction limits; already loaded models are trimmed right away."""
+        with self._lock:
+            self.max_models = max_models
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def keys(self) -> List[ModelKey]:
+        with self._lock:
+            return list(self._models)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def __contains__(self, key: ModelKey) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+_max_models_env = _env_int("WHISPER_MAX_LOADED_MODELS")
+_max_mb_env = _env_int("WHISPER_MAX_LOADED_MB")
+
+default_registry = ModelRegistry(
+    max_models=_max_models_env if _max_models_env is not None else 2,
+    max_bytes=_max_mb_env * 1024 * 1024 if _max_mb_env is not None else None,
+    download_root=os.environ.get("WHISPER_CACHE_DIR") or DEFAULT_MODELS_DIR,
+    shared_weights=os.environ.get("WHISPER_SHARED_WEIGHTS", "").strip().lower() in ("1", "true", "yes"),
+)
+
+
+def enable_shared_weights() -> None:
+    """
+    Share CPU model weights between processes (see `shared_weights`) from now
+    on, in this process and in the worker processes it starts: the setting is
+    exported as ``WHISPER_SHARED_WEIGHTS``, which spawned children inherit.
+    """
+    os.environ["WHISPER_SHARED_WEIGHTS"] = "1"
+    default_registry.shared_weights = True
+
+
+def get_model(model_size: str, device: str = "cpu", precision: str = "fp32"):
+    """Shortcut for ``default_registry.get(...)``."""
+    return default_registry.get(model_size, device, precision)
+
+
+def release(
+    model_size: Optional[str] = None,
+    device: Optional[str] = None,
+    precision: Optional[str] = None,
+) -> int:
+    """Shortcut for ``default_registry.release(...)``."""
+    return default_registry.release(model_size, device, precision)
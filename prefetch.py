@@ -0,0 +1,135 @@
+"""
+Decode the next files of a batch while the current one is transcribed.
+
+Decoding (ffmpeg) and inference (torch) use the CPU in turn when a batch runs
+them one after another. `Prefetcher` moves decoding to a small background
+pool so that the following files are ready as waveforms by the time the model
+is free. ffmpeg runs in its own process and torch releases the GIL, so
+threads are enough and the arrays need no copying between processes.
+
+The buffer is bounded twice: at most *depth* files are decoded ahead, and
+no new decode is started while the waiting audio (estimated from the probed
+duration until a decode finishes) exceeds *max_bytes*. One file is always
+allowed, so a recording larger than the cap is still prefetched on its own.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Generic, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from audio_stream import SAMPLE_RATE
+
+DEFAULT_DEPTH = 2
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# Cap for concurrent ffprobe calls (they spend their time waiting on I/O).
+PROBE_WORKERS = 8
+
+T = TypeVar("T")
+
+
+def audio_bytes(seconds: Optional[float]) -> int:
+    """Size of *seconds* of decoded 16 kHz float32 audio (0 when unknown)."""
+    return int((seconds or 0.0) * SAMPLE_RATE * 4)
+
+
+def probe_all(paths: Sequence[str], probe: Callable[[str], Optional[float]], workers: int = PROBE_WORKERS) -> List[Optional[float]]:
+    """Run *probe* on every path concurrently; results are in the order of *paths*."""
+    if len(paths) <= 1:
+        return [probe(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths)), thread_name_prefix="probe") as pool:
+        return list(pool.map(probe, paths))
+
+
+class Prefetcher(Generic[T]):
+    """
+    Iterate over *items* with each one's audio decoded in the background.
+
+    Parameters
+    ----------
+    items : sequence
+        Work items (e.g. batch jobs), yielded in order.
+    decode : callable
+        ``decode(item)`` returns the waveform of *item*, or None to let the
+        consumer decode it itself. Exceptions are reported as None too, so the
+        consumer's own decode raises them in the usual place.
+    depth : int, optional
+        How many files are decoded ahead. Defaults to 2.
+    max_bytes : int, optional
+        Cap on the decoded audio waiting in the buffer. Defaults to 1 GiB.
+    estimate : callable, optional
+        ``estimate(item)`` is the expected decoded size in bytes before the
+        decode finishes. Defaults to 0 (only finished decodes count).
+
+    Examples
+    --------
+    >>> for job, audio in Prefetcher(jobs, decode_job, depth=2):
+    ...     transcribe(job["media_path"], job["out_txt"], audio=audio)
+    """
+
+    def __init__(
+        self,
+        items: Sequence[T],
+        decode: Callable[[T], Optional[np.ndarray]],
+        depth: int = DEFAULT_DEPTH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        estimate: Optional[Callable[[T], int]] = None,
+    ) -> None:
+        self.items = list(items)
+        self.decode = decode
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.estimate = estimate or (lambda item: 0)
+        self.hits = 0
+        self.misses = 0
+        self.peak_bytes = 0
+
+    def _decode(self, item: T) -> Optional[np.ndarray]:
+        try:
+            return self.decode(item)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _size(estimate: int, future: Future) -> int:
+        if future.done():
+            audio = future.result()
+            return audio.nbytes if audio is not None else 0
+        return estimate
+
+    def __iter__(self) -> Iterator[Tuple[T, Optional[np.ndarray]]]:
+        pending: Deque[Tuple[T, int, Future]] = deque()
+        upcoming = iter(self.items)
+        following: List[T] = []
+
+        def fill(pool: ThreadPoolExecutor) -> None:
+            while len(pending) < self.depth:
+                if not following:
+                    try:
+                        following.append(next(upcoming))
+                    except StopIteration:
+                        return
+                item = following[0]
+                estimate = self.estimate(item)
+                buffered = sum(self._size(size, future) for _, size, future in pending)
+                if pending and buffered + estimate > self.max_bytes:
+                    return
+                following.pop()
+                pending.append((item, estimate, pool.submit(self._decode, item)))
+                self.peak_bytes = max(self.peak_bytes, buffered + estimate)
+
+        with ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="prefetch") as pool:
+            fill(pool)
+            while pending:
+                item, _, future = pending.popleft()
+                audio = future.result()
+                if audio is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                # Start the next decode before handing this file over, so it
+                # overlaps this file's inference.
+                fill(pool)
+                yield item, audio
+                del audio
+                fill(pool)
@@ -0,0 +1,179 @@
+"""
+Per-stage timing instrumentation for transcription jobs.
+
+A `Profiler` records wall-clock and CPU time for each pipeline stage (ffprobe,
+model load, ffmpeg decode, mel computation, inference, output writing), the
+latency of every decoded window and every ``model.decode()`` call, and the
+number of temperature fallbacks. Records are appended to a JSON-lines file so
+that several worker processes can share one file, and `format_summary()`
+turns them into a table.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional
+
+
+class Profiler:
+    """
+    Collect timing records and optionally append them to a JSON-lines file.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSON-lines file to append records to. Records are always kept in
+        ``self.records`` as well.
+    run_id : str, optional
+        Identifier shared by all records of one run; generated when omitted.
+    context : dict, optional
+        Extra fields added to every record (e.g. ``{"file": ...}``).
+    """
+
+    def __init__(self, path: Optional[str] = None, run_id: Optional[str] = None, context: Optional[dict] = None) -> None:
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.context = dict(context or {})
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+        # Per-window counters, reset by `on_segment`.
+        self._decode_calls = 0
+        self._fallbacks = 0
+        self._window_start = time.perf_counter()
+
+    def for_file(self, media_path: str) -> "Profiler":
+        """A profiler for one file that shares this one's sink and run id."""
+        child = Profiler(self.path, self.run_id, {**self.context, "file": media_path})
+        child.records = self.records
+        child._lock = self._lock
+        return child
+
+    def add(self, kind: str, **fields) -> dict:
+        record = {"run": self.run_id, "pid": os.getpid(), "ts": round(time.time(), 3), "kind": kind, **self.context, **fields}
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    @contextmanager
+    def stage(self, name: str, **extra) -> Iterator[dict]:
+        """Time the enclosed block as stage *name*; *extra* may be updated inside the block."""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield extra
+        finally:
+            self.add(
+                "stage",
+                stage=name,
+                wall_s=round(time.perf_counter() - wall_start, 6),
+                cpu_s=round(time.process_time() - cpu_start, 6),
+                **extra,
+            )
+
+    @contextmanager
+    def decode_hook(self, model) -> Iterator[None]:
+        """Record latency and temperature of every ``model.decode()`` call made by Whisper."""
+        previous = model.__dict__.get("decode")
+        original = model.decode
+        self._decode_calls = 0
+        self._fallbacks = 0
+        self._window_start = time.perf_counter()
+
+        def _timed_decode(mel, options, *args, **kwargs):
+            start = time.perf_counter()
+            result = original(mel, options, *args, **kwargs)
+            fallback = getattr(options, "temperature", 0.0) > 0
+            self._decode_calls += 1
+            self._fallbacks += int(fallback)
+            self.add(
+                "decode",
+                latency_s=round(time.perf_counter() - start, 6),
+                temperature=getattr(options, "temperature", None),
+                fallback=fallback,
+            )
+            return result
+
+        model.decode = _timed_decode
+        try:
+            yield
+        finally:
+            if previous is None:
+                del model.decode
+            else:
+                model.decode = previous
+
+    def on_segment(self, event) -> None:
+        """``on_segment`` callback: one ``window`` record per `progress_events.SegmentEvent`."""
+        now = time.perf_counter()
+        self.add(
+            "window",
+            latency_s=round(now - self._window_start, 6),
+            seconds=round(event.seconds, 3),
+            segments=len(event.segments),
+            decode_calls=self._decode_calls,
+            fallbacks=self._fallbacks,
+        )
+        self._window_start = now
+        self._decode_calls = 0
+        self._fallbacks = 0
+
+
+def timed(profiler: Optional[Profiler], name: str, **extra):
+    """``profiler.stage(name)`` or a no-op context when profiling is off."""
+    if profiler is None:
+        return nullcontext(extra)
+    return profiler.stage(name, **extra)
+
+
+def load_records(path: str, run_id: Optional[str] = None) -> List[dict]:
+    """Read records from a JSON-lines file, optionally only those of *run_id*."""
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if run_id is None or record.get("run") == run_id:
+                    records.append(record)
+    except OSError:
+        pass
+    return records
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def format_summary(records: List[dict]) -> str:
+    """Aggregate records into a per-stage table plus decode/fallback totals."""
+    stages: Dict[str, List[dict]] = {}
+    for record in records:
+        if record.get("kind") == "stage":
+            stages.setdefault(record["stage"], []).append(record)
+    lines = [f"{'stage':<14} {'count':>6} {'wall_s':>10} {'cpu_s':>10} {'mean_s':>9} {'p95_s':>9}"]
+    for name, rows in sorted(stages.items(), key=lambda item: -sum(r["wall_s"] for r in item[1])):
+        walls = [r["wall_s"] for r in rows]
+        lines.append(
+            f"{name:<14} {len(rows):>6} {sum(walls):>10.3f} {sum(r['cpu_s'] for r in rows):>10.3f} "
+            f"{sum(walls) / len(walls):>9.3f} {_percentile(walls, 0.95):>9.3f}"
+        )
+    windows = [r for r in records if r.get("kind") == "window"]
+    decodes = [r for r in records if r.get("kind") == "decode"]
+    if windows or decodes:
+        latencies = [r["latency_s"] for r in windows]
+        lines.append(
+            f"windows={len(windows)} mean_window_s={sum(latencies) / len(latencies) if latencies else 0.0:.3f} "
+            f"p95_window_s={_percentile(latencies, 0.95):.3f} decode_calls={len(decodes)} "
+            f"fallbacks={sum(1 for r in decodes if r.get('fallback'))}"
+        )
+    return "\n".join(lines)
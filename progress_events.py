@@ -0,0 +1,157 @@
+"""
+Structured per-segment progress events for `transcribe()`.
+
+Whisper has no callback API: progress is only visible as printed lines
+(``verbose=True``) or as its internal tqdm bar. `segment_tap()` routes that
+bar, for the current thread only, to a listener that receives the newly
+decoded segment dicts and the number of seconds processed. Nothing is printed
+and ``sys.stdout`` is left alone, so several transcriptions can run in
+different threads at the same time.
+"""
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+# Whisper mel frames per second; its internal progress bar counts frames.
+FRAMES_PER_SECOND = 100
+
+SegmentListener = Callable[[List[dict], float, Optional[float]], None]
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+@dataclass
+class SegmentEvent:
+    """
+    Progress report emitted after every decoded window.
+
+    Attributes
+    ----------
+    segments : list of dict
+        Whisper segments finished since the previous event, with times on the
+        original timeline.
+    seconds : float
+        Audio seconds processed so far.
+    total_seconds : float or None
+        Length of the audio, when known.
+    elapsed : float
+        Wall-clock seconds since the transcription started.
+    throughput : float
+        Audio seconds processed per wall-clock second.
+    """
+
+    segments: List[dict] = field(default_factory=list)
+    seconds: float = 0.0
+    total_seconds: Optional[float] = None
+    elapsed: float = 0.0
+    throughput: float = 0.0
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.total_seconds:
+            return None
+        return min(100.0, self.seconds / self.total_seconds * 100.0)
+
+
+class EventEmitter:
+    """Turn ``(segments, seconds, total_seconds)`` reports into `SegmentEvent` callbacks."""
+
+    def __init__(self, callbacks: List[Callable[[SegmentEvent], None]], total_seconds: Optional[float] = None) -> None:
+        self._callbacks = callbacks
+        self._total_seconds = total_seconds
+        self._start = time.perf_counter()
+        self._seconds = 0.0
+
+    def __call__(self, segments: List[dict], seconds: float, total_seconds: Optional[float] = None) -> None:
+        total = self._total_seconds or total_seconds
+        if total:
+            seconds = min(seconds, total)
+        self._seconds = max(self._seconds, seconds)
+        elapsed = time.perf_counter() - self._start
+        event = SegmentEvent(
+            segments=list(segments),
+            seconds=self._seconds,
+            total_seconds=total,
+            elapsed=elapsed,
+            throughput=self._seconds / elapsed if elapsed > 0 else 0.0,
+        )
+        for callback in self._callbacks:
+            callback(event)
+
+
+class _TapBar:
+    """Stand-in for the tqdm bar inside ``whisper.transcribe.transcribe()``.
+
+    Whisper calls ``update()`` once per decoded window, right after appending the
+    window's segments to its local ``all_segments`` list, which is read from the
+    caller's frame.
+    """
+
+    def __init__(self, listener: SegmentListener, total: Optional[int] = None) -> None:
+        self._listener = listener
+        self._total_seconds = total / FRAMES_PER_SECOND if total else None
+        self._frames = 0
+        self._emitted = 0
+
+    def __enter__(self) -> "_TapBar":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def update(self, n: int = 1) -> None:
+        self._frames += n
+        segments = sys._getframe(1).f_locals.get("all_segments") or []
+        new_segments = segments[self._emitted :]
+        self._emitted = len(segments)
+        self._listener(new_segments, self._frames / FRAMES_PER_SECOND, self._total_seconds)
+
+    def close(self) -> None:
+        return None
+
+
+class _TqdmRouter:
+    """Replacement for the ``tqdm`` module seen by whisper.transcribe."""
+
+    def __init__(self, tqdm_module) -> None:
+        self._tqdm_module = tqdm_module
+
+    def tqdm(self, *args, **kwargs):
+        listener = getattr(_local, "listener", None)
+        if listener is None:
+            return self._tqdm_module.tqdm(*args, **kwargs)
+        return _TapBar(listener, kwargs.get("total"))
+
+    def __getattr__(self, name):
+        return getattr(self._tqdm_module, name)
+
+
+def _install() -> None:
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        # `whisper.transcribe` is shadowed by the function of the same name,
+        # so the module is looked up explicitly.
+        module = importlib.import_module("whisper.transcribe")
+        if not isinstance(module.tqdm, _TqdmRouter):
+            module.tqdm = _TqdmRouter(module.tqdm)
+        _installed = True
+
+
+@contextmanager
+def segment_tap(listener: SegmentListener) -> Iterator[None]:
+    """Deliver segments of ``model.transcribe()`` calls made in this thread to *listener*."""
+    _install()
+    previous = getattr(_local, "listener", None)
+    _local.listener = listener
+    try:
+        yield
+    finally:
+        _local.listener = previous
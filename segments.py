@@ -0,0 +1,48 @@
+"""
+Helpers for combining Whisper results produced for separate pieces of audio.
+
+Whisper reports segment times relative to the audio it was given. When a
+recording is transcribed piece by piece, the segments have to be moved back to
+the original timeline and renumbered, so that the merged result looks exactly
+like the one from a single `model.transcribe()` call.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+# Whisper mel frames per second (HOP_LENGTH = 160 at 16 kHz); "seek" is in frames.
+FRAMES_PER_SECOND = 100
+
+
+def offset_segments(segments: Iterable[dict], offset: float, first_id: int = 0) -> List[dict]:
+    """Return copies of *segments* shifted by *offset* seconds and renumbered from *first_id*."""
+    shifted = []
+    for idx, segment in enumerate(segments, start=first_id):
+        moved = dict(segment)
+        moved["id"] = idx
+        moved["start"] = segment["start"] + offset
+        moved["end"] = segment["end"] + offset
+        if "seek" in segment:
+            moved["seek"] = segment["seek"] + int(round(offset * FRAMES_PER_SECOND))
+        if segment.get("words"):
+            moved["words"] = [
+                {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+                for word in segment["words"]
+            ]
+        shifted.append(moved)
+    return shifted
+
+
+def merge_results(parts: Iterable[Tuple[float, dict]], language: Optional[str] = None) -> dict:
+    """
+    Merge ``(offset_seconds, result)`` pairs into one Whisper-style result.
+
+    Parts are ordered by offset; the language of the first part wins unless
+    *language* is given.
+    """
+    merged_segments: List[dict] = []
+    texts: List[str] = []
+    for offset, result in sorted(parts, key=lambda part: part[0]):
+        merged_segments.extend(offset_segments(result.get("segments", []), offset, len(merged_segments)))
+        texts.append(result.get("text", ""))
+        if language is None:
+            language = result.get("language")
+    return {"text": "".join(texts), "segments": merged_segments, "language": language}
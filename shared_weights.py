@@ -0,0 +1,93 @@
+"""
+Whisper weights shared by all processes on a machine.
+
+`whisper.load_model()` deserializes the checkpoint into private memory, so
+every worker process (pool workers, job-server workers, chunk workers or
+separate CLI runs) holds its own copy of the weights. Here the checkpoint is
+converted once into an fp32 file next to the downloaded one; every process
+then memory-maps that file (``torch.load(mmap=True)``) and builds the model
+around the mapped tensors (``load_state_dict(assign=True)``). The pages are
+held once in the OS page cache whatever the number of processes. The mapping
+is copy-on-write and inference never writes to the weights, so they stay
+shared; the int8 engine quantizes the linear layers into private (4x smaller)
+copies, while embeddings and norms stay shared.
+
+Requires PyTorch 2.1 or newer and applies to CPU models only.
+"""
+import hashlib
+import os
+import uuid
+from typing import Tuple
+
+from file_lock import file_lock
+
+SHARED_SUBDIR = "shared"
+
+
+def _source_checkpoint(model_size: str, download_root: str) -> Tuple[str, str, object]:
+    """``(checkpoint path, name of the fp32 copy, alignment heads)`` of *model_size*."""
+    import whisper
+
+    if model_size in whisper._MODELS:
+        path = whisper._download(whisper._MODELS[model_size], download_root, False)
+        return path, f"{model_size}-fp32.pt", whisper._ALIGNMENT_HEADS[model_size]
+    if os.path.isfile(model_size):
+        path = os.path.abspath(model_size)
+        digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return path, f"{stem}-{digest}-fp32.pt", None
+    raise RuntimeError(f"Model {model_size} not found; available models = {whisper.available_models()}")
+
+
+def shared_checkpoint(model_size: str, download_root: str) -> Tuple[str, object]:
+    """
+    Path of the memory-mappable fp32 checkpoint of *model_size*, converting it
+    on first use (or when the source is newer), and its alignment heads.
+    """
+    import torch
+
+    source, name, alignment_heads = _source_checkpoint(model_size, download_root)
+    target_dir = os.path.join(download_root, SHARED_SUBDIR)
+    target = os.path.join(target_dir, name)
+
+    def current() -> bool:
+        return os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source)
+
+    if current():
+        return target, alignment_heads
+    os.makedirs(target_dir, exist_ok=True)
+    # Workers starting together convert once: processes that mapped different
+    # copies of the file would not share their pages.
+    lock_path = target + ".lock"
+    with file_lock(lock_path):
+        if not current():
+            checkpoint = torch.load(source, map_location="cpu", weights_only=True)
+            state = {
+                key: tensor.float().contiguous() if tensor.is_floating_point() else tensor.contiguous()
+                for key, tensor in checkpoint["model_state_dict"].items()
+            }
+            tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+            torch.save({"dims": checkpoint["dims"], "model_state_dict": state}, tmp_path)
+            os.replace(tmp_path, target)
+    # Later processes find the published file current and never take the lock.
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+    return target, alignment_heads
+
+
+def load_shared_model(model_size: str, download_root: str):
+    """Load *model_size* on CPU with its weights memory-mapped from the shared fp32 file."""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    path, alignment_heads = shared_checkpoint(model_size, download_root)
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    model = Whisper(ModelDimensions(**checkpoint["dims"]))
+    # assign=True makes the parameters the mapped tensors instead of copying
+    # them into the freshly allocated ones (which are freed right away).
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+    return model
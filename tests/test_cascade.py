@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from cascade import CascadeThresholds, escalation_spans, refine
+
+SAMPLE_RATE = 16000
+
+
+def _segment(start, end, text, avg_logprob=-0.2, compression_ratio=1.5, no_speech_prob=0.1):
+    return {
+        "start": start,
+        "end": end,
+        "text": text,
+        "avg_logprob": avg_logprob,
+        "compression_ratio": compression_ratio,
+        "no_speech_prob": no_speech_prob,
+    }
+
+
+class RecordingModel:
+    """Stands in for the larger model: answers every span with one segment covering it."""
+
+    def __init__(self, overrun=0.0):
+        self.overrun = overrun
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio) / SAMPLE_RATE, options))
+        seconds = len(audio) / SAMPLE_RATE
+        text = f" redone{len(self.calls)}"
+        return {"text": text, "segments": [{"id": 0, "start": 0.0, "end": seconds + self.overrun, "text": text}]}
+
+
+@pytest.mark.parametrize(
+    "fields, weak",
+    [
+        ({}, False),
+        ({"avg_logprob": -0.7}, False),
+        ({"avg_logprob": -0.71}, True),
+        ({"compression_ratio": 2.2}, False),
+        ({"compression_ratio": 2.3}, True),
+        ({"no_speech_prob": 0.5}, False),
+        ({"no_speech_prob": 0.6}, True),
+    ],
+)
+def test_thresholds(fields, weak):
+    assert CascadeThresholds().is_weak(_segment(0.0, 1.0, "x", **fields)) is weak
+
+
+def test_custom_threshold_changes_what_is_escalated():
+    segment = _segment(0.0, 1.0, "x", avg_logprob=-0.5)
+    assert not CascadeThresholds().is_weak(segment)
+    assert CascadeThresholds(min_avg_logprob=-0.4).is_weak(segment)
+
+
+def test_spans_join_neighbouring_weak_segments():
+    segments = [
+        _segment(0.0, 2.0, " a"),
+        _segment(3.0, 4.0, " b", avg_logprob=-1.0),
+        _segment(5.0, 6.0, " c", no_speech_prob=0.9),
+        _segment(6.2, 8.0, " d"),
+        _segment(8.5, 9.0, " e", compression_ratio=3.0),
+        _segment(20.0, 21.0, " f", avg_logprob=-1.0),
+    ]
+    spans = escalation_spans(segments, CascadeThresholds(), duration=22.0)
+    assert spans == [
+        # b and c are one span, padded into the silence but not over a or d.
+        (2.5, 6.2, [1, 2]),
+        # d is kept between the first span and e; f is 11 s after e.
+        (8.0, 9.5, [4]),
+        (19.5, 21.5, [5]),
+    ]
+
+
+def test_padding_stops_at_the_recording_edges():
+    segments = [_segment(0.2, 1.0, " a", avg_logprob=-1.0), _segment(9.8, 10.0, " b", avg_logprob=-1.0)]
+    assert escalation_spans(segments, CascadeThresholds(), duration=10.0) == [(0.0, 1.5, [0]), (9.3, 10.0, [1])]
+
+
+def test_refine_splices_redecoded_spans():
+    audio = np.zeros(10 * SAMPLE_RATE, dtype=np.float32)
+    result = {
+        "language": "ru",
+        "segments": [
+            _segment(0.0, 2.0, " kept"),
+            _segment(3.0, 4.0, " weak", avg_logprob=-1.5),
+            _segment(6.0, 8.0, " also kept"),
+        ],
+    }
+    model = RecordingModel(overrun=5.0)
+    options = {"language": None, "verbose": False, "initial_prompt": "glossary", "temperature": 0.0}
+
+    refined, report = refine(model, audio, result, options, model_name="medium")
+
+    [(seconds, call_options)] = model.calls
+    assert seconds == pytest.approx(2.0)
+    assert call_options == {
+        "language": "ru",
+        "temperature": 0.0,
+        "condition_on_previous_text": False,
+        "initial_prompt": " kept",
+    }
+    assert [segment["text"] for segment in refined["segments"]] == [" kept", " redone1", " also kept"]
+    assert [segment["id"] for segment in refined["segments"]] == [0, 1, 2]
+    redone = refined["segments"][1]
+    assert (redone["start"], redone["end"], redone["cascade"]) == (2.5, 4.5, "medium")
+    assert refined["text"] == " kept redone1 also kept"
+    assert report == {
+        "model": "medium",
+        "segments": 3,
+        "escalated_segments": 1,
+        "spans": 1,
+        "escalated_seconds": 2.0,
+        "audio_seconds": 10.0,
+        "escalated_fraction": 0.2,
+    }
+
+
+def test_refine_leaves_confident_results_alone():
+    audio = np.zeros(4 * SAMPLE_RATE, dtype=np.float32)
+    result = {"language": "en", "text": " a b", "segments": [_segment(0.0, 1.0, " a"), _segment(1.0, 2.0, " b")]}
+    model = RecordingModel()
+    refined, report = refine(model, audio, result, {}, CascadeThresholds(min_avg_logprob=-0.3))
+    assert model.calls == []
+    assert refined["text"] == " a b"
+    assert report["escalated_segments"] == 0 and report["escalated_fraction"] == 0.0
+
+    # A stricter threshold escalates both.
+    refined, report = refine(model, audio, result, {}, CascadeThresholds(min_avg_logprob=-0.1))
+    assert report["escalated_segments"] == 2 and report["spans"] == 1
+    assert len(model.calls) == 1
@@ -0,0 +1,185 @@
+import importlib
+import os
+import shutil
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from checkpoints import Checkpoint, pending_checkpoint, transcribe_resumable
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_RATE = 16000
+
+
+def _segment(start, end, text, tokens=(), temperature=0.0):
+    return {"start": start, "end": end, "text": text, "tokens": list(tokens), "temperature": temperature}
+
+
+class ScriptedModel:
+    """Stands in for a Whisper model: reports fixed windows the way ``whisper.transcribe`` does."""
+
+    is_multilingual = True
+
+    def __init__(self, windows, crash_after=None):
+        self.windows = windows  # (end_seconds, segments) on the file's timeline
+        self.crash_after = crash_after
+        self.calls = []
+
+    def decode(self, mel, options):
+        raise NotImplementedError
+
+    def transcribe(self, audio, **options):
+        self.calls.append(options)
+        start = options.get("clip_timestamps", [0.0])[0]
+        tqdm = importlib.import_module("whisper.transcribe").tqdm
+        all_segments = []
+        position = start
+        with tqdm.tqdm(total=int((len(audio) / SAMPLE_RATE - start) * 100)) as pbar:
+            for done, (end, segments) in enumerate(w for w in self.windows if w[0] > start):
+                if self.crash_after is not None and done == self.crash_after:
+                    raise RuntimeError("killed")
+                all_segments.extend(segments)
+                pbar.update(int(round((end - position) * 100)))
+                position = end
+        return {"text": "".join(s["text"] for s in all_segments), "segments": all_segments, "language": options["language"]}
+
+
+WINDOWS = [
+    (10.0, [_segment(0.0, 4.0, " one", [1, 2]), _segment(4.0, 10.0, " two", [3])]),
+    (20.0, [_segment(10.0, 20.0, " three", [4])]),
+]
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "talk.wav"
+    path.write_bytes(b"media")
+    return str(path)
+
+
+def test_resume_continues_after_recorded_windows(tmp_path, media):
+    audio = np.zeros(20 * SAMPLE_RATE, dtype=np.float32)
+    options = {"language": "en", "fp16": False}
+
+    checkpoint = Checkpoint.for_job(str(tmp_path / "ckpt"), media, "small", "en", {"fp16": False})
+    with pytest.raises(RuntimeError):
+        transcribe_resumable(ScriptedModel(WINDOWS, crash_after=1), audio, options, checkpoint)
+
+    resumed = Checkpoint.for_job(str(tmp_path / "ckpt"), media, "small", "en", {"fp16": False})
+    assert resumed.resumed and resumed.seek == 10.0 and resumed.language == "en"
+    assert resumed.text == " one two"
+
+    replayed = []
+    model = ScriptedModel(WINDOWS)
+    result = transcribe_resumable(model, audio, options, resumed, lambda segments, seconds, total: replayed.append((len(segments), seconds)))
+    assert model.calls[0]["clip_timestamps"] == [10.0]
+    assert replayed == [(2, 10.0), (1, 20.0)]
+    assert result["text"] == " one two three"
+    assert [segment["id"] for segment in result["segments"]] == [0, 1, 2]
+    assert resumed.seek == 20.0
+
+
+def test_truncated_record_and_other_job_are_ignored(tmp_path, media):
+    checkpoint = Checkpoint.for_job(str(tmp_path), media, "small", "en")
+    checkpoint.record([_segment(0.0, 5.0, " a")], 5.0, language="en")
+    checkpoint.record([_segment(5.0, 9.0, " b")], 9.0, language="en")
+    with open(checkpoint.path, "r+", encoding="utf-8") as f:
+        content = f.read()
+        f.seek(0)
+        f.write(content[:-10])  # the process died while writing the last window
+        f.truncate()
+
+    reloaded = Checkpoint.for_job(str(tmp_path), media, "small", "en")
+    assert reloaded.seek == 5.0 and reloaded.text == " a"
+
+    other_model = Checkpoint.for_job(str(tmp_path), media, "medium", "en")
+    assert not other_model.resumed
+    assert not Checkpoint(checkpoint.path, {"media": "elsewhere"}).resumed
+
+
+def test_prompt_tokens_restart_after_high_temperature(tmp_path, media):
+    checkpoint = Checkpoint.for_job(str(tmp_path), media, "small", "en")
+    checkpoint.record([_segment(0.0, 1.0, " a", [1, 2]), _segment(1.0, 2.0, " b", [3], temperature=0.8)], 2.0)
+    checkpoint.record([_segment(2.0, 3.0, " c", [4, 5])], 3.0)
+    assert checkpoint.prompt_tokens() == [4, 5]
+    checkpoint.remove()
+    assert not Checkpoint.for_job(str(tmp_path), media, "small", "en").resumed
+
+
+def test_pending_checkpoint_matches_media_and_model(tmp_path, media):
+    ckpt = str(tmp_path / "ckpt")
+    assert not pending_checkpoint(ckpt, media)
+    Checkpoint.for_job(ckpt, media, "small", "en", {"fp16": False}).record([], 30.0)
+    assert pending_checkpoint(ckpt, media) and pending_checkpoint(ckpt, media, "small")
+    assert not pending_checkpoint(ckpt, media, "medium")
+    with open(media, "ab") as f:
+        f.write(b" re-recorded")
+    assert not pending_checkpoint(ckpt, media)
+
+
+def _silent_model(path):
+    """A small random Whisper that ends every window at once, so windows decode fast but not instantly."""
+    torch = pytest.importorskip("torch")
+    from whisper.model import ModelDimensions, Whisper
+
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6, n_audio_layer=4,
+        n_vocab=51865, n_text_ctx=448, n_text_state=384, n_text_head=6, n_text_layer=1,
+    )
+    torch.manual_seed(0)
+    model = Whisper(dims)
+    with torch.no_grad():
+        direction = torch.randn(dims.n_text_state)
+        model.decoder.ln.weight.zero_()
+        model.decoder.ln.bias.copy_(direction)
+        model.decoder.token_embedding.weight.mul_(0.01)
+        model.decoder.token_embedding.weight[50257] = direction  # <|endoftext|>
+        model.decoder.token_embedding.weight[50364] = direction / 2  # <|0.00|>
+    torch.save({"dims": dims.__dict__, "model_state_dict": model.state_dict()}, path)
+
+
+def _batch(tmp_path, model):
+    code = (
+        "from pathlib import Path; import batch_transcribe as b; "
+        f"b.batch_transcribe(Path({str(tmp_path / 'in')!r}), Path({str(tmp_path / 'out')!r}), {model!r}, 'en', "
+        f"checkpoint_dir=Path({str(tmp_path / 'ckpt')!r}))"
+    )
+    return subprocess.Popen([sys.executable, "-c", code], cwd=REPO, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+
+def test_batch_resumes_a_killed_file(tmp_path):
+    pytest.importorskip("whisper")
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg is not installed")
+    model = str(tmp_path / "silent.pt")
+    _silent_model(model)
+    (tmp_path / "in").mkdir()
+    with wave.open(str(tmp_path / "in" / "en_talk.wav"), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(np.zeros(300 * SAMPLE_RATE, dtype=np.int16).tobytes())
+    out = tmp_path / "out" / "en_talk.txt"
+
+    process = _batch(tmp_path, model)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline and process.poll() is None:
+        # Header plus at least one decoded window: kill mid-file.
+        if any(len(p.read_text(encoding="utf-8").splitlines()) >= 2 for p in (tmp_path / "ckpt").glob("*.jsonl")):
+            break
+        time.sleep(0.02)
+    process.kill()
+    process.communicate()
+    assert process.returncode != 0, "the file finished before it could be killed"
+    assert not out.exists()
+
+    out.write_text("stale transcript of an earlier run\n", encoding="utf-8")
+    output = _batch(tmp_path, model).communicate(timeout=300)[0]
+    assert "Resuming from checkpoint" in output
+    assert "[skip]" not in output
+    assert out.read_text(encoding="utf-8") == "\n"  # the model never emits text
+    assert list((tmp_path / "ckpt").glob("*.jsonl")) == []
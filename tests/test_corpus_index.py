@@ -0,0 +1,76 @@
+import pytest
+
+from corpus_index import CorpusIndex, tokenize
+
+
+def _segments(*texts):
+    return [{"start": float(i), "end": i + 0.9, "text": text} for i, text in enumerate(texts)]
+
+
+def test_add_and_search(tmp_path):
+    index = CorpusIndex(str(tmp_path / "idx"))
+    index.add(str(tmp_path / "a.txt"), _segments(" quarterly budget review", " nothing here"), media="a.mp4")
+    index.add(str(tmp_path / "b.txt"), _segments(" budget", " the quarterly budget"))
+
+    hits = index.search("quarterly budget")
+    assert [(hit["transcript"].endswith("a.txt"), hit["segment"]) for hit in hits] == [(True, 0), (False, 1)]
+    assert hits[0]["media"].endswith("a.mp4")
+    assert hits[0]["start_ms"] == 0 and hits[0]["end_ms"] == 900
+
+    assert len(index.search("budget")) == 3
+    assert len(index.search("budget quarterly", phrase=True)) == 0
+    assert [hit["segment"] for hit in index.search("budget", file_filter="b.txt", start_ms=1500)] == [1]
+
+
+def test_readd_replaces_and_compact(tmp_path):
+    index = CorpusIndex(str(tmp_path / "idx"))
+    transcript = str(tmp_path / "a.txt")
+    index.add(transcript, _segments("old words"))
+    index.add(transcript, _segments("new words"))
+    assert index.search("old") == []
+    assert len(index.search("words")) == 1
+    assert index.compact() == 1
+    assert [hit["text"] for hit in CorpusIndex(str(tmp_path / "idx")).search("words")] == ["new words"]
+
+
+def test_segments_between(tmp_path):
+    index = CorpusIndex(str(tmp_path / "idx"))
+    transcript = str(tmp_path / "a.txt")
+    index.add(transcript, _segments("a", "b", "c", "d"))
+    assert [hit["text"] for hit in index.segments_between(transcript, 1500, 2100)] == ["b", "c"]
+    with pytest.raises(KeyError):
+        index.segments_between(str(tmp_path / "missing.txt"), 0, 1)
+
+
+def test_crash_before_catalog_entry_then_add(tmp_path, monkeypatch):
+    index = CorpusIndex(str(tmp_path / "idx"))
+    index.add(str(tmp_path / "a.txt"), _segments("alpha"))
+
+    original = CorpusIndex._append_catalog
+
+    def crash_on_entry(self, entry):
+        if "reserved" not in entry:
+            raise KeyboardInterrupt  # killed between the postings and the catalog entry
+        original(self, entry)
+
+    monkeypatch.setattr(CorpusIndex, "_append_catalog", crash_on_entry)
+    with pytest.raises(KeyboardInterrupt):
+        index.add(str(tmp_path / "crashed.txt"), _segments("x", "y", "z", "orphan word"))
+    monkeypatch.setattr(CorpusIndex, "_append_catalog", original)
+
+    # A fresh process adds a shorter file: it must not inherit the orphaned postings.
+    fresh = CorpusIndex(str(tmp_path / "idx"))
+    fresh.add(str(tmp_path / "b.txt"), _segments("beta"))
+    assert fresh.search("orphan") == []
+    assert [hit["transcript"].endswith("b.txt") for hit in fresh.search("beta")] == [True]
+    assert fresh.stats()["files"] == 2
+
+    fresh.compact()
+    assert fresh.search("orphan") == []
+    fresh.add(str(tmp_path / "c.txt"), _segments("gamma"))
+    assert fresh.search("orphan") == []
+    assert len(fresh.search("alpha")) == 1
+
+
+def test_tokenize_folds_yo():
+    assert tokenize("Ёлка, ёж!") == ["елка", "еж"]
@@ -0,0 +1,123 @@
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from job_server import JobServer, QueueFull, _Handler, _worker_main
+
+
+def _server(tmp_path, **kwargs):
+    """A server with in-process queues and no worker processes, so submitted jobs stay queued."""
+    server = JobServer(jobs_dir=str(tmp_path / "jobs"), **kwargs)
+    server._tasks = queue.Queue()
+    server._events = queue.Queue()
+    server._cancelled = {}
+    return server
+
+
+def _media(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"not really audio")
+    return str(path)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def collecting(tmp_path):
+    server = _server(tmp_path)
+    collector = threading.Thread(target=server._collect, daemon=True)
+    collector.start()
+    yield server
+    server._stopping.set()
+    collector.join()
+
+
+def test_queue_limit_rejects_until_a_slot_frees(tmp_path):
+    server = _server(tmp_path, max_queue=2)
+    first = server.submit(_media(tmp_path, "a.wav"))
+    server.submit(_media(tmp_path, "b.wav"))
+    with pytest.raises(QueueFull):
+        server.submit(_media(tmp_path, "c.wav"))
+    assert server.health()["queued"] == 2
+    assert server._tasks.qsize() == 2
+
+    assert server.cancel(first["id"])["state"] == "cancelled"
+    assert server.health()["queued"] == 1
+    assert server.submit(_media(tmp_path, "c.wav"))["state"] == "queued"
+
+
+def test_full_queue_answers_429_and_drops_the_upload(tmp_path):
+    server = _server(tmp_path, max_queue=1)
+    server.submit(_media(tmp_path, "a.wav"))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.jobs = server
+    httpd.verbose = False
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/jobs?filename=b.wav"
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(url, data=b"x" * 1000, method="POST"))
+        assert error.value.code == 429
+        assert error.value.headers["Retry-After"] == "10"
+        assert "already waiting" in json.loads(error.value.read())["error"]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert len(server.list()) == 1
+    assert len(os.listdir(server.jobs_dir)) == 1
+
+
+def test_cancelled_queued_job_is_skipped_by_the_worker(tmp_path):
+    server = _server(tmp_path)
+    media = _media(tmp_path, "upload.wav")
+    job = server.submit(media, owned=True)
+    server.cancel(job["id"])
+    assert server.status(job["id"])["state"] == "cancelled"
+    assert server._cancelled == {job["id"]: True}
+
+    pytest.importorskip("torch")
+    server._tasks.put(None)
+    _worker_main(server._tasks, server._events, server._cancelled, 1, None)
+    events = [server._events.get_nowait() for _ in range(server._events.qsize())]
+    assert [kind for _, kind, _ in events] == ["ready", "cancelled"]
+    assert not os.path.exists(media)  # the worker removes the cancelled upload
+
+
+def test_cancelling_a_running_job_waits_for_the_worker(tmp_path, collecting):
+    server = collecting
+    job = server.submit(_media(tmp_path, "a.wav"))
+    server._events.put((job["id"], "running", 4242))
+    _wait_for(lambda: server.status(job["id"])["state"] == "running")
+
+    assert server.cancel(job["id"])["state"] == "running"
+    assert job["id"] in server._cancelled
+    server._events.put((job["id"], "progress", 12.0))
+    server._events.put((job["id"], "cancelled", None))
+    _wait_for(lambda: server.status(job["id"])["state"] == "cancelled")
+    assert server.status(job["id"])["seconds"] == 12.0
+    assert job["id"] not in server._cancelled
+    assert server._running == {}
+
+    # A late result does not revive it; cancelling again forgets the job.
+    server._events.put((job["id"], "done", None))
+    time.sleep(0.1)
+    assert server.status(job["id"])["state"] == "cancelled"
+    assert server.cancel(job["id"]) == {"id": job["id"], "state": "deleted"}
+    assert server.status(job["id"]) is None
+    assert not os.path.exists(os.path.join(server.jobs_dir, job["id"]))
+
+
+def test_unknown_job_cannot_be_cancelled(tmp_path):
+    assert _server(tmp_path).cancel("missing") is None
@@ -0,0 +1,152 @@
+import threading
+import time
+
+from model_registry import ModelRegistry
+
+
+class _Tensor:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def numel(self):
+        return self.nbytes
+
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    """Just enough of a model for the registry to size it."""
+
+    def __init__(self, name, nbytes):
+        self.name = name
+        self._weights = [_Tensor(nbytes)]
+
+    def parameters(self):
+        return self._weights
+
+    def buffers(self):
+        return []
+
+    def modules(self):
+        return [self]
+
+
+class FakeRegistry(ModelRegistry):
+    def __init__(self, sizes=None, load_seconds=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.sizes = sizes or {}
+        self.load_seconds = load_seconds
+        self.loads = []
+
+    def _load(self, model_size, device, precision):
+        self.loads.append(model_size)
+        time.sleep(self.load_seconds)
+        return FakeModel(model_size, self.sizes.get(model_size, 100))
+
+
+def _sizes(registry):
+    return [key[0] for key in registry.keys()]
+
+
+def test_warm_model_is_not_reloaded():
+    registry = FakeRegistry()
+    first = registry.get("tiny")
+    assert registry.get("tiny") is first
+    assert registry.loads == ["tiny"]
+    assert (registry.hits, registry.misses) == (1, 1)
+    assert registry.get("tiny", precision="int8") is not first
+    assert registry.loads == ["tiny", "tiny"]
+
+
+def test_evicts_least_recently_used_by_count():
+    registry = FakeRegistry(max_models=2)
+    registry.get("tiny")
+    registry.get("base")
+    registry.get("tiny")
+    registry.get("small")
+    assert _sizes(registry) == ["tiny", "small"]
+    registry.get("base")
+    assert registry.loads == ["tiny", "base", "small", "base"]
+    assert _sizes(registry) == ["small", "base"]
+
+
+def test_evicts_by_bytes_but_keeps_the_newest_model():
+    registry = FakeRegistry(sizes={"tiny": 100, "base": 200, "large": 1000}, max_models=None, max_bytes=350)
+    registry.get("tiny")
+    registry.get("base")
+    assert registry.total_bytes() == 300
+    registry.get("large")
+    assert _sizes(registry) == ["large"]
+    assert registry.total_bytes() == 1000
+    registry.configure(max_models=None, max_bytes=None)
+    registry.get("tiny")
+    assert _sizes(registry) == ["large", "tiny"]
+    registry.configure(max_models=1)
+    assert _sizes(registry) == ["tiny"]
+
+
+def test_release_matches_key_parts():
+    registry = FakeRegistry(max_models=None)
+    registry.get("tiny", "cpu", "fp32")
+    registry.get("tiny", "cpu", "int8")
+    registry.get("base", "cpu", "fp32")
+    assert registry.release(precision="int8") == 1
+    assert ("tiny", "cpu", "int8") not in registry
+    assert registry.release("tiny") == 1
+    assert _sizes(registry) == ["base"]
+    assert registry.release() == 1
+    assert len(registry) == 0
+
+
+def test_concurrent_cold_load_happens_once():
+    registry = FakeRegistry(load_seconds=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("tiny"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.loads == ["tiny"]
+    assert len(results) == 4 and all(model is results[0] for model in results)
+
+
+def test_warm_model_is_served_during_another_load():
+    registry = FakeRegistry(max_models=None)
+    registry.get("tiny")
+    registry.load_seconds = 1.0
+    loader = threading.Thread(target=registry.get, args=("large",))
+    loader.start()
+    time.sleep(0.1)
+    started = time.perf_counter()
+    registry.get("tiny")
+    assert time.perf_counter() - started < 0.5
+    loader.join()
+    assert _sizes(registry) == ["tiny", "large"]
+
+
+def test_use_holds_a_model_exclusively():
+    registry = FakeRegistry(max_models=None)
+    order = []
+    inside = threading.Event()
+
+    def hold(name):
+        with registry.use(name):
+            order.append(f"enter {name}")
+            inside.set()
+            time.sleep(0.2)
+            order.append(f"exit {name}")
+
+    first = threading.Thread(target=hold, args=("tiny",))
+    first.start()
+    inside.wait()
+    second = threading.Thread(target=hold, args=("tiny",))
+    other = threading.Thread(target=hold, args=("base",))
+    second.start()
+    other.start()
+    for thread in (first, second, other):
+        thread.join()
+    # The other model ran alongside the first; the second user of tiny waited.
+    assert order.index("enter base") < order.index("exit tiny")
+    assert order.count("enter tiny") == 2
+    assert order.index("exit tiny") < order.index("enter tiny", 1)
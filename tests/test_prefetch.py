@@ -0,0 +1,78 @@
+import threading
+import time
+
+import numpy as np
+
+from prefetch import Prefetcher, audio_bytes, probe_all
+
+
+class Decoder:
+    """Decodes item *n* to *n* float32 samples and records how far ahead it ran."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.started = []
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        with self._lock:
+            self.started.append(item)
+        if item in self.fail:
+            raise RuntimeError(f"cannot decode {item}")
+        return np.zeros(item, dtype=np.float32)
+
+
+def _consume(prefetcher, decoder, pause=0.05):
+    """Iterate slowly; return how many items were started beyond the current one at each step."""
+    items, ahead = [], []
+    for position, (item, audio) in enumerate(prefetcher):
+        time.sleep(pause)  # let the background decodes run as far as they may
+        items.append((item, None if audio is None else len(audio)))
+        ahead.append(len(decoder.started) - position - 1)
+    return items, ahead
+
+
+def test_yields_items_in_order_and_reports_failures():
+    decoder = Decoder(fail={30})
+    prefetcher = Prefetcher([10, 20, 30, 40], decoder)
+    items, _ = _consume(prefetcher, decoder, pause=0.0)
+    assert items == [(10, 10), (20, 20), (30, None), (40, 40)]
+    assert (prefetcher.hits, prefetcher.misses) == (3, 1)
+
+
+def test_depth_bounds_the_files_decoded_ahead():
+    decoder = Decoder()
+    items, ahead = _consume(Prefetcher(list(range(1, 9)), decoder, depth=2), decoder)
+    assert [item for item, _ in items] == list(range(1, 9))
+    assert max(ahead) == 2
+    assert ahead[-3:] == [2, 1, 0]
+
+
+def test_max_bytes_bounds_the_buffered_audio():
+    sizes = [100] * 8
+    decoder = Decoder()
+    prefetcher = Prefetcher(sizes, decoder, depth=5, max_bytes=1000, estimate=lambda n: 4 * n)
+    items, ahead = _consume(prefetcher, decoder)
+    assert len(items) == 8
+    # 400 bytes per file under a 1000-byte cap: two files wait, not five.
+    assert max(ahead) == 2
+    assert prefetcher.peak_bytes <= prefetcher.max_bytes
+
+
+def test_file_larger_than_the_cap_is_still_prefetched_alone():
+    decoder = Decoder()
+    prefetcher = Prefetcher([1000, 1000, 1000], decoder, depth=2, max_bytes=100, estimate=lambda n: 4 * n)
+    items, ahead = _consume(prefetcher, decoder)
+    assert items == [(1000, 1000)] * 3
+    assert prefetcher.hits == 3
+    assert max(ahead) == 1
+
+
+def test_probe_all_keeps_the_order_of_paths():
+    def probe(path):
+        time.sleep(0.05 if path == "a" else 0.0)
+        return {"a": 1.0, "b": None}.get(path, 2.0)
+
+    assert probe_all(["a", "b", "c"], probe) == [1.0, None, 2.0]
+    assert audio_bytes(None) == 0
+    assert audio_bytes(1.0) == 16000 * 4
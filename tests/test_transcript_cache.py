@@ -0,0 +1,61 @@
+import os
+
+from transcript_cache import TranscriptCache
+
+
+def _media(path, data: bytes):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_key_follows_content_and_settings(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    a = _media(tmp_path / "a.mp3", b"same recording")
+    copy = _media(tmp_path / "renamed copy.mp3", b"same recording")
+    other = _media(tmp_path / "b.mp3", b"another recording")
+
+    key = cache.key(a, "small", "ru", {"fp16": False})
+    assert cache.key(copy, "small", "ru", {"fp16": False}) == key
+    assert cache.key(other, "small", "ru", {"fp16": False}) != key
+    assert cache.key(a, "medium", "ru", {"fp16": False}) != key
+    assert cache.key(a, "small", "en", {"fp16": False}) != key
+    assert cache.key(a, "small", None, {"fp16": False}) != key
+    assert cache.key(a, "small", "ru", {"fp16": False, "vad": True}) != key
+    assert cache.key(a, "small", "ru", {}) == cache.key(a, "small", "ru")
+
+
+def test_key_changes_when_the_file_is_rewritten(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    media = _media(tmp_path / "a.mp3", b"first take")
+    before = cache.key(media, "small", "ru")
+    _media(tmp_path / "a.mp3", b"second take")
+    stat = os.stat(media)
+    os.utime(media, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.key(media, "small", "ru") != before
+
+
+def test_put_get_and_stats(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    key = cache.key(_media(tmp_path / "a.mp3", b"audio"), "small", "ru")
+    assert not cache.contains(key)
+    assert cache.get(key) is None
+
+    cache.put(key, {"text": "hello", "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}], "metrics": {"rtf": 0.1}})
+    assert cache.contains(key)
+    assert cache.get(key) == {"text": "hello", "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}]}
+    assert cache.stats()["entries"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache"), max_bytes=None)
+    keys = [cache.key(_media(tmp_path / f"{i}.mp3", bytes([i]) * 8), "small", "ru") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"text": "x" * 100})
+        path = cache._path(key)
+        os.utime(path, (1_000_000 + i, 1_000_000 + i))
+    cache.get(keys[0])  # now the most recently used
+
+    cache.max_bytes = 2 * os.path.getsize(cache._path(keys[0]))
+    cache._evict()
+    assert [cache.contains(key) for key in keys] == [True, False, True]
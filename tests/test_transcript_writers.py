@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from transcript_writers import TranscriptWriters, format_timestamp, parse_formats, render_segments
+
+SEGMENTS = [
+    {"id": 0, "start": 0.0, "end": 2.5, "text": " Hello there."},
+    {"id": 1, "start": 3661.25, "end": 3663.0, "text": " Привет."},
+]
+
+
+def test_format_timestamp():
+    assert format_timestamp(0.0) == "00:00:00,000"
+    assert format_timestamp(3661.25) == "01:01:01,250"
+    assert format_timestamp(3661.25, for_vtt=True) == "01:01:01.250"
+
+
+def test_parse_formats():
+    assert parse_formats(None) == []
+    assert parse_formats("none") == []
+    assert parse_formats("SRT, vtt,srt") == ["srt", "vtt"]
+    assert parse_formats(["srt,tsv", "jsonl"]) == ["srt", "tsv", "jsonl"]
+    with pytest.raises(ValueError):
+        parse_formats("docx")
+
+
+@pytest.mark.parametrize(
+    "fmt, expected",
+    [
+        ("text", "Hello there. Привет.\n"),
+        ("txt", "[00:00:00.000 - 00:00:02.500] Hello there.\n[01:01:01.250 - 01:01:03.000] Привет.\n"),
+        ("srt", "1\n00:00:00,000 --> 00:00:02,500\nHello there.\n\n2\n01:01:01,250 --> 01:01:03,000\nПривет.\n"),
+        ("vtt", "WEBVTT\n\n00:00:00.000 --> 00:00:02.500\nHello there.\n\n01:01:01.250 --> 01:01:03.000\nПривет.\n"),
+        ("tsv", "0.000\t2.500\tHello there.\n3661.250\t3663.000\tПривет.\n"),
+    ],
+)
+def test_render_formats(fmt, expected):
+    assert render_segments(SEGMENTS, fmt) == expected
+
+
+def test_render_jsonl_keeps_full_segments():
+    lines = render_segments(SEGMENTS, "jsonl").splitlines()
+    assert [json.loads(line) for line in lines] == SEGMENTS
+
+
+def test_streamed_files_match_single_render(tmp_path):
+    out = tmp_path / "talk.txt"
+    with TranscriptWriters(str(out), ["srt", "vtt"]) as writers:
+        writers.write(SEGMENTS[:1])
+        # Flushed after every window, so partial outputs are readable mid-job.
+        assert (tmp_path / "talk.srt.partial").read_text(encoding="utf-8") == render_segments(SEGMENTS[:1], "srt")
+        assert not (tmp_path / "talk.srt").exists()
+        writers.write(SEGMENTS[1:])
+    assert writers.segments_written == 2
+    assert sorted(writers.timestamp_paths()) == [str(tmp_path / "talk.srt"), str(tmp_path / "talk.vtt")]
+    assert out.read_text(encoding="utf-8") == render_segments(SEGMENTS, "text")
+    for fmt in ("srt", "vtt"):
+        assert (tmp_path / f"talk.{fmt}").read_text(encoding="utf-8") == render_segments(SEGMENTS, fmt)
+
+
+def test_txt_format_replaces_the_plain_transcript(tmp_path):
+    out = tmp_path / "talk.txt"
+    with TranscriptWriters(str(out), ["txt"]) as writers:
+        writers.write(SEGMENTS)
+    assert writers.paths == {"txt": str(out)}
+    assert out.read_text(encoding="utf-8") == render_segments(SEGMENTS, "txt")
+
+
+def test_failed_run_keeps_previous_outputs(tmp_path):
+    out = tmp_path / "talk.txt"
+    out.write_text("previous\n", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with TranscriptWriters(str(out), ["srt"]) as writers:
+            writers.write(SEGMENTS[:1])
+            raise RuntimeError("killed")
+    assert out.read_text(encoding="utf-8") == "previous\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["talk.txt"]
+
+
+def test_empty_and_padded_transcripts_match_baseline(tmp_path):
+    out = tmp_path / "talk.txt"
+    with TranscriptWriters(str(out), ["srt", "vtt", "tsv"]):
+        pass
+    assert out.read_text(encoding="utf-8") == "\n"
+    assert [(tmp_path / f"talk.{fmt}").read_text(encoding="utf-8") for fmt in ("srt", "vtt", "tsv")] == ["\n", "WEBVTT\n", "\n"]
+    assert render_segments([], "txt") == "\n"
+
+    padded = [{"start": 0.0, "end": 1.0, "text": "  "}, {"start": 1.0, "end": 2.0, "text": " a  b "}, {"start": 2.0, "end": 3.0, "text": " c \n"}]
+    assert render_segments(padded, "text") == "a  b  c\n"
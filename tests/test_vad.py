@@ -0,0 +1,102 @@
+import numpy as np
+
+from vad import SpeechMap, VadOptions, compact, speech_regions
+
+SAMPLE_RATE = 16000
+
+
+def _speech(seconds):
+    """Voice-band tone whose loudness rises and falls four times a second, like syllables."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return 0.3 * np.sin(2 * np.pi * 220 * t) * (0.55 + 0.45 * np.sin(2 * np.pi * 4 * t))
+
+
+def _tone(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return 0.3 * np.sin(2 * np.pi * 440 * t)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE))
+
+
+def _recording(*parts):
+    audio = np.concatenate(parts)
+    noise = np.random.default_rng(0).normal(0.0, 1e-3, len(audio))
+    return (audio + noise).astype(np.float32)
+
+
+def _seconds(regions):
+    return [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in regions]
+
+
+def test_short_pause_stays_inside_one_region():
+    audio = _recording(_silence(2), _speech(2), _silence(0.5), _speech(2), _silence(2))
+    [(start, end)] = _seconds(speech_regions(audio))
+    assert 1.5 <= start <= 2.0
+    assert 6.5 <= end <= 7.0
+    # Without padding the pause itself is what keeps the two runs together.
+    assert len(speech_regions(audio, VadOptions(pad_seconds=0.0))) == 1
+    assert len(speech_regions(audio, VadOptions(pad_seconds=0.0, min_silence_seconds=0.2))) == 2
+
+
+def test_long_pause_splits_regions():
+    audio = _recording(_silence(2), _speech(2), _silence(3), _speech(2), _silence(2))
+    regions = _seconds(speech_regions(audio))
+    assert len(regions) == 2
+    assert regions[0][1] < 5.0
+    assert regions[1][0] > 6.5
+
+
+def test_overlapping_padding_merges_regions():
+    audio = _recording(_silence(2), _speech(2), _silence(1.5), _speech(2), _silence(2))
+    assert len(speech_regions(audio)) == 2
+    [(start, end)] = speech_regions(audio, VadOptions(pad_seconds=0.8))
+    assert start >= 0 and end <= len(audio)
+
+
+def test_short_bursts_and_steady_tones_are_dropped():
+    audio = _recording(_silence(2), _speech(0.1), _silence(3), _speech(2), _silence(2))
+    [(start, _)] = _seconds(speech_regions(audio))
+    assert start > 4.5
+
+    audio = _recording(_silence(2), _tone(4), _silence(2), _speech(2), _silence(2))
+    regions = _seconds(speech_regions(audio))
+    # Only the onset and end of the tone change in loudness; its steady middle is not speech.
+    assert not any(start < 4.5 and end > 3.5 for start, end in regions)
+    assert any(start <= 8.0 and end >= 10.0 for start, end in regions)
+
+
+def test_silence_has_no_regions():
+    assert speech_regions(_recording(_silence(5))) == []
+    assert speech_regions(np.zeros(0, dtype=np.float32)) == []
+
+
+def test_compact_maps_times_back_to_the_original():
+    audio = np.arange(6 * SAMPLE_RATE, dtype=np.float32)
+    regions = [(1 * SAMPLE_RATE, 2 * SAMPLE_RATE), (4 * SAMPLE_RATE, 5 * SAMPLE_RATE)]
+    compacted, speech_map = compact(audio, regions, gap_seconds=0.2)
+
+    assert len(compacted) == int(2.2 * SAMPLE_RATE)
+    assert compacted[0] == audio[SAMPLE_RATE]
+    assert compacted[int(1.2 * SAMPLE_RATE)] == audio[4 * SAMPLE_RATE]
+    assert speech_map.speech_seconds == 2.0
+    assert speech_map.skipped_seconds == 4.0
+    assert speech_map.to_original(0.5) == 1.5
+    assert speech_map.to_original(1.1) == 2.0  # inside the inserted pause
+    assert abs(speech_map.to_original(1.7) - 4.5) < 1e-9
+
+    [segment] = speech_map.remap_segments(
+        [{"start": 0.5, "end": 1.7, "seek": 100, "words": [{"word": "hi", "start": 1.3, "end": 1.4}]}]
+    )
+    assert segment["start"] == 1.5
+    assert abs(segment["end"] - 4.5) < 1e-9
+    assert segment["seek"] == 200
+    assert abs(segment["words"][0]["start"] - 4.1) < 1e-9
+
+
+def test_empty_speech_map():
+    compacted, speech_map = compact(np.ones(SAMPLE_RATE, dtype=np.float32), [])
+    assert len(compacted) == 0
+    assert speech_map.skipped_seconds == 1.0
+    assert SpeechMap().to_original(3.0) == 0.0
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+from work_manifest import WorkManifest
+
+
+def _expire(manifest, key, seconds):
+    """Backdate the lease of *key* as if its owner stopped renewing it *seconds* ago."""
+    path = manifest._path("leases", key)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_claim_is_exclusive_until_released(tmp_path):
+    a = WorkManifest(str(tmp_path), node_id="a")
+    b = WorkManifest(str(tmp_path), node_id="b")
+    assert a.claim("x.mp4")
+    assert not b.claim("x.mp4")
+    assert a.state("x.mp4") == "leased" and a.holds("x.mp4") and not b.holds("x.mp4")
+    a.release("x.mp4")
+    assert b.claim("x.mp4")
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    a = WorkManifest(str(tmp_path), node_id="a", lease_seconds=30)
+    b = WorkManifest(str(tmp_path), node_id="b", lease_seconds=30)
+    assert a.claim("x.mp4")
+    _expire(a, "x.mp4", 10)
+    assert not b.claim("x.mp4")  # still within the lease
+
+    _expire(a, "x.mp4", 60)
+    assert a.state("x.mp4") == "expired"
+    assert not a.holds("x.mp4")  # the owner must not publish on an expired lease
+    assert b.claim("x.mp4")
+    assert b.reclaimed == 1
+    assert b.holds("x.mp4")
+
+    assert not a.renew("x.mp4")
+    assert a.lost == {"x.mp4"} and a.held() == set()
+    a.release("x.mp4")  # does not drop the new owner's lease
+    assert b.holds("x.mp4")
+
+
+def test_done_and_failed_files_are_not_claimed(tmp_path):
+    a = WorkManifest(str(tmp_path), node_id="a", max_attempts=2)
+    b = WorkManifest(str(tmp_path), node_id="b", max_attempts=2)
+    assert a.claim("done.mp4")
+    a.complete("done.mp4", audio_seconds=12.5)
+    assert b.state("done.mp4") == "done" and not b.claim("done.mp4")
+
+    for _ in range(2):
+        assert a.claim("bad.mp4")
+        a.fail("bad.mp4", "RuntimeError: boom")
+    assert b.state("bad.mp4") == "failed" and not b.claim("bad.mp4")
+
+
+def test_concurrent_register_keeps_every_file(tmp_path):
+    nodes = [WorkManifest(str(tmp_path), node_id=f"n{i}") for i in range(8)]
+    threads = [
+        threading.Thread(target=node.register, args=([f"{i}-{j}.mp4" for j in range(20)],))
+        for i, node in enumerate(nodes)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    progress = nodes[0].progress()
+    assert progress["files"] == 160 and progress["pending"] == 160
+
+
+def test_progress_counts_states(tmp_path):
+    a = WorkManifest(str(tmp_path), node_id="a", lease_seconds=30)
+    a.register(["done.mp4", "running.mp4", "stale.mp4", "new.mp4"])
+    a.claim("done.mp4")
+    a.complete("done.mp4", audio_seconds=10.0)
+    a.claim("running.mp4")
+    a.claim("stale.mp4")
+    _expire(a, "stale.mp4", 60)
+    progress = a.progress()
+    assert (progress["done"], progress["running"], progress["expired"], progress["pending"]) == (1, 1, 1, 1)
+    assert progress["nodes"]["a"]["done"] == 1 and progress["done_audio_seconds"] == 10.0
@@ -0,0 +1,76 @@
+"""
+Thin command-line client for `transcribe_daemon`.
+
+Takes exactly the arguments of ``transcribe_video.py`` and forwards them, with
+the current directory, to the warm daemon over its Unix socket; the daemon's
+output is streamed back and its exit code returned. Only the standard library
+is imported here, so a call costs milliseconds instead of the seconds needed to
+import torch and load a model. When no daemon is listening (or the platform
+has no Unix sockets), the job runs in this process as ``transcribe_video.py``
+would.
+
+Example::
+
+    python transcribe_client.py meeting.mp4 -o meeting.txt -m small --timestamps srt
+"""
+import json
+import os
+import socket
+import sys
+from typing import Optional, Sequence
+
+DEFAULT_SOCKET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "daemon.sock")
+
+
+def daemon_socket_path() -> str:
+    """The socket from ``WHISPER_DAEMON_SOCKET``, or ``./cache/daemon.sock``."""
+    return os.environ.get("WHISPER_DAEMON_SOCKET") or DEFAULT_SOCKET
+
+
+def connect(path: Optional[str] = None) -> Optional[socket.socket]:
+    """Connect to the daemon, or return None if none is listening on *path*."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or daemon_socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(sock: socket.socket, payload: dict) -> dict:
+    """Send one request and return the daemon's final message, printing streamed output."""
+    with sock, sock.makefile("rb") as reader:
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        for line in reader:
+            message = json.loads(line)
+            if "stream" not in message:
+                return message
+            stream = sys.stderr if message["stream"] == "stderr" else sys.stdout
+            stream.write(message["data"])
+            stream.flush()
+    return {"exit": 1, "error": "the daemon closed the connection"}
+
+
+def run_remote(sock: socket.socket, argv: Sequence[str]) -> int:
+    reply = request(sock, {"argv": list(argv), "cwd": os.getcwd()})
+    if reply.get("error"):
+        print(f"[client] {reply['error']}", file=sys.stderr)
+    return reply.get("exit", 1)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    sock = connect()
+    if sock is not None:
+        return run_remote(sock, argv)
+    from transcribe_video import main as run_local
+
+    run_local(argv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Warm transcription daemon on a local Unix socket.
+
+Every ``python transcribe_video.py ...`` run imports torch and whisper and
+loads the model before touching any audio, which on short clips takes longer
+than the transcription itself. The daemon pays for that once: it keeps the
+interpreter and the model registry alive and runs ``transcribe_video.main()``
+for each request sent by `transcribe_client`, streaming its output back.
+
+Requests run one at a time, in the client's working directory, so relative
+paths behave as in a local run. The socket is only accessible to the user who
+started the daemon.
+
+Example::
+
+    python transcribe_daemon.py -m small          # preload the small model
+    python transcribe_client.py talk.mp4 -o talk.txt -m small
+    python transcribe_daemon.py --status
+    python transcribe_daemon.py --stop
+"""
+import argparse
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional
+
+from engines import ENGINES
+from transcribe_client import connect, daemon_socket_path, request
+
+
+def _send(wfile, payload: dict) -> None:
+    wfile.write((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+    wfile.flush()
+
+
+class _StreamForwarder(io.TextIOBase):
+    """Text stream that sends every write to the client as a JSON frame."""
+
+    def __init__(self, wfile, name: str) -> None:
+        self._wfile = wfile
+        self._name = name
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            _send(self._wfile, {"stream": self._name, "data": text})
+        return len(text)
+
+
+def _exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    return exc.code if isinstance(exc.code, int) else 1
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            payload = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            return
+        try:
+            if payload.get("status"):
+                _send(self.wfile, self.server.status())
+            elif payload.get("stop"):
+                _send(self.wfile, {"exit": 0, "stopping": True})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                with self.server.run_lock:
+                    code = self.server.run(payload.get("argv", []), payload.get("cwd"), self.wfile)
+                _send(self.wfile, {"exit": code})
+        except OSError:
+            pass  # the client went away; a running job was aborted by its failed write
+
+
+class TranscriptionDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server running ``transcribe_video.main(argv)`` per request."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str) -> None:
+        self.run_lock = threading.Lock()
+        self.requests_served = 0
+        super().__init__(socket_path, _Handler)
+
+    def run(self, argv: List[str], cwd: Optional[str], wfile) -> int:
+        import transcribe_video
+
+        previous = os.getcwd()
+        try:
+            os.chdir(cwd or previous)
+            with redirect_stdout(_StreamForwarder(wfile, "stdout")), redirect_stderr(_StreamForwarder(wfile, "stderr")):
+                try:
+                    transcribe_video.main(argv)
+                    return 0
+                except SystemExit as exc:
+                    return _exit_code(exc)
+                except Exception:
+                    traceback.print_exc()
+                    return 1
+        finally:
+            os.chdir(previous)
+            self.requests_served += 1
+
+    def status(self) -> dict:
+        from model_registry import default_registry
+
+        return {
+            "exit": 0,
+            "pid": os.getpid(),
+            "busy": self.run_lock.locked(),
+            "requests": self.requests_served,
+            "models": [list(key) for key in default_registry.keys()],
+        }
+
+
+def serve(
+    socket_path: str,
+    preload: Optional[List[str]] = None,
+    engine: str = "auto",
+    threads: Optional[int] = None,
+) -> None:
+    """Preload *preload* models and serve requests on *socket_path* until stopped."""
+    sock = connect(socket_path)
+    if sock is not None:
+        sock.close()
+        raise RuntimeError(f"A daemon is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # left over from a daemon that was killed
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+
+    import torch
+
+    import transcribe_video  # noqa: F401  (imported once, up front)
+    from engines import configure_threads, resolve_engine
+    from model_registry import default_registry
+
+    configure_threads(threads)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    for model_size in preload or []:
+        print(f"Loading {model_size} ({resolve_engine(engine, device)}) ...", flush=True)
+        default_registry.get(model_size, device, resolve_engine(engine, device))
+
+    old_umask = os.umask(0o177)
+    try:
+        server = TranscriptionDaemon(socket_path)
+    finally:
+        os.umask(old_umask)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"Transcription daemon listening on {socket_path} (pid {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep Whisper models warm and serve transcribe_client.py over a Unix socket.")
+    parser.add_argument("--socket", default=None, help="Socket path (default: $WHISPER_DAEMON_SOCKET or ./cache/daemon.sock)")
+    parser.add_argument("-m", "--model", nargs="*", default=["small"], choices=["tiny", "base", "small", "medium", "large"], help="Models to preload (default: small)")
+    parser.add_argument("--engine", default="auto", choices=ENGINES, help="Engine of the preloaded models; requests must use the same --engine to hit them (default: auto)")
+    parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads (default: all cores)")
+    parser.add_argument("--status", action="store_true", help="Print the status of a running daemon and exit")
+    parser.add_argument("--stop", action="store_true", help="Stop a running daemon and exit")
+    args = parser.parse_args()
+    socket_path = args.socket or daemon_socket_path()
+
+    if args.status or args.stop:
+        sock = connect(socket_path)
+        if sock is None:
+            print(f"No daemon is listening on {socket_path}")
+            sys.exit(1)
+        reply = request(sock, {"stop": True} if args.stop else {"status": True})
+        print(json.dumps(reply, indent=2))
+        return
+    serve(socket_path, args.model, args.engine, args.threads)
+
+
+if __name__ == "__main__":
+    main()
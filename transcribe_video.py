@@ -1,11 +1,12 @@
 import argparse
+import dataclasses
 import glob
 import os
 import shutil
 import subprocess
 import sys
-import re
-from typing import Callable, Optional
+from contextlib import ExitStack
+from typing import Callable, Optional, Sequence, Union
 
 try:
     import torch
@@ -25,58 +26,22 @@ except OSError as e:
     else:
         raise
 
+import numpy as np
 import whisper
 
-DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
-_TS_RE = re.compile(r"\[(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})\]")
-
-
-def _format_timestamp(seconds: float, for_vtt: bool = False) -> str:
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int(round((seconds - int(seconds)) * 1000))
-    sep = "." if for_vtt else ","
-    return f"{hours:02}:{minutes:02}:{secs:02}{sep}{millis:03}"
-
-
-def _build_timestamp_lines(segments, fmt: str) -> str:
-    if fmt == "tsv":
-        lines = []
-        for s in segments:
-            lines.append(f"{s['start']:.3f}\t{s['end']:.3f}\t{s['text'].strip()}")
-        return "\n".join(lines) + "\n"
-    if fmt == "vtt":
-        lines = ["WEBVTT", ""]
-        for s in segments:
-            start = _format_timestamp(s["start"], for_vtt=True)
-            end = _format_timestamp(s["end"], for_vtt=True)
-            lines.append(f"{start} --> {end}")
-            lines.append(s["text"].strip())
-            lines.append("")
-        return "\n".join(lines).rstrip() + "\n"
-    if fmt == "srt":
-        lines = []
-        for idx, s in enumerate(segments, start=1):
-            start = _format_timestamp(s["start"])
-            end = _format_timestamp(s["end"])
-            lines.append(str(idx))
-            lines.append(f"{start} --> {end}")
-            lines.append(s["text"].strip())
-            lines.append("")
-        return "\n".join(lines).rstrip() + "\n"
-    lines = []
-    for s in segments:
-        start = _format_timestamp(s["start"], for_vtt=True)
-        end = _format_timestamp(s["end"], for_vtt=True)
-        lines.append(f"[{start} - {end}] {s['text'].strip()}")
-    return "\n".join(lines) + "\n"
-
-
-def _timestamps_output_path(output_path: str, fmt: str) -> str:
-    base, _ = os.path.splitext(output_path)
-    ext = "txt" if fmt == "txt" else fmt
-    return f"{base}.{ext}"
+from audio_cache import AudioCache, precomputed_mel
+from audio_chunks import transcribe_chunks
+from audio_stream import peak_rss_mb, transcribe_stream
+from cascade import CascadeThresholds, refine
+from corpus_index import CorpusIndex, default_index
+from checkpoints import DEFAULT_CHECKPOINT_DIR, Checkpoint, transcribe_resumable
+from engines import ENGINES, configure_threads, resolve_engine, uses_fp16
+from model_registry import DEFAULT_MODELS_DIR, ModelRegistry, default_registry, enable_shared_weights
+from profiling import Profiler, format_summary, timed
+from progress_events import EventEmitter, SegmentEvent, segment_tap
+from transcript_cache import TranscriptCache, default_cache
+from transcript_writers import TIMESTAMP_FORMATS, TranscriptWriters, parse_formats
+from vad import compact, speech_regions
 
 
 def _ensure_ffmpeg_on_path() -> None:
@@ -94,12 +59,6 @@ def _ensure_ffmpeg_on_path() -> None:
             return
 
 
-def _parse_timestamp_seconds(value: str) -> float:
-    hours, minutes, rest = value.split(":")
-    seconds, millis = rest.split(".")
-    return (int(hours) * 3600) + (int(minutes) * 60) + int(seconds) + (int(millis) / 1000.0)
-
-
 def _probe_duration_seconds(media_path: str) -> Optional[float]:
     _ensure_ffmpeg_on_path()
     try:
@@ -127,59 +86,89 @@ def _probe_duration_seconds(media_path: str) -> Optional[float]:
         return None
 
 
-class _ProgressStdout:
-    def __init__(
-        self,
-        original,
-        total_seconds: float,
-        progress_callback: Callable[[float], None],
-    ) -> None:
-        self._original = original
-        self._total_seconds = total_seconds
-        self._progress_callback = progress_callback
-        self._buffer = ""
-        self._last_seconds = 0.0
-
-    def write(self, text: str) -> int:
-        self._buffer += text
-        while "\n" in self._buffer:
-            line, self._buffer = self._buffer.split("\n", 1)
-            self._handle_line(line)
-        return self._original.write(text)
-
-    def flush(self) -> None:
-        if self._buffer:
-            self._handle_line(self._buffer)
-            self._buffer = ""
-        self._original.flush()
-
-    def _handle_line(self, line: str) -> None:
-        match = _TS_RE.search(line)
-        if not match:
-            return
-        end_ts = match.group(2)
-        seconds = _parse_timestamp_seconds(end_ts)
-        if seconds <= self._last_seconds:
-            return
-        self._last_seconds = seconds
-        if self._total_seconds > 0:
-            seconds = min(seconds, self._total_seconds)
-        self._progress_callback(seconds)
+def _skip_non_speech(audio, profiler: Optional[Profiler] = None):
+    """Compact *audio* to its speech regions; returns the new audio and its `vad.SpeechMap`."""
+    with timed(profiler, "vad") as info:
+        audio, speech_map = compact(audio, speech_regions(audio))
+        info["skipped_s"] = round(speech_map.skipped_seconds, 2)
+    total = speech_map.original_seconds
+    share = 100 * speech_map.skipped_seconds / total if total else 0.0
+    print(f"VAD: skipping {speech_map.skipped_seconds:,.1f}s of {total:,.1f}s without speech ({share:.0f}%)")
+    return audio, speech_map
+
+
+def _cache_options(
+    engine: str,
+    use_fp16: bool,
+    chunk_workers: int = 1,
+    max_chunk_seconds: float = 600.0,
+    stream: bool = False,
+    stream_window_seconds: float = 300.0,
+    vad: bool = False,
+    cascade_model: Optional[str] = None,
+    cascade_thresholds: Optional[CascadeThresholds] = None,
+) -> dict:
+    """Everything besides model and language that changes the result (part of the cache and checkpoint keys)."""
+    options = {"fp16": use_fp16}
+    if engine == "int8":
+        options["engine"] = engine
+    if chunk_workers > 1:
+        options["max_chunk_seconds"] = max_chunk_seconds
+    elif stream:
+        options["stream_window_seconds"] = stream_window_seconds
+    if vad:
+        options["vad"] = True
+    if cascade_model:
+        options["cascade"] = {"model": cascade_model, **dataclasses.asdict(cascade_thresholds or CascadeThresholds())}
+    return options
+
+
+def _run_cascade(
+    result: dict,
+    audio,
+    cascade_model: str,
+    thresholds: CascadeThresholds,
+    registry: ModelRegistry,
+    device: str,
+    precision: str,
+    options: dict,
+    profiler: Optional[Profiler] = None,
+) -> "tuple[dict, dict]":
+    """Second pass of the cascade; the larger model is only loaded if some segment is weak."""
+    with timed(profiler, "cascade", model=cascade_model) as info:
+        if any(thresholds.is_weak(segment) for segment in result.get("segments", [])):
+            with registry.use(cascade_model, device, precision) as model:
+                result, report = refine(model, audio, result, options, thresholds, cascade_model)
+        else:
+            result, report = refine(None, audio, result, options, thresholds, cascade_model)
+        info["escalated_s"] = report["escalated_seconds"]
+    print(
+        f"Cascade: re-decoded {report['escalated_segments']} of {report['segments']} segments, "
+        f"{report['escalated_seconds']:,.1f}s of {report['audio_seconds']:,.1f}s "
+        f"({100 * report['escalated_fraction']:.0f}%) with {cascade_model}"
+    )
+    return result, report
 
 
-def make_progress_printer(total_seconds: Optional[float], label: Optional[str] = None) -> Optional[Callable[[float], None]]:
-    if total_seconds is None or total_seconds <= 0:
-        return None
+def _no_speech_result(language: Optional[str]) -> dict:
+    return {"text": "", "segments": [], "language": language}
 
+
+def make_progress_printer(
+    total_seconds: Optional[float] = None,
+    label: Optional[str] = None,
+) -> Callable[[SegmentEvent], None]:
+    """Return an ``on_segment`` callback that prints a one-line progress indicator."""
     prefix = f"{label} " if label else ""
 
-    def _progress_printer(current_seconds: float) -> None:
-        percent = min(100.0, (current_seconds / total_seconds) * 100.0)
-        print(
-            f"\r{prefix}Progress: {percent:6.2f}% ({current_seconds:,.1f}s / {total_seconds:,.1f}s)",
-            end="",
-            flush=True,
-        )
+    def _progress_printer(event: SegmentEvent) -> None:
+        total = total_seconds or event.total_seconds
+        if total:
+            percent = min(100.0, (event.seconds / total) * 100.0)
+            line = f"{prefix}Progress: {percent:6.2f}% ({event.seconds:,.1f}s / {total:,.1f}s)"
+        else:
+            line = f"{prefix}Progress: {event.seconds:,.1f}s"
+        print(f"\r{line} [{event.throughput:.1f}x]", end="", flush=True)
 
     return _progress_printer
 
@@ -189,11 +178,30 @@ def transcribe(
     output_path: str,
     model_size: str = "small",
     language: str = "ru",
-    timestamps_format: str = "none",
+    timestamps_format: Union[str, Sequence[str]] = "none",
     progress_callback: Optional[Callable[[float], None]] = None,
     progress_total: Optional[float] = None,
     verbose: Optional[bool] = None,
-) -> None:
+    registry: Optional[ModelRegistry] = None,
+    chunk_workers: int = 1,
+    max_chunk_seconds: float = 600.0,
+    stream: bool = False,
+    stream_window_seconds: float = 300.0,
+    on_segment: Optional[Callable[[SegmentEvent], None]] = None,
+    cache: Optional[TranscriptCache] = None,
+    audio_cache: Optional[AudioCache] = None,
+    profiler: Optional[Profiler] = None,
+    checkpoint_dir: Optional[str] = None,
+    engine: str = "auto",
+    threads: Optional[int] = None,
+    interop_threads: Optional[int] = None,
+    vad: bool = False,
+    corpus: Optional[CorpusIndex] = None,
+    audio: Optional[np.ndarray] = None,
+    cascade_model: Optional[str] = None,
+    cascade_thresholds: Optional[CascadeThresholds] = None,
+    media_digest: Optional[str] = None,
+) -> dict:
     """
     Transcribe an audio or video file to text using OpenAI's Whisper model.
 
@@ -211,6 +219,110 @@ def transcribe(
         ISO‑639‑1 code of the language spoken in the audio. When set, Whisper does not
         attempt to detect the language automatically which can improve accuracy.
         Defaults to "ru".
+    timestamps_format : str or sequence of str, optional
+        Timestamp files to write next to *output_path*: any of "txt", "srt", "vtt",
+        "tsv" and "jsonl" (full segment dicts, one per line), as a list or a
+        comma-separated string. All are rendered from the same transcription.
+        Segments are appended to ``<file>.partial`` copies of the transcript and
+        every timestamp file as they are decoded, so partial outputs are usable
+        while a long job runs; they replace the final files only when the job
+        succeeds. Defaults to "none".
+    progress_callback : callable, optional
+        Called with the number of audio seconds processed so far. Kept for
+        compatibility; *on_segment* carries the same information and more.
+    progress_total : float, optional
+        Known duration of the input in seconds, used to cap the progress values.
+    on_segment : callable, optional
+        Called with a `progress_events.SegmentEvent` after every decoded window:
+        the new segments, seconds processed and throughput. Nothing is printed
+        and ``sys.stdout`` is not touched, so transcriptions may run in several
+        threads at once.
+    cache : TranscriptCache, optional
+        Content-addressed result cache (see `transcript_cache.default_cache()`).
+        On a hit the stored result is used and no model is loaded; on a miss the
+        new result is stored. Defaults to None (no caching).
+    audio_cache : AudioCache, optional
+        Memory-mapped cache of the decoded waveform (and, if enabled, the log-mel
+        spectrogram). When given, ffmpeg only runs the first time a file is seen;
+        later calls map the stored arrays. Ignored in *stream* mode.
+    registry : ModelRegistry, optional
+        Registry used to obtain the model. Models are kept loaded between calls,
+        so repeated calls with the same model size do not reload the checkpoint.
+        Defaults to the process-wide `model_registry.default_registry`.
+    chunk_workers : int, optional
+        When greater than 1, the audio is split at silence into chunks of at most
+        *max_chunk_seconds* and the chunks are transcribed concurrently in that many
+        worker processes (each with its own model from the default registry).
+        Segment timestamps are shifted back onto the original timeline, so the
+        outputs have the same structure as a sequential run. Defaults to 1.
+    max_chunk_seconds : float, optional
+        Upper bound on the chunk length for *chunk_workers* > 1. Defaults to 600.
+    stream : bool, optional
+        Read 16 kHz PCM from an ffmpeg pipe and transcribe it in windows of
+        *stream_window_seconds* instead of decoding the whole file up front, so
+        peak memory does not grow with the length of the recording.
+        Cannot be combined with *chunk_workers* > 1. Defaults to False.
+    stream_window_seconds : float, optional
+        Window length for *stream* mode. Defaults to 300.
+    profiler : Profiler, optional
+        Records wall and CPU time of every stage (cache lookup, model load,
+        ffmpeg decode, mel, inference, output writing), the latency of every
+        decoded window and ``model.decode()`` call, and temperature fallbacks.
+        In *chunk_workers* mode the per-chunk work runs in other processes and
+        is reported as a single ``inference`` stage. Defaults to None.
+    checkpoint_dir : str, optional
+        Append every decoded window to a checkpoint in this directory. If an
+        earlier run of the same job (file, model, language, options) was
+        interrupted, its segments are reused and decoding continues where it
+        stopped, with the same decoder context. The checkpoint is deleted when
+        the job completes. Cannot be combined with *chunk_workers* > 1.
+    engine : str, optional
+        Inference engine (see `engines`): "fp32", "fp16" (GPU), "int8" (dynamic
+        int8 quantization of the linear layers, CPU only; noticeably faster at a
+        small cost in accuracy) or "compile" (``torch.compile`` on the encoder).
+        Each engine is a separate entry in the model registry. Defaults to
+        "auto": fp16 on GPU, fp32 on CPU.
+    threads : int, optional
+        Number of torch intra-op threads for this process. Defaults to torch's
+        own choice (all cores).
+    interop_threads : int, optional
+        Number of torch inter-op threads. Only takes effect before the first
+        model has run in this process.
+    vad : bool, optional
+        Run the `vad` pre-pass and give the model only the speech regions, so
+        silence and music are neither decoded nor hallucinated over. Timestamps
+        in the result, the outputs and the segment events are on the original
+        timeline. Cannot be combined with *stream*. Defaults to False.
+    corpus : CorpusIndex, optional
+        Add the finished transcript's segments to this searchable index (see
+        `corpus_index`), keyed by *output_path*. Defaults to None.
+    audio : numpy.ndarray, optional
+        The 16 kHz mono waveform of *video_path*, already decoded (e.g. by
+        `audio_stream.decode_to_pcm()`); ffmpeg and *audio_cache* are then
+        skipped. *video_path* is still used for the cache key (unless
+        *media_digest* is given) and in messages.
+        Cannot be combined with *stream*.
+    cascade_model : str, optional
+        Larger model for a second pass (see `cascade`): segments of the
+        *model_size* pass whose ``avg_logprob``, ``compression_ratio`` or
+        ``no_speech_prob`` cross *cascade_thresholds* are re-transcribed with
+        it and spliced back in. The outputs are written once the second pass
+        is done; segment events carry the first-pass segments. Cannot be
+        combined with *stream*. Defaults to None (single pass).
+    cascade_thresholds : CascadeThresholds, optional
+        When a segment is escalated. Defaults to `cascade.CascadeThresholds()`.
+    media_digest : str, optional
+        SHA-256 of the media, used for the *cache* key instead of reading
+        *video_path* (which may be a pipe that *audio* was read from).
+
+    Returns
+    -------
+    dict
+        The Whisper result (``text``, ``segments``, ``language``) plus a
+        ``metrics`` dict with the ingest mode, the engine, the thread counts and
+        the peak RSS of the process in MB (with *vad*, also the seconds of
+        speech and the seconds skipped; with *cascade_model*, a ``cascade``
+        report with the escalated segments, seconds and fraction of the audio).
 
     Notes
     -----
@@ -233,7 +345,20 @@ def transcribe(
     --------
     >>> transcribe("meeting.mp4", "meeting.txt")
     """
+    if stream and chunk_workers > 1:
+        raise ValueError("stream mode cannot be combined with chunk_workers > 1")
+    if checkpoint_dir and chunk_workers > 1:
+        raise ValueError("checkpoints cannot be combined with chunk_workers > 1")
+    if stream and vad:
+        raise ValueError("stream mode cannot be combined with vad")
+    if stream and audio is not None:
+        raise ValueError("stream mode decodes the file itself; pass audio=None")
+    if stream and cascade_model:
+        raise ValueError("stream mode cannot be combined with cascade_model")
     _ensure_ffmpeg_on_path()
+    configure_threads(threads, interop_threads)
+    if profiler is not None:
+        profiler = profiler.for_file(video_path)
 
     # Determine computation device with diagnostic information
     cuda_available = torch.cuda.is_available()
@@ -254,45 +379,213 @@ def transcribe(
         print("  https://pytorch.org/get-started/locally/")
         print("  Пример: pip install torch torchvision torchaudio --index-url https://download.pytorch.org/whl/cu121")
     
-    # Set fp16 to False when running on CPU to avoid unsupported half precision
-    use_fp16 = device != "cpu"
-    # Load the chosen Whisper model
-    os.makedirs(DEFAULT_MODELS_DIR, exist_ok=True)
-    model = whisper.load_model(model_size, device=device, download_root=DEFAULT_MODELS_DIR)
+    # fp16 is only used on GPU; the CPU engines run in fp32 (or int8)
+    engine = resolve_engine(engine, device)
+    use_fp16 = uses_fp16(engine, device)
+    precision = engine
     # Perform transcription. The language hint helps Whisper focus on the selected language.
-    duration_seconds = progress_total
-    if duration_seconds is None and progress_callback is not None:
-        duration_seconds = _probe_duration_seconds(video_path)
-    needs_progress = progress_callback is not None and duration_seconds is not None
+    callbacks = []
+    writers = TranscriptWriters(output_path, parse_formats(timestamps_format))
+    if chunk_workers <= 1 and not cascade_model:
+        # Segments go to the output files as soon as they are decoded (before any
+        # caller callback, which may abort the job).
+        callbacks.append(lambda event: writers.write(event.segments))
+    if on_segment is not None:
+        callbacks.append(on_segment)
+    if progress_callback is not None:
+        callbacks.append(lambda event: progress_callback(event.seconds))
+    if profiler is not None:
+        callbacks.append(profiler.on_segment)
+    emit = EventEmitter(callbacks, total_seconds=progress_total)
+    speech_map = None
+
+    def emit_decoded(segments, seconds, total_seconds=None):
+        # With VAD the model sees the compacted audio; events use the original timeline.
+        if speech_map is not None:
+            segments = speech_map.remap_segments(segments)
+            seconds = speech_map.to_original(seconds)
+            total_seconds = speech_map.original_seconds
+        emit(segments, seconds, total_seconds)
+
     kwargs = {"language": language, "fp16": use_fp16}
     if verbose is not None:
         kwargs["verbose"] = verbose
-    elif needs_progress:
-        kwargs["verbose"] = True
-    original_stdout = sys.stdout
-    if needs_progress:
-        sys.stdout = _ProgressStdout(original_stdout, duration_seconds, progress_callback)
+    if cascade_model:
+        cascade_thresholds = cascade_thresholds or CascadeThresholds()
+    job_options = _cache_options(
+        engine, use_fp16, chunk_workers, max_chunk_seconds, stream, stream_window_seconds,
+        vad, cascade_model, cascade_thresholds,
+    )
+    cascade_report = None
+    checkpoint = None
     try:
-        result = model.transcribe(video_path, **kwargs)
-    finally:
-        if sys.stdout is not original_stdout:
-            sys.stdout.flush()
-            sys.stdout = original_stdout
-    text = result["text"].strip()
-    # Write the transcription to the specified output file using UTF‑8 encoding
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(text + "\n")
-    print(f"Saved transcription to {output_path}")
-    if timestamps_format != "none":
-        segments = result.get("segments", [])
-        timestamps_text = _build_timestamp_lines(segments, timestamps_format)
-        timestamps_path = _timestamps_output_path(output_path, timestamps_format)
-        with open(timestamps_path, "w", encoding="utf-8") as f:
-            f.write(timestamps_text)
+        result = None
+        cache_key = None
+        if cache is not None:
+            with timed(profiler, "cache_lookup") as info:
+                cache_key = cache.key(video_path, model_size, language, job_options, digest=media_digest)
+                result = cache.get(cache_key)
+                info["hit"] = result is not None
+            if result is not None:
+                ingest = "cache"
+                print(f"Cache hit: {video_path}")
+                segments = result.get("segments", [])
+                done = progress_total or (segments[-1]["end"] if segments else 0.0)
+                emit(segments, done, done)
+        if result is None and checkpoint_dir:
+            checkpoint = Checkpoint.for_job(checkpoint_dir, video_path, model_size, language, job_options)
+            if checkpoint.resumed:
+                print(f"Resuming from checkpoint at {checkpoint.seek:,.1f}s: {checkpoint.path}")
+        if result is None:
+            if chunk_workers > 1:
+                ingest = "chunked"
+                if audio is None:
+                    with timed(profiler, "audio_decode", cached=audio_cache is not None):
+                        if audio_cache is not None:
+                            audio = audio_cache.load_audio(video_path)
+                        else:
+                            audio = whisper.load_audio(video_path)
+                if vad:
+                    audio, speech_map = _skip_non_speech(audio, profiler)
+                if speech_map is not None and not speech_map.pieces:
+                    result = _no_speech_result(language)
+                else:
+                    with timed(profiler, "inference", workers=chunk_workers):
+                        result = transcribe_chunks(
+                            audio,
+                            model_size,
+                            device,
+                            precision,
+                            kwargs,
+                            workers=chunk_workers,
+                            max_chunk_seconds=max_chunk_seconds,
+                            segment_callback=emit_decoded,
+                        )
+                decoded_audio = audio
+                del audio
+            else:
+                # Get the chosen Whisper model (loaded once per process and reused afterwards)
+                registry = registry or default_registry
+                with ExitStack() as stack:
+                    with timed(profiler, "model_load", cached=(model_size, device, precision) in registry):
+                        model = stack.enter_context(registry.use(model_size, device, precision))
+                    if profiler is not None:
+                        stack.enter_context(profiler.decode_hook(model))
+                    if stream:
+                        ingest = "stream"
+                        # ffmpeg decoding, mel and inference are interleaved window by window.
+                        with timed(profiler, "inference"):
+                            result = transcribe_stream(
+                                model,
+                                video_path,
+                                kwargs,
+                                window_seconds=stream_window_seconds,
+                                segment_callback=emit,
+                                checkpoint=checkpoint,
+                            )
+                    else:
+                        ingest = "file"
+                        audio_input = video_path if audio is None else audio
+                        if audio is None and (audio_cache is not None or profiler is not None or vad or cascade_model):
+                            # Decoding up front (instead of inside model.transcribe) lets it be timed separately.
+                            with timed(profiler, "audio_decode", cached=audio_cache is not None):
+                                if audio_cache is not None:
+                                    audio_input = audio_cache.load_audio(video_path)
+                                else:
+                                    audio_input = whisper.load_audio(video_path)
+                        if vad:
+                            audio_input, speech_map = _skip_non_speech(audio_input, profiler)
+                        if speech_map is not None and not speech_map.pieces:
+                            result = _no_speech_result(language)
+                        elif audio_cache is not None and audio_cache.cache_mel and speech_map is None and audio is None:
+                            with timed(profiler, "mel", cached=True):
+                                mel = audio_cache.load_mel(video_path, model.dims.n_mels)
+                            stack.enter_context(precomputed_mel(mel))
+                        elif profiler is not None:
+                            with timed(profiler, "mel"):
+                                mel = whisper.log_mel_spectrogram(audio_input, model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+                            stack.enter_context(precomputed_mel(mel))
+                        if result is None:
+                            with timed(profiler, "inference", resumed_from=checkpoint.seek if checkpoint else 0.0):
+                                if checkpoint is not None:
+                                    result = transcribe_resumable(model, audio_input, kwargs, checkpoint, emit_decoded)
+                                else:
+                                    stack.enter_context(segment_tap(emit_decoded))
+                                    result = model.transcribe(audio_input, **kwargs)
+                        decoded_audio = audio_input
+            if cascade_model and ingest != "stream":
+                result, cascade_report = _run_cascade(
+                    result, decoded_audio, cascade_model, cascade_thresholds,
+                    registry or default_registry, device, precision, kwargs, profiler,
+                )
+            decoded_audio = None
+            if speech_map is not None:
+                result = speech_map.remap_result(result)
+            if cache is not None:
+                cache.put(cache_key, result)
+    except BaseException:
+        # Earlier outputs at the final names stay; the checkpoint (if any) keeps the progress.
+        writers.discard()
+        raise
+    with timed(profiler, "write"):
+        if chunk_workers > 1 or cascade_model:
+            # Chunks finish out of order and the cascade rewrites weak segments,
+            # so in these modes the segments are written once final.
+            writers.write(result.get("segments", []))
+        writers.close()
+    if checkpoint is not None:
+        checkpoint.remove()
+    if corpus is not None:
+        with timed(profiler, "index"):
+            corpus.add(output_path, result.get("segments", []), media=video_path, language=result.get("language"))
+    if "text" in writers.paths:
+        print(f"Saved transcription to {output_path}")
+    for timestamps_path in writers.timestamp_paths():
         print(f"Saved timestamps to {timestamps_path}")
+    result["metrics"] = {
+        "ingest": ingest,
+        "engine": engine,
+        "threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if speech_map is not None:
+        result["metrics"]["speech_seconds"] = round(speech_map.speech_seconds, 2)
+        result["metrics"]["vad_skipped_seconds"] = round(speech_map.skipped_seconds, 2)
+    if cascade_report is not None:
+        result["metrics"]["cascade"] = cascade_report
+    if profiler is not None:
+        profiler.add(
+            "job",
+            ingest=ingest,
+            engine=engine,
+            threads=result["metrics"]["threads"],
+            segments=len(result.get("segments", [])),
+            vad_skipped_seconds=result["metrics"].get("vad_skipped_seconds"),
+            cascade_fraction=cascade_report["escalated_fraction"] if cascade_report else None,
+            peak_rss_mb=result["metrics"]["peak_rss_mb"],
+        )
+    if result["metrics"]["peak_rss_mb"] is not None:
+        print(f"Peak memory: {result['metrics']['peak_rss_mb']:,.0f} MB (ingest={ingest}, engine={engine})")
+    return result
+
+
+def _corpus_from_arg(value: Optional[str]) -> Optional[CorpusIndex]:
+    """``--index`` -> None (not given), the default index (no DIR) or the index in DIR."""
+    if value is None:
+        return None
+    return CorpusIndex(value) if value else default_index()
 
 
-def main() -> None:
+def _cascade_thresholds_from_args(args: argparse.Namespace) -> CascadeThresholds:
+    return CascadeThresholds(
+        min_avg_logprob=args.cascade_logprob,
+        max_compression_ratio=args.cascade_compression,
+        max_no_speech_prob=args.cascade_no_speech,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
     parser = argparse.ArgumentParser(
         description=(
             "Transcribe an audio or video file using OpenAI's open‑source "
@@ -324,9 +617,10 @@ def main() -> None:
     )
     parser.add_argument(
         "--timestamps",
-        choices=["none", "txt", "srt", "vtt", "tsv"],
-        default="none",
-        help="Save timestamps to a separate file (none, txt, srt, vtt, tsv).",
+        nargs="+",
+        choices=["none", *TIMESTAMP_FORMATS],
+        default=["none"],
+        help="Save timestamps to separate files, one per format (none, txt, srt, vtt, tsv, jsonl).",
     )
     progress_group = parser.add_mutually_exclusive_group()
     progress_group.add_argument(
@@ -342,27 +636,161 @@ def main() -> None:
         help="Disable progress output.",
     )
     parser.set_defaults(progress=True)
-    args = parser.parse_args()
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=1,
+        help="Split long audio at silence and transcribe the chunks in N parallel processes (default: 1).",
+    )
+    parser.add_argument(
+        "--max-chunk-seconds",
+        type=float,
+        default=600.0,
+        help="Maximum chunk length in seconds for --chunk-workers (default: 600).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Decode audio through an ffmpeg pipe in windows to keep memory flat on very long files.",
+    )
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Skip silence and music before inference; timestamps stay on the original timeline.",
+    )
+    parser.add_argument(
+        "--cascade-model",
+        choices=["tiny", "base", "small", "medium", "large"],
+        default=None,
+        help="Re-decode low-confidence segments with this larger model (default: off).",
+    )
+    parser.add_argument(
+        "--cascade-logprob",
+        type=float,
+        default=CascadeThresholds.min_avg_logprob,
+        help=f"Escalate segments with a lower avg_logprob (default: {CascadeThresholds.min_avg_logprob}).",
+    )
+    parser.add_argument(
+        "--cascade-compression",
+        type=float,
+        default=CascadeThresholds.max_compression_ratio,
+        help=f"Escalate segments with a higher compression ratio (default: {CascadeThresholds.max_compression_ratio}).",
+    )
+    parser.add_argument(
+        "--cascade-no-speech",
+        type=float,
+        default=CascadeThresholds.max_no_speech_prob,
+        help=f"Escalate segments with a higher no_speech_prob (default: {CascadeThresholds.max_no_speech_prob}).",
+    )
+    parser.add_argument(
+        "--stream-window-seconds",
+        type=float,
+        default=300.0,
+        help="Window length in seconds for --stream (default: 300).",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse results stored in the transcript cache for identical media and settings.",
+    )
+    parser.add_argument(
+        "--audio-cache",
+        default=None,
+        help="Directory for memory-mapped decoded audio, reused by later runs on the same file.",
+    )
+    parser.add_argument(
+        "--cache-mel",
+        action="store_true",
+        help="With --audio-cache, also store the log-mel spectrogram.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile.jsonl",
+        default=None,
+        metavar="PATH",
+        help="Append per-stage timings as JSON lines to PATH (default: profile.jsonl) and print a summary.",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        nargs="?",
+        const=DEFAULT_CHECKPOINT_DIR,
+        default=None,
+        metavar="DIR",
+        help="Checkpoint every decoded window in DIR (default: ./cache/checkpoints) and resume an interrupted run.",
+    )
+    parser.add_argument(
+        "--index",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="Add the segments to the searchable corpus index in DIR (default: $WHISPER_CORPUS_DIR or ./cache/corpus).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="Inference engine: fp32, fp16 (GPU), int8 (quantized, CPU) or compile (default: auto).",
+    )
+    parser.add_argument(
+        "--shared-weights",
+        action="store_true",
+        help="Memory-map the CPU model weights from a shared fp32 file, so concurrent runs hold one copy.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Number of torch intra-op threads (default: all cores).",
+    )
+    parser.add_argument(
+        "--interop-threads",
+        type=int,
+        default=None,
+        help="Number of torch inter-op threads (default: torch's choice).",
+    )
+    args = parser.parse_args(argv)
+    if args.shared_weights:
+        enable_shared_weights()
+    profiler = Profiler(args.profile) if args.profile else None
     progress_total = None
-    progress_callback = None
+    on_segment = None
     if args.progress:
-        progress_total = _probe_duration_seconds(args.input)
-        if progress_total is None:
-            print("⚠ Не удалось определить длительность через ffprobe; прогресс отключен.")
-        else:
+        with timed(profiler and profiler.for_file(args.input), "probe"):
+            progress_total = _probe_duration_seconds(args.input)
+        if progress_total is not None:
             print(f"Длительность: {progress_total:,.1f}s")
-            progress_callback = make_progress_printer(progress_total)
+        on_segment = make_progress_printer(progress_total)
     transcribe(
         args.input,
         args.output,
         args.model,
         args.language,
         args.timestamps,
-        progress_callback=progress_callback,
         progress_total=progress_total,
+        on_segment=on_segment,
+        chunk_workers=args.chunk_workers,
+        max_chunk_seconds=args.max_chunk_seconds,
+        stream=args.stream,
+        stream_window_seconds=args.stream_window_seconds,
+        cache=default_cache() if args.cache else None,
+        audio_cache=AudioCache(args.audio_cache, cache_mel=args.cache_mel) if args.audio_cache else None,
+        profiler=profiler,
+        checkpoint_dir=args.checkpoint_dir,
+        engine=args.engine,
+        threads=args.threads,
+        interop_threads=args.interop_threads,
+        vad=args.vad,
+        corpus=_corpus_from_arg(args.index),
+        cascade_model=args.cascade_model,
+        cascade_thresholds=_cascade_thresholds_from_args(args),
     )
-    if args.progress and progress_total:
+    if args.progress:
         print()
+    if profiler is not None:
+        print(format_summary(profiler.records))
+        print(f"Saved profile to {args.profile}")
 
 
 if __name__ == "__main__":
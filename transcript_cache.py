@@ -0,0 +1,179 @@
+"""
+Content-addressed on-disk cache of transcription results.
+
+Entries are keyed by a SHA-256 of the media bytes plus everything that
+changes the output (model size, language, decoding options), so a renamed or
+re-uploaded copy of the same recording is a hit, while a different model or
+language is a miss. Each entry stores the full Whisper result with segments,
+so any timestamp format can be rendered from it.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "transcripts")
+_HASH_BLOCK = 1024 * 1024
+
+
+def media_hash(media_path: str) -> str:
+    """SHA-256 of the file contents."""
+    digest = hashlib.sha256()
+    with open(media_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _whisper_version() -> str:
+    try:
+        from whisper.version import __version__
+    except ImportError:
+        return "unknown"
+    return __version__
+
+
+class TranscriptCache:
+    """
+    Directory of JSON results with least-recently-used eviction by total size.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Where entries are stored. Defaults to ``./cache/transcripts``.
+    max_bytes : int, optional
+        Upper bound on the total size of stored entries; the least recently
+        used entries are removed when it is exceeded. ``None`` disables eviction.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: Optional[int] = 512 * 1024 * 1024) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (path, size, mtime) -> hash, so a file is only read once per process.
+        self._hashes: Dict[tuple, str] = {}
+
+    def key(
+        self,
+        media_path: str,
+        model_size: str,
+        language: Optional[str],
+        options: Optional[dict] = None,
+        digest: Optional[str] = None,
+    ) -> str:
+        """Cache key for *media_path* transcribed with the given settings.
+
+        *digest* is the `media_hash()` of the contents when it is already
+        known (or the file cannot be read twice, like a pipe).
+        """
+        if digest is None:
+            stat = os.stat(media_path)
+            ident = (os.path.abspath(media_path), stat.st_size, stat.st_mtime_ns)
+            digest = self._hashes.get(ident)
+            if digest is None:
+                digest = media_hash(media_path)
+                self._hashes[ident] = digest
+        payload = {
+            "media": digest,
+            "model": model_size,
+            "language": language,
+            "options": options or {},
+            "whisper": _whisper_version(),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def contains(self, key: str) -> bool:
+        """Whether an entry for *key* exists (without loading it or counting a hit)."""
+        return os.path.isfile(self._path(key))
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in result.items() if k != "metrics"}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_default_cache: Optional[TranscriptCache] = None
+
+
+def default_cache() -> TranscriptCache:
+    """Process-wide cache configured from ``WHISPER_TRANSCRIPT_CACHE_DIR`` / ``WHISPER_TRANSCRIPT_CACHE_MB``."""
+    global _default_cache
+    if _default_cache is None:
+        max_mb = os.environ.get("WHISPER_TRANSCRIPT_CACHE_MB", "").strip()
+        _default_cache = TranscriptCache(
+            cache_dir=os.environ.get("WHISPER_TRANSCRIPT_CACHE_DIR") or DEFAULT_CACHE_DIR,
+            max_bytes=int(max_mb) * 1024 * 1024 if max_mb.isdigit() else 512 * 1024 * 1024,
+        )
+    return _default_cache
@@ -0,0 +1,228 @@
+"""
+Streaming writers for transcripts and timestamp files.
+
+Every writer appends segments to its file as they are decoded and flushes
+after each one, so partial outputs can be read during a long job.
+`TranscriptWriters` fans one stream of segments out to the plain text
+transcript and any number of timestamp formats, so all of them come from a
+single transcription. The files are written under ``<name>.partial`` and only
+renamed to their final names once the job succeeds, so an existing output is
+always complete and a failed run leaves the previous one in place.
+"""
+import io
+import json
+import os
+from typing import Dict, Iterable, List, Sequence, TextIO, Union
+
+TIMESTAMP_FORMATS = ("txt", "srt", "vtt", "tsv", "jsonl")
+PARTIAL_SUFFIX = ".partial"
+
+
+def format_timestamp(seconds: float, for_vtt: bool = False) -> str:
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int(round((seconds - int(seconds)) * 1000))
+    sep = "." if for_vtt else ","
+    return f"{hours:02}:{minutes:02}:{secs:02}{sep}{millis:03}"
+
+
+def parse_formats(value: Union[None, str, Sequence[str]]) -> List[str]:
+    """Normalise ``"none"``, ``"srt"``, ``"srt,vtt"`` or ``["srt", "vtt"]`` to a list of formats."""
+    if value is None:
+        return []
+    items = value.split(",") if isinstance(value, str) else [part for item in value for part in item.split(",")]
+    formats = []
+    for item in (part.strip().lower() for part in items):
+        if not item or item == "none" or item in formats:
+            continue
+        if item not in TIMESTAMP_FORMATS:
+            raise ValueError(f"Unknown timestamps format {item!r}; expected one of {', '.join(TIMESTAMP_FORMATS)}")
+        formats.append(item)
+    return formats
+
+
+def timestamps_output_path(output_path: str, fmt: str) -> str:
+    base, _ = os.path.splitext(output_path)
+    return f"{base}.{fmt}"
+
+
+class SegmentWriter:
+    """Base class: writes a header, one block per segment and a footer to *stream*."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.count = 0
+        self.write_header()
+
+    def write_header(self) -> None:
+        pass
+
+    def format_segment(self, segment: dict) -> str:
+        raise NotImplementedError
+
+    def write(self, segments: Iterable[dict]) -> None:
+        for segment in segments:
+            self.count += 1
+            self.stream.write(self.format_segment(segment))
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class PlainTextWriter(SegmentWriter):
+    """The transcript itself: segment texts joined and stripped, without timestamps."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self._started = False
+        self._pending = ""  # trailing whitespace, written only if more text follows
+        super().__init__(stream)
+
+    def format_segment(self, segment: dict) -> str:
+        text = self._pending + segment["text"]
+        if not self._started:
+            text = text.lstrip()
+        body = text.rstrip()
+        self._pending = text[len(body) :]
+        self._started = self._started or bool(body)
+        return body
+
+    def close(self) -> None:
+        self.stream.write("\n")
+        super().close()
+
+
+class _LineWriter(SegmentWriter):
+    """Line-based format that is a single newline when there are no segments."""
+
+    def close(self) -> None:
+        if self.count == 0:
+            self.stream.write("\n")
+        super().close()
+
+
+class TimestampTextWriter(_LineWriter):
+    def format_segment(self, segment: dict) -> str:
+        start = format_timestamp(segment["start"], for_vtt=True)
+        end = format_timestamp(segment["end"], for_vtt=True)
+        return f"[{start} - {end}] {segment['text'].strip()}\n"
+
+
+class SrtWriter(_LineWriter):
+    def format_segment(self, segment: dict) -> str:
+        start = format_timestamp(segment["start"])
+        end = format_timestamp(segment["end"])
+        separator = "\n" if self.count > 1 else ""
+        return f"{separator}{self.count}\n{start} --> {end}\n{segment['text'].strip()}\n"
+
+
+class VttWriter(SegmentWriter):
+    def write_header(self) -> None:
+        self.stream.write("WEBVTT\n")
+
+    def format_segment(self, segment: dict) -> str:
+        start = format_timestamp(segment["start"], for_vtt=True)
+        end = format_timestamp(segment["end"], for_vtt=True)
+        return f"\n{start} --> {end}\n{segment['text'].strip()}\n"
+
+
+class TsvWriter(_LineWriter):
+    def format_segment(self, segment: dict) -> str:
+        return f"{segment['start']:.3f}\t{segment['end']:.3f}\t{segment['text'].strip()}\n"
+
+
+class JsonLinesWriter(SegmentWriter):
+    """Full segment dicts (ids, tokens, probabilities, words), one JSON object per line."""
+
+    def format_segment(self, segment: dict) -> str:
+        return json.dumps(segment, ensure_ascii=False) + "\n"
+
+
+WRITERS = {
+    "txt": TimestampTextWriter,
+    "srt": SrtWriter,
+    "vtt": VttWriter,
+    "tsv": TsvWriter,
+    "jsonl": JsonLinesWriter,
+}
+
+
+def render_segments(segments: Iterable[dict], fmt: str) -> str:
+    """Render *segments* in one format into a string (``"text"`` gives the plain transcript)."""
+    buffer = io.StringIO()
+    writer = PlainTextWriter(buffer) if fmt == "text" else WRITERS[fmt](buffer)
+    writer.write(segments)
+    writer.close()
+    return buffer.getvalue()
+
+
+class TranscriptWriters:
+    """
+    The plain text transcript at *output_path* plus one timestamp file per format.
+
+    Timestamp files are named after *output_path* with the format as extension
+    (``talk.txt`` -> ``talk.srt``). For the ``txt`` format that is the transcript
+    path itself, in which case the timestamped lines take the transcript's place.
+
+    Segments go to ``<path>.partial`` files; `close()` moves them to their final
+    names and `discard()` deletes them. Used as a context manager, the files
+    are committed only when the block does not raise.
+    """
+
+    def __init__(self, output_path: str, formats: Sequence[str] = ()) -> None:
+        self.output_path = output_path
+        self.paths: Dict[str, str] = {"text": output_path}
+        for fmt in formats:
+            path = timestamps_output_path(output_path, fmt)
+            if path == output_path:
+                del self.paths["text"]
+            self.paths[fmt] = path
+        self._writers: Dict[str, SegmentWriter] = {}
+        for fmt, path in self.paths.items():
+            stream = open(path + PARTIAL_SUFFIX, "w", encoding="utf-8")
+            self._writers[fmt] = PlainTextWriter(stream) if fmt == "text" else WRITERS[fmt](stream)
+        self.segments_written = 0
+        self._closed = False
+
+    def write(self, segments: Iterable[dict]) -> None:
+        segments = list(segments)
+        for writer in self._writers.values():
+            writer.write(segments)
+        self.segments_written += len(segments)
+
+    def close(self) -> None:
+        """Finish every file and move it to its final name."""
+        if self._closed:
+            return
+        self._closed = True
+        for writer in self._writers.values():
+            writer.close()
+            writer.stream.close()
+        for path in self.paths.values():
+            os.replace(path + PARTIAL_SUFFIX, path)
+
+    def discard(self) -> None:
+        """Delete the unfinished files; outputs of earlier runs stay as they were."""
+        if self._closed:
+            return
+        self._closed = True
+        for writer in self._writers.values():
+            writer.stream.close()
+        for path in self.paths.values():
+            try:
+                os.remove(path + PARTIAL_SUFFIX)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "TranscriptWriters":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def timestamp_paths(self) -> List[str]:
+        return [path for fmt, path in self.paths.items() if fmt != "text"]
@@ -0,0 +1,201 @@
+"""
+Lightweight voice-activity pre-pass.
+
+Long meetings often contain minutes of silence or hold music, on which Whisper
+still runs the encoder and decoder and sometimes hallucinates text. The VAD
+marks speech in the 16 kHz waveform from three cheap per-frame features:
+
+* energy above the recording's noise floor,
+* the share of that energy in the voice band (80-4000 Hz: fundamental and
+  formants, without rumble and hiss),
+* syllable-rate modulation: the energy of speech rises and falls several
+  times a second, while music and hum are comparatively steady.
+
+`compact()` then joins the speech regions (with a short pause between them)
+into the audio given to the model, and the returned `SpeechMap` moves the
+resulting timestamps back onto the original timeline.
+"""
+import bisect
+from dataclasses import dataclass, field
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from audio_chunks import ENERGY_FRAME, SAMPLE_RATE, frame_energy
+
+SPEECH_BAND_HZ = (80.0, 4000.0)
+# Features are computed for this many frames at a time to bound memory.
+_BLOCK_FRAMES = 8192
+
+
+@dataclass
+class VadOptions:
+    """
+    Thresholds of `speech_regions()`.
+
+    Attributes
+    ----------
+    threshold_db : float
+        How far above the noise floor (10th percentile of frame energy) a frame
+        must be to count as active.
+    min_band_ratio : float
+        Minimum share of a frame's energy in the voice band.
+    min_modulation_db : float
+        Minimum standard deviation of frame energy (dB) over the surrounding
+        second; steadier sounds are treated as music or noise.
+    min_speech_seconds : float
+        Shorter bursts are dropped.
+    min_silence_seconds : float
+        Shorter pauses are kept inside the surrounding speech region.
+    pad_seconds : float
+        Context kept before and after every region.
+    """
+
+    threshold_db: float = 12.0
+    min_band_ratio: float = 0.5
+    min_modulation_db: float = 3.0
+    min_speech_seconds: float = 0.25
+    min_silence_seconds: float = 1.0
+    pad_seconds: float = 0.3
+
+
+def _band_ratio(audio: np.ndarray, n_frames: int, frame: int, sample_rate: int) -> np.ndarray:
+    freqs = np.fft.rfftfreq(frame, 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+    window = np.hanning(frame).astype(np.float32)
+    ratios = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, _BLOCK_FRAMES):
+        stop = min(n_frames, start + _BLOCK_FRAMES)
+        frames = audio[start * frame : stop * frame].reshape(-1, frame) * window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        ratios[start:stop] = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+    return ratios
+
+
+def _rolling_std(values: np.ndarray, width: int) -> np.ndarray:
+    """Standard deviation over a centred window of *width* frames."""
+    padded = np.pad(values.astype(np.float64), (width // 2, width - width // 2), mode="edge")
+    sums = np.concatenate(([0.0], np.cumsum(padded)))
+    squares = np.concatenate(([0.0], np.cumsum(padded * padded)))
+    count = width
+    mean = (sums[width:] - sums[:-width]) / count
+    variance = (squares[width:] - squares[:-width]) / count - mean * mean
+    return np.sqrt(np.maximum(variance, 0.0))[: len(values)]
+
+
+def speech_regions(
+    audio: np.ndarray,
+    options: VadOptions = VadOptions(),
+    sample_rate: int = SAMPLE_RATE,
+) -> List[Tuple[int, int]]:
+    """Return ``(start_sample, end_sample)`` pairs of the speech in *audio*."""
+    frame = ENERGY_FRAME
+    energy = frame_energy(audio, frame)
+    if len(energy) == 0:
+        return []
+    energy_db = 20 * np.log10(energy + 1e-10)
+    floor_db = np.percentile(energy_db, 10)
+    frames_per_second = sample_rate / frame
+    modulation = _rolling_std(energy_db, max(1, int(round(frames_per_second))))
+    speech = (
+        (energy_db > floor_db + options.threshold_db)
+        & (_band_ratio(audio, len(energy), frame, sample_rate) >= options.min_band_ratio)
+        & (modulation >= options.min_modulation_db)
+    )
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    runs = [(int(start), int(end)) for start, end in zip(edges[::2], edges[1::2])]
+    min_silence = options.min_silence_seconds * frames_per_second
+    merged: List[List[int]] = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    min_speech = options.min_speech_seconds * frames_per_second
+    pad = int(options.pad_seconds * sample_rate)
+    regions: List[Tuple[int, int]] = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start_sample = max(0, start * frame - pad)
+        end_sample = min(len(audio), end * frame + pad)
+        if regions and start_sample <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end_sample)
+        else:
+            regions.append((start_sample, end_sample))
+    return regions
+
+
+@dataclass
+class SpeechMap:
+    """
+    Mapping from the compacted audio's timeline back to the original one.
+
+    ``pieces`` holds ``(compact_start, original_start, duration)`` in seconds
+    for every kept region, in order.
+    """
+
+    pieces: List[Tuple[float, float, float]] = field(default_factory=list)
+    original_seconds: float = 0.0
+
+    @property
+    def speech_seconds(self) -> float:
+        return sum(duration for _, _, duration in self.pieces)
+
+    @property
+    def skipped_seconds(self) -> float:
+        return self.original_seconds - self.speech_seconds
+
+    def to_original(self, seconds: float) -> float:
+        """Original time of *seconds* in the compacted audio (pauses map to the end of the region before)."""
+        if not self.pieces:
+            return 0.0
+        idx = max(0, bisect.bisect_right([piece[0] for piece in self.pieces], seconds) - 1)
+        compact_start, original_start, duration = self.pieces[idx]
+        return original_start + min(max(seconds - compact_start, 0.0), duration)
+
+    def remap_segments(self, segments: Iterable[dict]) -> List[dict]:
+        """Copies of *segments* (and their words) with times on the original timeline."""
+        from segments import FRAMES_PER_SECOND
+
+        remapped = []
+        for segment in segments:
+            moved = dict(segment)
+            moved["start"] = self.to_original(segment["start"])
+            moved["end"] = self.to_original(segment["end"])
+            if "seek" in segment:
+                moved["seek"] = int(round(self.to_original(segment["seek"] / FRAMES_PER_SECOND) * FRAMES_PER_SECOND))
+            if segment.get("words"):
+                moved["words"] = [
+                    {**word, "start": self.to_original(word["start"]), "end": self.to_original(word["end"])}
+                    for word in segment["words"]
+                ]
+            remapped.append(moved)
+        return remapped
+
+    def remap_result(self, result: dict) -> dict:
+        return {**result, "segments": self.remap_segments(result.get("segments", []))}
+
+
+def compact(
+    audio: np.ndarray,
+    regions: List[Tuple[int, int]],
+    gap_seconds: float = 0.2,
+    sample_rate: int = SAMPLE_RATE,
+) -> Tuple[np.ndarray, SpeechMap]:
+    """Join *regions* of *audio*, separated by *gap_seconds* of silence, and map them back."""
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=audio.dtype)
+    parts = []
+    speech_map = SpeechMap(original_seconds=len(audio) / sample_rate)
+    position = 0
+    for start, end in regions:
+        if parts:
+            parts.append(gap)
+            position += len(gap)
+        parts.append(audio[start:end])
+        speech_map.pieces.append((position / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        position += end - start
+    compacted = np.concatenate(parts) if parts else np.zeros(0, dtype=audio.dtype)
+    return compacted, speech_map
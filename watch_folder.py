@@ -0,0 +1,298 @@
+"""
+Watch-folder ingestion for `batch_transcribe`.
+
+`watch()` polls an input directory recursively and hands every new or changed
+media file to a pool of resident worker processes, which keep their models
+loaded between files. A file is only taken once its size and modification
+time have stopped changing for *settle_seconds*, so recordings that are still
+being copied are not transcribed half-way. Finished (and failed) files are
+recorded in a JSON state index next to the outputs, keyed by their path, size
+and mtime, so restarts and later polls skip them without re-checking every
+output; a file that changes afterwards is transcribed again. A failed file is
+retried a few times, after growing delays, before it is left alone until it
+changes.
+"""
+import json
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from batch_transcribe import SUPPORTED_EXTS, _detect_language_from_name, _transcribe_job
+from cascade import CascadeThresholds
+from model_registry import enable_shared_weights
+from transcript_writers import PARTIAL_SUFFIX, parse_formats, timestamps_output_path
+
+STATE_FILE = ".watch_state.json"
+
+
+def iter_media(input_dir: Path) -> Iterator[Path]:
+    """Supported media files below *input_dir*, skipping hidden files and directories."""
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if not name.startswith(".") and os.path.splitext(name)[1].lower() in SUPPORTED_EXTS:
+                yield Path(root) / name
+
+
+class WatchState:
+    """
+    Index of processed files: ``{relative path: {"size", "mtime_ns", "state", ...}}``.
+
+    Saved atomically after every change, so a crash never leaves a truncated index.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _entry(self, key: str, stat: Tuple[int, int]) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None or (entry["size"], entry["mtime_ns"]) != tuple(stat):
+            return None
+        return entry
+
+    def is_current(self, key: str, stat: os.stat_result) -> bool:
+        """Whether *key* in this version needs no work now (done, or failed and not due for a retry)."""
+        entry = self._entry(key, (stat.st_size, stat.st_mtime_ns))
+        if entry is None:
+            return False
+        retry_at = entry.get("retry_at")
+        return retry_at is None or time.time() < retry_at
+
+    def attempts(self, key: str, stat: Tuple[int, int]) -> int:
+        """Failed attempts at *key* in this version so far."""
+        entry = self._entry(key, stat)
+        return entry.get("attempts", 0) if entry is not None and entry["state"] == "failed" else 0
+
+    def record(self, key: str, stat: Tuple[int, int], state: str, **extra) -> None:
+        self.entries[key] = {"size": stat[0], "mtime_ns": stat[1], "state": state, **extra}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def _report_pid(pids) -> None:
+    """Pool initializer: tell the parent which process to stop on Ctrl+C."""
+    pids.put(os.getpid())
+
+
+def _warm_worker(model_size: str, engine: str, threads: Optional[int], interop_threads: Optional[int]) -> None:
+    """Load the model into a pool worker before the first file arrives."""
+    import torch
+
+    from engines import configure_threads, resolve_engine
+    from model_registry import default_registry
+
+    configure_threads(threads, interop_threads)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    default_registry.get(model_size, device, resolve_engine(engine, device))
+
+
+def watch(
+    input_dir: Path,
+    output_dir: Path,
+    model_size: str = "medium",
+    language: Optional[str] = "ru",
+    timestamps_format="none",
+    workers: int = 1,
+    use_cache: bool = False,
+    audio_cache_dir: Optional[Path] = None,
+    cache_mel: bool = False,
+    checkpoint_dir: Optional[Path] = None,
+    engine: str = "auto",
+    threads: Optional[int] = None,
+    interop_threads: Optional[int] = None,
+    poll_interval: float = 1.0,
+    settle_seconds: float = 2.0,
+    state_path: Optional[Path] = None,
+    vad: bool = False,
+    index_dir: Optional[Path] = None,
+    cascade_model: Optional[str] = None,
+    cascade_thresholds: Optional[CascadeThresholds] = None,
+    shared_weights: bool = False,
+    max_attempts: int = 3,
+    retry_seconds: float = 60.0,
+) -> None:
+    """
+    Transcribe files appearing anywhere below *input_dir* until interrupted.
+
+    Transcripts mirror the directory layout under *output_dir*
+    (``in/a/b.mp4`` -> ``out/a/b.txt``). Files whose outputs already exist and
+    are newer than the media are adopted into the index without transcribing.
+    The language comes from the file-name heuristic of `batch_transcribe`.
+
+    Parameters
+    ----------
+    poll_interval : float, optional
+        Seconds between directory scans. Defaults to 1.
+    settle_seconds : float, optional
+        How long size and mtime must stay unchanged before a file is taken.
+        Defaults to 2.
+    state_path : Path, optional
+        The state index. Defaults to ``<output_dir>/.watch_state.json``.
+    vad : bool, optional
+        Skip silence and music before inference (see `vad`). Defaults to False.
+    index_dir : Path, optional
+        Add every finished transcript to the `corpus_index` in this directory.
+    cascade_model : str, optional
+        Re-decode low-confidence segments with this larger model (see `cascade`).
+    cascade_thresholds : CascadeThresholds, optional
+        When a segment is escalated to *cascade_model*.
+    shared_weights : bool, optional
+        Let the workers share one memory-mapped copy of the CPU weights (see
+        `shared_weights`). Defaults to False.
+    max_attempts : int, optional
+        Times a file is tried before it is left as failed until it changes.
+        Defaults to 3.
+    retry_seconds : float, optional
+        Delay before the first retry of a failed file; doubled for every
+        further attempt. Defaults to 60.
+    """
+    if not input_dir.exists():
+        raise FileNotFoundError(f"Directory {input_dir} does not exist.")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if shared_weights:
+        enable_shared_weights()
+    formats = parse_formats(timestamps_format)
+    state = WatchState(state_path or output_dir / STATE_FILE)
+    workers = max(1, workers)
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # path -> (size, mtime_ns, time that pair was first seen, time the file was first seen)
+    settling: Dict[str, Tuple[int, int, float, float]] = {}
+    # future -> (key, stat of the file when taken, job, time first seen)
+    running: Dict[object, Tuple[str, Tuple[int, int], dict, float]] = {}
+    queued = set()
+
+    def make_job(media_path: Path, key: str) -> dict:
+        out_txt = output_dir / Path(key).with_suffix(".txt")
+        out_txt.parent.mkdir(parents=True, exist_ok=True)
+        return {
+            "media_path": str(media_path),
+            "out_txt": str(out_txt),
+            "model_size": model_size,
+            "language": _detect_language_from_name(media_path.stem, default=language or "ru"),
+            "timestamps_format": formats,
+            "duration": None,
+            "use_cache": use_cache,
+            "audio_cache": str(audio_cache_dir) if audio_cache_dir else None,
+            "cache_mel": cache_mel,
+            "profile": None,
+            "profile_run": None,
+            "checkpoint_dir": str(checkpoint_dir) if checkpoint_dir else None,
+            "engine": engine,
+            "threads": threads,
+            "interop_threads": interop_threads,
+            "vad": vad,
+            "index_dir": str(index_dir) if index_dir else None,
+            "cascade_model": cascade_model,
+            "cascade_thresholds": cascade_thresholds,
+        }
+
+    def outputs_current(job: dict, stat: os.stat_result) -> bool:
+        paths = [job["out_txt"]] + [timestamps_output_path(job["out_txt"], fmt) for fmt in formats]
+        try:
+            return all(os.stat(path).st_mtime_ns >= stat.st_mtime_ns for path in paths)
+        except OSError:
+            return False
+
+    def scan() -> List[Tuple[Path, str, os.stat_result, float]]:
+        """Files that became stable since the last scan, with the time they were first seen."""
+        now = time.monotonic()
+        ready = []
+        seen = set()
+        for media_path in iter_media(input_dir):
+            key = media_path.relative_to(input_dir).as_posix()
+            seen.add(key)
+            if key in queued:
+                continue
+            try:
+                stat = media_path.stat()
+            except OSError:
+                continue  # deleted or renamed mid-scan
+            if state.is_current(key, stat):
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            previous = settling.get(key)
+            stable_since = previous[2] if previous is not None and previous[:2] == current else now
+            first_seen = previous[3] if previous is not None else now
+            settling[key] = (*current, stable_since, first_seen)
+            # Settled: unchanged across scans for settle_seconds, or not written
+            # to for that long (e.g. a file that was already complete when seen).
+            age = time.time() - stat.st_mtime_ns / 1e9
+            if stat.st_size > 0 and (now - stable_since >= settle_seconds or age >= settle_seconds):
+                del settling[key]
+                ready.append((media_path, key, stat, first_seen))
+        for key in list(settling):
+            if key not in seen:
+                del settling[key]
+        return ready
+
+    context = multiprocessing.get_context("spawn")
+    print(f"[watch] {input_dir} -> {output_dir} ({workers} workers, model {model_size}); Ctrl+C to stop", flush=True)
+    pids = context.SimpleQueue()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_report_pid, initargs=(pids,)) as pool:
+        for _ in range(workers):
+            pool.submit(_warm_worker, model_size, engine, threads, interop_threads)
+        try:
+            while True:
+                for media_path, key, stat, first_seen in scan():
+                    job = make_job(media_path, key)
+                    if outputs_current(job, stat):
+                        state.record(key, (stat.st_size, stat.st_mtime_ns), "done", out=job["out_txt"], adopted=True)
+                        continue
+                    print(f"[watch] queued {key}", flush=True)
+                    queued.add(key)
+                    future = pool.submit(_transcribe_job, job)
+                    running[future] = (key, (stat.st_size, stat.st_mtime_ns), job, first_seen)
+                if not running:
+                    time.sleep(poll_interval)
+                    continue
+                finished, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, stat, job, first_seen = running.pop(future)
+                    queued.discard(key)
+                    latency = time.monotonic() - first_seen
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        attempts = state.attempts(key, stat) + 1
+                        retry_in = retry_seconds * 2 ** (attempts - 1) if attempts < max_attempts else None
+                        state.record(
+                            key, stat, "failed", error=f"{type(exc).__name__}: {exc}", attempts=attempts,
+                            retry_at=time.time() + retry_in if retry_in is not None else None,
+                        )
+                        retry = f"retrying in {retry_in:.0f}s" if retry_in is not None else "giving up until it changes"
+                        print(f"[watch] FAILED {key} (attempt {attempts}/{max_attempts}, {retry}): {exc}", flush=True)
+                        continue
+                    state.record(key, stat, "done", out=job["out_txt"], ingest=result.get("ingest"))
+                    print(f"[watch] done {key} -> {job['out_txt']} ({latency:.1f}s after it appeared)", flush=True)
+        except KeyboardInterrupt:
+            print(f"[watch] stopping; {len(running)} running file(s) will be picked up again on restart", flush=True)
+            # Running futures cannot be cancelled and leaving the block would
+            # wait for them, so stop the workers instead.
+            pool.shutdown(wait=False, cancel_futures=True)
+            while not pids.empty():
+                try:
+                    os.kill(pids.get(), signal.SIGTERM)
+                except OSError:
+                    pass  # already gone
+            # Terminated workers cannot clean up their unfinished outputs; the
+            # final names still hold the previous transcripts, if any.
+            for _, _, job, _ in running.values():
+                for path in [job["out_txt"]] + [timestamps_output_path(job["out_txt"], fmt) for fmt in formats]:
+                    try:
+                        os.remove(path + PARTIAL_SUFFIX)
+                    except OSError:
+                        pass
@@ -0,0 +1,352 @@
+"""
+Lease-based work claiming for several `batch_transcribe` nodes sharing one corpus.
+
+Every node points at the same input and output directories on a shared
+filesystem (NFS, SMB, ...) and at one manifest directory next to them::
+
+    <manifest>/
+        inventory.json      # every file any node has seen
+        leases/<id>.json    # the node currently working on a file
+        done/<id>.json      # finished files: node, audio seconds, wall time
+        failed/<id>.json    # errors and the number of attempts
+        nodes/<node>.json   # heartbeat and counters of every node
+
+A file is claimed by creating its lease with ``O_CREAT | O_EXCL``, which
+succeeds on exactly one node. The owner renews the lease from a heartbeat
+thread by touching it; a lease whose modification time is older than
+*lease_seconds* belongs to a dead or hung node and is reclaimed by renaming it
+aside (again only one node wins) and claiming afresh. Node clocks are
+assumed to be NTP-synchronised to well within the lease length.
+
+Run ``python work_manifest.py <manifest>`` to print the progress of all nodes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+from file_lock import file_lock
+
+MANIFEST_DIR = ".manifest"
+DEFAULT_LEASE_SECONDS = 120.0
+DEFAULT_MAX_ATTEMPTS = 2
+
+
+def _write_json(path: str, payload: dict) -> None:
+    """Atomically replace *path* (the temporary name is unique per node and thread)."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class LeaseLost(RuntimeError):
+    """The lease of a file expired or was taken over while it was being transcribed."""
+
+
+class WorkManifest:
+    """
+    Claims, leases and completion markers of one shared corpus.
+
+    Parameters
+    ----------
+    root : str
+        The manifest directory, on storage shared by all nodes.
+    node_id : str, optional
+        Name of this node in leases and markers. Defaults to ``<hostname>-<pid>``.
+    lease_seconds : float, optional
+        How long a lease stays valid without renewal. Defaults to 120.
+    max_attempts : int, optional
+        Files that failed this many times are not claimed again. Defaults to 2.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        node_id: Optional[str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> None:
+        self.root = str(root)
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.reclaimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.lost: Set[str] = set()
+        self._held: Set[str] = set()
+        self._lock = threading.Lock()
+        for sub in ("leases", "done", "failed", "nodes"):
+            os.makedirs(os.path.join(self.root, sub), exist_ok=True)
+
+    # -- paths ---------------------------------------------------------------
+
+    @staticmethod
+    def file_id(key: str) -> str:
+        """Filesystem-safe id of *key*: a hash plus a readable tail of the name."""
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        tail = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.basename(key))[-40:]
+        return f"{digest}-{tail}"
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, self.file_id(key) + ".json")
+
+    # -- state ---------------------------------------------------------------
+
+    def _lease_age(self, key: str) -> Optional[float]:
+        try:
+            return time.time() - os.stat(self._path("leases", key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def attempts(self, key: str) -> int:
+        failure = _read_json(self._path("failed", key))
+        return failure.get("attempts", 0) if failure else 0
+
+    def state(self, key: str) -> str:
+        """One of ``done``, ``failed``, ``leased``, ``expired`` or ``free``."""
+        if os.path.exists(self._path("done", key)):
+            return "done"
+        if self.attempts(key) >= self.max_attempts:
+            return "failed"
+        age = self._lease_age(key)
+        if age is None:
+            return "free"
+        return "expired" if age > self.lease_seconds else "leased"
+
+    def register(self, keys: Iterable[str]) -> None:
+        """Add *keys* to the shared inventory used for progress totals."""
+        path = os.path.join(self.root, "inventory.json")
+        # Read-modify-write: nodes registering at the same time would drop each other's files.
+        with file_lock(os.path.join(self.root, "inventory.lock")):
+            inventory = set((_read_json(path) or {}).get("files", []))
+            merged = inventory | set(keys)
+            if merged != inventory:
+                _write_json(path, {"files": sorted(merged)})
+
+    # -- leases --------------------------------------------------------------
+
+    def claim(self, key: str) -> bool:
+        """Take the lease of *key*; False if it is finished or another node holds it."""
+        if self.state(key) in ("done", "failed"):
+            return False
+        path = self._path("leases", key)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._reclaim(path):
+                    return False
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "owner": self.node_id, "claimed": time.time()}, f)
+            if os.path.exists(self._path("done", key)):
+                # Finished by another node between the check above and the claim.
+                os.remove(path)
+                return False
+            with self._lock:
+                self._held.add(key)
+            return True
+        return False
+
+    def _reclaim(self, path: str) -> bool:
+        """Move an expired lease at *path* aside; True if this node did so."""
+        try:
+            if time.time() - os.stat(path).st_mtime <= self.lease_seconds:
+                return False
+            stale = f"{path}.{self.node_id}.{uuid.uuid4().hex}.stale"
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return False  # released, or reclaimed by another node first
+        if time.time() - os.stat(stale).st_mtime <= self.lease_seconds:
+            # Another node reclaimed and re-claimed it between our check and the
+            # rename: put its fresh lease back (link fails rather than overwrite).
+            try:
+                os.link(stale, path)
+            except FileExistsError:
+                pass
+            os.remove(stale)
+            return False
+        os.remove(stale)
+        self.reclaimed += 1
+        return True
+
+    def owns(self, key: str) -> bool:
+        lease = _read_json(self._path("leases", key))
+        return lease is not None and lease.get("owner") == self.node_id
+
+    def holds(self, key: str) -> bool:
+        """Whether this node owns an unexpired lease of *key* (safe to publish its outputs)."""
+        age = self._lease_age(key)
+        return age is not None and age <= self.lease_seconds and self.owns(key)
+
+    def renew(self, key: str) -> bool:
+        """Extend the lease of *key*; False (and recorded in `lost`) if it was taken over."""
+        if self.owns(key):
+            try:
+                os.utime(self._path("leases", key))
+                return True
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._held.discard(key)
+            self.lost.add(key)
+        return False
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._held.discard(key)
+        if self.owns(key):
+            try:
+                os.remove(self._path("leases", key))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, key: str, **info) -> None:
+        """Mark *key* finished by this node and drop its lease."""
+        _write_json(self._path("done", key), {"key": key, "node": self.node_id, "finished": time.time(), **info})
+        self.completed += 1
+        self.release(key)
+
+    def fail(self, key: str, error: str) -> None:
+        """Record a failed attempt at *key* and drop its lease so it can be retried."""
+        attempts = self.attempts(key) + 1
+        _write_json(
+            self._path("failed", key),
+            {"key": key, "node": self.node_id, "error": error, "attempts": attempts, "failed": time.time()},
+        )
+        self.failed += 1
+        self.release(key)
+
+    def held(self) -> Set[str]:
+        with self._lock:
+            return set(self._held)
+
+    # -- heartbeat and progress ----------------------------------------------
+
+    def publish(self) -> None:
+        """Write this node's heartbeat and counters to ``nodes/<node>.json``."""
+        _write_json(
+            os.path.join(self.root, "nodes", re.sub(r"[^A-Za-z0-9._-]+", "_", self.node_id) + ".json"),
+            {
+                "node": self.node_id,
+                "updated": time.time(),
+                "running": sorted(self.held()),
+                "completed": self.completed,
+                "failed": self.failed,
+                "reclaimed": self.reclaimed,
+            },
+        )
+
+    @contextmanager
+    def heartbeat(self, interval: Optional[float] = None) -> Iterator[None]:
+        """Renew all held leases and publish the node status in a background thread."""
+        interval = interval or self.lease_seconds / 4
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(interval):
+                for key in self.held():
+                    self.renew(key)
+                self.publish()
+
+        self.publish()
+        thread = threading.Thread(target=beat, name="manifest-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            for key in self.held():
+                self.release(key)
+            self.publish()
+
+    def progress(self) -> dict:
+        """Progress of the whole corpus, aggregated over all nodes."""
+        files = (_read_json(os.path.join(self.root, "inventory.json")) or {}).get("files", [])
+        by_node: Dict[str, dict] = {}
+        done_seconds = 0.0
+        done = failed = leased = expired = 0
+        for key in files:
+            state = self.state(key)
+            if state == "done":
+                done += 1
+                marker = _read_json(self._path("done", key)) or {}
+                node = by_node.setdefault(marker.get("node", "?"), {"done": 0, "audio_seconds": 0.0})
+                node["done"] += 1
+                node["audio_seconds"] += marker.get("audio_seconds") or 0.0
+                done_seconds += marker.get("audio_seconds") or 0.0
+            elif state == "failed":
+                failed += 1
+            elif state == "leased":
+                leased += 1
+            elif state == "expired":
+                expired += 1
+        now = time.time()
+        nodes_dir = os.path.join(self.root, "nodes")
+        for name in sorted(os.listdir(nodes_dir)):
+            status = _read_json(os.path.join(nodes_dir, name)) if name.endswith(".json") else None
+            if status is None:
+                continue
+            node = by_node.setdefault(status["node"], {"done": 0, "audio_seconds": 0.0})
+            node["alive"] = now - status.get("updated", 0) <= self.lease_seconds
+            node["running"] = len(status.get("running", [])) if node["alive"] else 0
+            node["reclaimed"] = status.get("reclaimed", 0)
+        return {
+            "files": len(files),
+            "done": done,
+            "failed": failed,
+            "running": leased,
+            "expired": expired,
+            "pending": len(files) - done - failed - leased - expired,
+            "done_audio_seconds": round(done_seconds, 1),
+            "nodes": by_node,
+        }
+
+
+def format_progress(progress: dict) -> str:
+    lines = [
+        f"{progress['done']}/{progress['files']} files done ({progress['done_audio_seconds']:,.0f}s of audio), "
+        f"{progress['running']} running, {progress['pending']} pending, "
+        f"{progress['expired']} with expired leases, {progress['failed']} failed"
+    ]
+    for node, info in sorted(progress["nodes"].items()):
+        alive = "" if info.get("alive", True) else " (no heartbeat)"
+        lines.append(
+            f"  {node}: {info['done']} done, {info['audio_seconds']:,.0f}s, "
+            f"{info.get('running', 0)} running, {info.get('reclaimed', 0)} reclaimed{alive}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show the progress of a multi-node batch manifest.")
+    parser.add_argument("manifest", help="Manifest directory (e.g. outputs/.manifest)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS, help=f"Lease length the nodes use (default: {DEFAULT_LEASE_SECONDS:.0f})")
+    parser.add_argument("--json", action="store_true", help="Print the progress as JSON")
+    args = parser.parse_args()
+    if not os.path.isdir(args.manifest):
+        parser.error(f"{args.manifest} is not a manifest directory")
+    progress = WorkManifest(args.manifest, lease_seconds=args.lease_seconds).progress()
+    print(json.dumps(progress, indent=2) if args.json else format_progress(progress))
+
+
+if __name__ == "__main__":
+    main()